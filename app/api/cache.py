@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Request, HTTPException, Query
+from starlette.status import HTTP_401_UNAUTHORIZED
+import os
+
+from app.utils import catalog, warmer
+from app.utils.cache import cache, make_key, revalidator
+from app.utils.singleflight import flights
+
+router = APIRouter()
+
+
+def check_token(request: Request):
+    token = request.headers.get("Authorization")
+    if not token:
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Missing Authorization token")
+    if token != os.getenv("STORED_HASH"):
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(request: Request):
+    check_token(request)
+    return {
+        **cache.snapshot(),
+        "revalidation": revalidator.snapshot(),
+        "coalescing": flights.snapshot(),
+        "catalog": catalog.snapshot(),
+        "warmer": warmer.snapshot(),
+    }
+
+
+@router.delete("/cache")
+async def purge_cache(
+    request: Request,
+    source: str = Query(..., description="tmdb, anilist, rawg, mangadex, openlibrary"),
+    op: str = Query(..., description="search, detail or chapters"),
+    type: str = Query(None, description="movie or series, TMDb only"),
+    key: str = Query(None, description="Query or id; omit to purge the whole op"),
+):
+    check_token(request)
+    if key is None:
+        removed = await cache.purge_prefix(make_key(source, op) + ":")
+    else:
+        # TMDb keys carry the media type after the query/id
+        parts = [key, type] if type else [key]
+        removed = await cache.purge(make_key(source, op, *parts))
+    return {"removed": removed}
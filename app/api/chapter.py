@@ -1,13 +1,24 @@
 from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from pydantic import BaseModel
 from app.services import tmdb, anilist, mangadex
 from app.utils.request_log import log_request
 from fastapi import Request
 from app.utils.logger import logger
+from app.utils.breaker import CircuitOpenError
+from app.utils.deadline import DeadlineExceeded
+from app.utils.serialization import dumps, json_response
 
 router = APIRouter()
 
+# Page iterators used by the streaming endpoint, keyed by media type
+CHAPTER_PAGES = {
+    "series": tmdb.iter_episode_pages,
+    "anime": anilist.iter_episode_pages,
+    "manga": mangadex.iter_chapter_pages,
+}
+
 
 class ChapterOut(BaseModel):
     season: Optional[int] = None  # only for series/anime
@@ -26,17 +37,55 @@ async def get_chapters(
     await log_request(request)
     logger.info(f"[Chapters] Requested type={type}, id={id}")
     try:
+        # with_body reuses the encoding cached with the list, so a hit on a
+        # long chapter list is served without re-serializing it
         if type == "series":
-            return await tmdb.get_episodes(id)
+            _, body = await tmdb.get_episodes.with_body(id)
         elif type == "anime":
-            return await anilist.get_episodes(id)
+            _, body = await anilist.get_episodes.with_body(id)
         elif type == "manga":
-            return await mangadex.get_chapters(id)
+            _, body = await mangadex.get_chapters.with_body(id)
         else:
             raise HTTPException(status_code=400, detail="Invalid media type")
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"[Chapters] Failed for {type}:{id} - {e}")
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to fetch chapters: {str(e)}"
         )
+    return json_response(body)
+
+
+@router.get("/chapter/stream")
+async def stream_chapters(
+    request: Request,
+    type: str = Query(...),
+    id: str = Query(...)
+):
+    type = type.lower()
+    await log_request(request)
+    pages = CHAPTER_PAGES.get(type)
+    if pages is None:
+        raise HTTPException(status_code=400, detail="Invalid media type")
+
+    logger.info(f"[Chapters] Streaming type={type}, id={id}")
+
+    # One JSON object per line, flushed per upstream page as it arrives.
+    # Pages finish in any order, so lines are not sorted by season/number.
+    # If a page fails the stream ends with an {"error": ...} line instead,
+    # since the status code has already been sent.
+    async def ndjson():
+        try:
+            async for _, chapters in pages(id):
+                yield b"".join(dumps(ch) + b"\n" for ch in chapters)
+        except Exception as e:
+            logger.error(f"[Chapters] Stream failed for {type}:{id} - {e}")
+            yield dumps({"error": f"Failed to fetch chapters: {e}"}) + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
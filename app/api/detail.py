@@ -1,10 +1,54 @@
+import asyncio
+from typing import List, Optional
 from fastapi import APIRouter, Query, HTTPException, Request
+from pydantic import BaseModel, Field
 from app.models import SearchResult
 from app.services import tmdb, anilist, rawg, openlibrary, mangadex
+from app.utils.breaker import CircuitOpenError
+from app.utils.deadline import DeadlineExceeded
+from app.utils.limiter import limiter
+from app.utils.logger import logger
 from app.utils.request_log import log_request
+from app.utils.serialization import json_response
 
 router = APIRouter()
 
+# media type -> (cached detail function, extra arguments after the id)
+DETAIL_PROVIDERS = {
+    "movie": (tmdb.get_detail, ("movie",)),
+    "series": (tmdb.get_detail, ("series",)),
+    "anime": (anilist.get_detail, ()),
+    "game": (rawg.get_detail, ()),
+    "book": (openlibrary.get_detail, ()),
+    "manga": (mangadex.get_detail, ()),
+}
+
+# Types whose upstream can resolve many ids in one call:
+# media type -> (bulk lookup, id normalizer returning None for invalid ids)
+BULK_PROVIDERS = {
+    "anime": (anilist.get_details, anilist.normalize_id),
+    "manga": (mangadex.get_details, mangadex.normalize_id),
+}
+
+MAX_BATCH = 100
+BATCH_CONCURRENCY = 8
+
+
+class DetailRef(BaseModel):
+    type: str
+    id: str
+
+
+class DetailBatchIn(BaseModel):
+    items: List[DetailRef] = Field(..., max_length=MAX_BATCH)
+
+
+class DetailBatchItem(BaseModel):
+    type: str
+    id: str
+    result: Optional[SearchResult] = None
+    error: Optional[str] = None
+
 
 @router.get("/detail", response_model=SearchResult)
 async def get_detail(
@@ -14,21 +58,79 @@ async def get_detail(
 ):
     await log_request(request)
     type = type.lower()
+    if type not in DETAIL_PROVIDERS:
+        raise HTTPException(status_code=400, detail="Invalid media type")
+    detail_fn, args = DETAIL_PROVIDERS[type]
     try:
-        if type == "movie" or type == "series":
-            return await tmdb.get_detail(id, type)
-        elif type == "anime":
-            return await anilist.get_detail(id)
-        elif type == "game":
-            return await rawg.get_detail(id)
-        elif type == "book":
-            return await openlibrary.get_detail(id)
-        elif type == "manga":
-            return await mangadex.get_detail(id)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid media type")
+        _, body = await detail_fn.with_body(id, *args)
+        return json_response(body)
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to fetch detail: {str(e)}"
         )
+
+
+@router.post("/detail/batch", response_model=List[DetailBatchItem])
+@limiter.limit("10/minute")
+async def get_detail_batch(request: Request, payload: DetailBatchIn):
+    await log_request(request)
+    items = [DetailBatchItem(type=ref.type.lower(), id=ref.id) for ref in payload.items]
+
+    by_type = {}
+    for item in items:
+        if item.type not in DETAIL_PROVIDERS:
+            item.error = "Invalid media type"
+        else:
+            by_type.setdefault(item.type, []).append(item)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def resolve_one(item: DetailBatchItem):
+        async with semaphore:
+            try:
+                detail_fn, args = DETAIL_PROVIDERS[item.type]
+                item.result = await detail_fn(item.id, *args)
+            except Exception as e:
+                item.error = f"Failed to fetch detail: {str(e)}"
+
+    async def resolve_bulk(type: str, group: List[DetailBatchItem]):
+        get_details, normalize_id = BULK_PROVIDERS[type]
+        # Invalid ids fail on their own instead of failing the whole lookup
+        valid = {}
+        for item in group:
+            id = normalize_id(item.id)
+            if id is None:
+                item.error = "Invalid id"
+            else:
+                valid.setdefault(id, []).append(item)
+        if not valid:
+            return
+        try:
+            found = await get_details(list(valid))
+        except Exception as e:
+            logger.error(f"[Detail] Bulk {type} lookup failed: {e}")
+            for items in valid.values():
+                for item in items:
+                    item.error = f"Failed to fetch detail: {str(e)}"
+            return
+        for id, items in valid.items():
+            for item in items:
+                item.result = found.get(id)
+                if item.result is None:
+                    item.error = "Not found"
+
+    tasks = []
+    for type, group in by_type.items():
+        if type in BULK_PROVIDERS:
+            tasks.append(resolve_bulk(type, group))
+        else:
+            tasks.extend(resolve_one(item) for item in group)
+    await asyncio.gather(*tasks)
+
+    # Items are filled in place, so the response keeps the input order
+    return json_response(items)
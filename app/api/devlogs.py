@@ -4,7 +4,8 @@ from starlette.status import HTTP_401_UNAUTHORIZED
 from hashlib import sha256
 import os
 
-from app.utils.logger import get_recent_logs
+from app.utils.logger import get_recent_logs, get_log_stats
+from app.utils.auth import require_dev_token
 
 router = APIRouter()
 
@@ -23,3 +24,9 @@ async def get_dev_logs(request: Request):
         return "\n".join(logs)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Could not retrieve logs")
+
+
+@router.get("/dev-logs/stats")
+async def get_dev_log_stats(request: Request):
+    require_dev_token(request)
+    return get_log_stats()
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, Query
+import base64
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from datetime import timezone
+from datetime import datetime, timezone
 from app.db import get_db
 from app.models import SearchLog
 from typing import Optional
@@ -9,22 +11,60 @@ from typing import Optional
 router = APIRouter()
 
 
+def encode_cursor(timestamp: datetime, id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/history")
 async def get_history(
+    response: Response,
     limit: int = Query(100, ge=1, le=500),
     type: Optional[str] = Query( None, description="movie, series, anime"),
+    source: Optional[str] = Query(None, description="tmdb, anilist, rawg, mangadex, openlibrary"),
+    since: Optional[datetime] = Query(None, description="Only logs at or after this UTC time"),
+    until: Optional[datetime] = Query(None, description="Only logs before this UTC time"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     session: AsyncSession = Depends(get_db),
 ):
-    stmt = select(SearchLog).order_by(SearchLog.timestamp.desc()).limit(limit)
+    # Keyset pagination on (timestamp, id), newest first, served by the
+    # (type, timestamp DESC, id DESC) and (timestamp DESC, id DESC) indexes.
+    stmt = (
+        select(SearchLog)
+        .order_by(SearchLog.timestamp.desc(), SearchLog.id.desc())
+        .limit(limit)
+    )
 
     if type:
         stmt = stmt.where(SearchLog.type == type)
+    if source:
+        stmt = stmt.where(SearchLog.source == source)
+    if since:
+        stmt = stmt.where(SearchLog.timestamp >= _naive_utc(since))
+    if until:
+        stmt = stmt.where(SearchLog.timestamp < _naive_utc(until))
+    if cursor:
+        timestamp, id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(SearchLog.timestamp, SearchLog.id) < tuple_(timestamp, id))
 
     result = await session.execute(stmt)
     logs = result.scalars().all()
 
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(logs[-1].timestamp, logs[-1].id)
+
     return [
         {
+            "id": log.id,
             "title": log.title,
             "type": log.type,
             "timestamp": log.timestamp.replace(tzinfo=timezone.utc).isoformat(),
@@ -33,3 +73,10 @@ async def get_history(
         }
         for log in logs
     ]
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # search_logs.timestamp is a naive UTC TIMESTAMP column
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
@@ -1,14 +1,53 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_db
+import os
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request, status
+from sqlalchemy import insert
+from app.db import SessionLocal
 from app.models import SearchLog
 from app.models import LogEntry
+from app.utils.auth import require_dev_token
+from app.utils.batching import BatchWriter, QueueFull
+from app.utils import trending_rollup
+from app.utils.suggest import suggest_index
+from app.utils.topk import trending_engine
 
 router = APIRouter()
 
 
+async def flush_search_logs(rows: list[dict]):
+    # One multi-row INSERT plus the rollup upserts, one commit per batch
+    async with SessionLocal() as session:
+        await session.execute(insert(SearchLog).values(rows))
+        await trending_rollup.record_views(session, rows)
+        await session.commit()
+
+
+log_writer = BatchWriter(
+    "search_logs",
+    flush_search_logs,
+    max_batch=int(os.getenv("LOG_BATCH_SIZE", "500")),
+    max_delay=float(os.getenv("LOG_FLUSH_INTERVAL", "1.0")),
+    max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+)
+
+
 @router.post("/log", status_code=status.HTTP_204_NO_CONTENT)
-async def log_entry(entry: LogEntry, db: AsyncSession = Depends(get_db)):
-    log = SearchLog(**entry.dict())
-    db.add(log)
-    await db.commit()
+async def log_entry(entry: LogEntry):
+    try:
+        # Stamped here rather than by the database default, so the rollups
+        # bucket each view by the same UTC day that is stored with it
+        await log_writer.put({**entry.model_dump(), "timestamp": datetime.utcnow()})
+    except QueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Log ingestion is backed up, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    trending_engine.record(entry.type, entry.source, entry.source_id, entry.title)
+    suggest_index.record(entry.type, entry.source, entry.source_id, entry.title)
+
+
+@router.get("/log/stats")
+async def log_stats(request: Request):
+    require_dev_token(request)
+    return log_writer.snapshot()
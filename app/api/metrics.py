@@ -0,0 +1,132 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+from app.db import pool_stats
+from app.utils import catalog, metrics, outbound
+from app.utils.auth import require_dev_token
+from app.utils.cache import cache, revalidator
+from app.utils.limiter import limiter
+from app.utils.logger import get_log_stats
+from app.utils.metrics import gauge, register_collector
+from app.utils.singleflight import flights
+from app.utils.suggest import suggest_index
+from app.api.log import log_writer
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@register_collector
+def _cache_metrics():
+    snapshot = cache.snapshot()
+    lookups = []
+    ratios = []
+    for namespace, counts in snapshot["namespaces"].items():
+        for result in ("memory_hits", "disk_hits", "misses", "stale_served", "revalidated"):
+            lookups.append(((namespace, result), counts[result]))
+        ratios.append(((namespace,), counts["hit_ratio"]))
+    coalesced = [
+        ((namespace,), counts["coalesced"]) for namespace, counts in flights.stats.items()
+    ]
+    refresh = revalidator.snapshot()
+    return [
+        *gauge("bingepal_cache_lookups_total", "Response cache lookups by result",
+               lookups, ("namespace", "result"), type="counter"),
+        *gauge("bingepal_cache_hit_ratio", "Response cache hit ratio", ratios, ("namespace",)),
+        *gauge("bingepal_cache_entries", "Entries in the in-memory cache",
+               [((), snapshot["memory_entries"])]),
+        *gauge("bingepal_coalesced_calls_total", "Lookups that joined an in-flight call",
+               coalesced, ("namespace",), type="counter"),
+        *gauge("bingepal_cache_revalidations_total", "Background cache refreshes by outcome",
+               [((outcome,), refresh[outcome]) for outcome in ("refreshed", "failed", "skipped")],
+               ("outcome",), type="counter"),
+        *gauge("bingepal_cache_revalidations_pending", "Background cache refreshes queued or running",
+               [((), refresh["pending"])]),
+    ]
+
+
+@register_collector
+def _db_pool_metrics():
+    stats = pool_stats()
+    return [
+        *gauge("bingepal_db_pool_size", "Configured DB pool size", [((), stats["pool_size"])]),
+        *gauge("bingepal_db_pool_checked_out", "DB connections in use", [((), stats["checked_out"])]),
+        *gauge("bingepal_db_pool_overflow", "DB overflow connections open", [((), stats["overflow"])]),
+        *gauge("bingepal_db_pool_checkouts_total", "DB connection checkouts",
+               [((), stats["checkouts"])], type="counter"),
+        *gauge("bingepal_db_pool_wait_max_seconds", "Longest DB pool checkout wait",
+               [((), stats["max_wait_ms"] / 1000)]),
+    ]
+
+
+@register_collector
+def _upstream_metrics():
+    queued = []
+    waits = []
+    breaker_open = []
+    for name, stats in outbound.snapshot().items():
+        queued.append(((name,), stats["queue_depth"]))
+        waits.append(((name,), stats["avg_wait_ms"] / 1000))
+        breaker_open.append(((name,), int(stats["breaker"]["state"] != "closed")))
+    return [
+        *gauge("bingepal_upstream_queue_depth", "Calls waiting for a rate-limit token",
+               queued, ("provider",)),
+        *gauge("bingepal_upstream_scheduler_wait_avg_seconds", "Average rate-limit queueing delay",
+               waits, ("provider",)),
+        *gauge("bingepal_upstream_circuit_open", "1 while the provider's circuit is not closed",
+               breaker_open, ("provider",)),
+    ]
+
+
+@register_collector
+def _pipeline_metrics():
+    writer = log_writer.snapshot()
+    logs = get_log_stats()
+    return [
+        *gauge("bingepal_log_writer_queue_depth", "Search log events waiting to be flushed",
+               [((), writer["queue_depth"])]),
+        *gauge("bingepal_log_writer_rejected_total", "Search log events rejected by backpressure",
+               [((), writer["rejected"])], type="counter"),
+        *gauge("bingepal_app_log_dropped_total", "Application log records dropped",
+               [((), logs["dropped"])], type="counter"),
+    ]
+
+
+@register_collector
+def _catalog_metrics():
+    stats = catalog.snapshot()
+    return [
+        *gauge("bingepal_catalog_lookups_total", "Searches checked against the local catalog",
+               [((), stats["lookups"])], type="counter"),
+        *gauge("bingepal_catalog_served_total", "Searches answered from the local catalog",
+               [((), stats["served"])], type="counter"),
+        *gauge("bingepal_catalog_writer_queue_depth", "Results waiting to be indexed",
+               [((), stats["writer"]["queue_depth"])]),
+    ]
+
+
+@register_collector
+def _suggest_metrics():
+    titles = [((type,), len(index.titles)) for type, index in suggest_index.types.items()]
+    return gauge("bingepal_suggest_titles", "Titles in the typeahead index", titles, ("type",))
+
+
+@register_collector
+def _rate_limit_metrics():
+    stats = limiter.snapshot()
+    return [
+        *gauge("bingepal_rate_limit_checks_total", "Rate limit checks by result",
+               [(("allowed",), stats["checks"] - stats["rejected"]), (("rejected",), stats["rejected"])],
+               ("result",), type="counter"),
+        *gauge("bingepal_rate_limit_backend_errors_total", "Rate limit batches let through on backend errors",
+               [((), stats["errors"])], type="counter"),
+        *gauge("bingepal_rate_limit_batch_avg_seconds", "Average rate limit backend round trip per batch",
+               [((), stats["avg_batch_ms"] / 1000)]),
+    ]
+
+
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    require_dev_token(request)
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
@@ -1,90 +1,255 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import text
 from sqlalchemy.future import select
-from app.models import SessionLocal, Rating
-from pydantic import BaseModel
+from app.db import get_db
+from app.models import Rating, RatingAggregate
+from pydantic import BaseModel, Field
 from typing import Optional, List
 import datetime
+import math
 from sqlalchemy import and_
 from fastapi import status
+from app.utils.auth import require_dev_token
+from app.utils.limiter import limiter
 from app.utils.request_log import log_request
 
 router = APIRouter()
 
+HISTOGRAM_BUCKETS = 11  # scores rounded to 0..10
+MAX_BULK = 1000
+
 
 class RatingIn(BaseModel):
     source: str
     source_id: str
     username: str
-    rate_score: float
-    rate_descr: Optional[str]
+    rate_score: float = Field(..., ge=0, le=10)
+    rate_descr: Optional[str] = None
 
 
 class RatingOut(RatingIn):
     timestamp: datetime.datetime
 
 
-async def get_db():
-    async with SessionLocal() as session:
-        yield session
+class RatingSummary(BaseModel):
+    source: str
+    source_id: str
+    count: int
+    average: Optional[float]
+    histogram: List[int]
+
+
+# Locks the batch's existing ratings, in key order so concurrent writers
+# queue instead of deadlocking, and reads the scores they replace.
+LOCK_PREVIOUS = text("""
+SELECT r.username, r.source, r.source_id, r.rate_score
+FROM ratings r
+JOIN unnest(
+    CAST(:usernames AS text[]),
+    CAST(:sources AS text[]),
+    CAST(:source_ids AS text[])
+) AS i(username, source, source_id) USING (username, source, source_id)
+ORDER BY r.username, r.source, r.source_id
+FOR UPDATE OF r
+""")
+
+# Upserts a batch in one statement; `inserted` (xmax = 0) tells new rows
+# from ones that replaced an earlier score.
+UPSERT_RATINGS = text("""
+INSERT INTO ratings (username, source, source_id, rate_score, rate_descr, timestamp)
+SELECT username, source, source_id, rate_score, rate_descr, now() AT TIME ZONE 'utc'
+FROM unnest(
+    CAST(:usernames AS text[]),
+    CAST(:sources AS text[]),
+    CAST(:source_ids AS text[]),
+    CAST(:scores AS float8[]),
+    CAST(:descrs AS text[])
+) AS t(username, source, source_id, rate_score, rate_descr)
+ON CONFLICT (username, source, source_id) DO UPDATE SET
+    rate_score = EXCLUDED.rate_score,
+    rate_descr = EXCLUDED.rate_descr,
+    timestamp = EXCLUDED.timestamp
+RETURNING username, source, source_id, rate_score, rate_descr, timestamp, (xmax = 0) AS inserted
+""")
+
+# Attempts before giving up when first ratings of the same title by the
+# same user keep racing each other
+UPSERT_ATTEMPTS = 3
+
+APPLY_AGGREGATE = text("""
+INSERT INTO rating_aggregates (source, source_id, rating_count, rating_sum, histogram)
+VALUES (:source, :source_id, :count, :total, CAST(:histogram AS integer[]))
+ON CONFLICT (source, source_id) DO UPDATE SET
+    rating_count = rating_aggregates.rating_count + EXCLUDED.rating_count,
+    rating_sum = rating_aggregates.rating_sum + EXCLUDED.rating_sum,
+    histogram = ARRAY(
+        SELECT a + b
+        FROM unnest(rating_aggregates.histogram, EXCLUDED.histogram) WITH ORDINALITY AS h(a, b, i)
+        ORDER BY i
+    )
+""")
+
+DELETE_RATING = text("""
+DELETE FROM ratings
+WHERE username = :username AND source = :source AND source_id = :source_id
+RETURNING rate_score
+""")
+
+
+def _bucket(score: float) -> int:
+    # Halves round up, as floor(score + 0.5) in the schema migration does
+    return min(max(math.floor(score + 0.5), 0), HISTOGRAM_BUCKETS - 1)
+
+
+async def _apply_changes(db, changes):
+    # changes: (source, source_id, previous_score or None, new_score or None)
+    deltas = {}
+    for source, source_id, previous, new in changes:
+        delta = deltas.setdefault(
+            (source, source_id),
+            {"count": 0, "total": 0.0, "histogram": [0] * HISTOGRAM_BUCKETS}
+        )
+        if previous is not None:
+            delta["count"] -= 1
+            delta["total"] -= previous
+            delta["histogram"][_bucket(previous)] -= 1
+        if new is not None:
+            delta["count"] += 1
+            delta["total"] += new
+            delta["histogram"][_bucket(new)] += 1
+
+    # Sorted so concurrent writers lock aggregate rows in the same order
+    params = [
+        {"source": source, "source_id": source_id, **delta}
+        for (source, source_id), delta in sorted(deltas.items())
+    ]
+    if params:
+        await db.execute(APPLY_AGGREGATE, params)
+
+
+async def upsert_ratings(db, ratings: List[RatingIn]) -> list:
+    # ON CONFLICT cannot touch the same row twice in one statement: last wins
+    unique = {(r.username, r.source, r.source_id): r for r in ratings}
+    rows = list(unique.values())
+    keys = {
+        "usernames": [r.username for r in rows],
+        "sources": [r.source for r in rows],
+        "source_ids": [r.source_id for r in rows],
+    }
+
+    for _ in range(UPSERT_ATTEMPTS):
+        locked = await db.execute(LOCK_PREVIOUS, keys)
+        previous = {(u, s, sid): score for u, s, sid, score in locked.all()}
+        result = await db.execute(UPSERT_RATINGS, {
+            **keys,
+            "scores": [r.rate_score for r in rows],
+            "descrs": [r.rate_descr for r in rows],
+        })
+        written = result.mappings().all()
+        changes = []
+        for row in written:
+            key = (row["username"], row["source"], row["source_id"])
+            if not row["inserted"] and key not in previous:
+                # Another request inserted this rating after the lock was
+                # taken, so the score it replaced is unknown: start over
+                # and lock the row this time
+                break
+            changes.append((row["source"], row["source_id"], previous.get(key), row["rate_score"]))
+        else:
+            await _apply_changes(db, changes)
+            await db.commit()
+            return written
+        await db.rollback()
+    raise HTTPException(status_code=409, detail="Rating changed concurrently, retry")
 
 
 @router.post("/rate", response_model=RatingOut)
-async def add_or_update_rating(payload: RatingIn, db=Depends(get_db)):
-    await log_request()
-    
-    query = select(Rating).where(
-        Rating.username == payload.username,
-        Rating.source == payload.source,
-        Rating.source_id == payload.source_id
-    )
-    result = await db.execute(query)
-    existing = result.scalar_one_or_none()
+async def add_or_update_rating(request: Request, payload: RatingIn, db=Depends(get_db)):
+    await log_request(request)
+    written = await upsert_ratings(db, [payload])
+    return RatingOut(**{k: written[0][k] for k in RatingOut.model_fields})
 
-    if existing:
-        existing.rate_score = payload.rate_score
-        existing.rate_descr = payload.rate_descr
-        existing.timestamp = datetime.datetime.utcnow()
-    else:
-        new_rating = Rating(**payload.dict())
-        db.add(new_rating)
 
-    await db.commit()
-    return payload
+@router.post("/rate/bulk")
+@limiter.limit("10/minute")
+async def import_ratings(
+    request: Request,
+    payload: List[RatingIn],
+    db=Depends(get_db)
+):
+    # Writes ratings for any username, so it is an admin import tool
+    require_dev_token(request)
+    await log_request(request)
+    if len(payload) > MAX_BULK:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK} ratings per request")
+    if not payload:
+        return {"imported": 0}
+    written = await upsert_ratings(db, payload)
+    return {"imported": len(written)}
 
 
 @router.get("/rate", response_model=List[RatingOut])
-async def get_ratings(source: str, source_id: str, db=Depends(get_db)):
+async def get_ratings(
+    response: Response,
+    source: str,
+    source_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor value from the previous page"),
+    db=Depends(get_db)
+):
+    # Newest first, keyset-paginated on id via ix_ratings_title_id
     query = select(Rating).where(
         and_(
             Rating.source == source,
             Rating.source_id == source_id
         )
-    )
+    ).order_by(Rating.id.desc()).limit(limit)
+    if cursor is not None:
+        query = query.where(Rating.id < cursor)
+
     result = await db.execute(query)
     ratings = result.scalars().all()
+    if len(ratings) == limit:
+        response.headers["X-Next-Cursor"] = str(ratings[-1].id)
     return ratings
 
 
+@router.get("/rate/summary", response_model=RatingSummary)
+async def get_rating_summary(source: str, source_id: str, db=Depends(get_db)):
+    aggregate = await db.get(RatingAggregate, (source, source_id))
+    if aggregate is None or aggregate.rating_count <= 0:
+        return RatingSummary(
+            source=source, source_id=source_id, count=0, average=None,
+            histogram=[0] * HISTOGRAM_BUCKETS
+        )
+    return RatingSummary(
+        source=source,
+        source_id=source_id,
+        count=aggregate.rating_count,
+        average=round(aggregate.rating_sum / aggregate.rating_count, 2),
+        histogram=aggregate.histogram
+    )
+
+
 @router.delete("/rate", status_code=status.HTTP_204_NO_CONTENT)
+@limiter.limit("30/minute")
 async def delete_rating(
+    request: Request,
     source: str, 
     source_id: str, 
     username: str, 
     db=Depends(get_db)
 ):
-    query = select(Rating).where(
-        and_(
-            Rating.source == source,
-            Rating.source_id == source_id,
-            Rating.username == username
-        )
-    )
-    result = await db.execute(query)
-    rating = result.scalar_one_or_none()
-
-    if not rating:
+    result = await db.execute(DELETE_RATING, {
+        "username": username,
+        "source": source,
+        "source_id": source_id
+    })
+    previous = result.scalar_one_or_none()
+
+    if previous is None:
         raise HTTPException(status_code=404, detail="Rating not found")
 
-    await db.delete(rating)
+    await _apply_changes(db, [(source, source_id, previous, None)])
     await db.commit()
     return
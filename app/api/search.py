@@ -1,33 +1,123 @@
 # Route handler
 
+import asyncio
+import os
+import time
+from typing import Optional, Union
 from fastapi import APIRouter, Query, HTTPException, Request
+from pydantic import BaseModel
 from app.models import SearchResult
 from app.services import tmdb, anilist, rawg, mangadex, openlibrary
+from app.utils import catalog
+from app.utils.cache import make_key
 from app.utils.limiter import limiter
+from app.utils.logger import logger
 from app.utils.request_log import log_request
+from app.utils.serialization import dumps, join_arrays, json_response
 
 router = APIRouter()
 
+# media type -> (source, cached search function, extra arguments after the query)
+SEARCH_PROVIDERS = {
+    "movie": ("tmdb", tmdb.search, ("movie",)),
+    "series": ("tmdb", tmdb.search, ("series",)),
+    "anime": ("anilist", anilist.search, ()),
+    "game": ("rawg", rawg.search, ()),
+    "manga": ("mangadex", mangadex.search, ()),
+    "book": ("openlibrary", openlibrary.search, ()),
+}
 
-@router.get("/search", response_model=list[SearchResult])
+PROVIDER_DEADLINE = float(os.getenv("SEARCH_PROVIDER_DEADLINE", "2.5"))
+
+
+class ProviderStatus(BaseModel):
+    source: str
+    status: str  # ok, catalog, timeout, error
+    count: int
+    elapsed_ms: int
+
+
+class FederatedSearchOut(BaseModel):
+    results: list[SearchResult]
+    providers: dict[str, ProviderStatus]
+
+
+@router.get("/search", response_model=Union[list[SearchResult], FederatedSearchOut])
 @limiter.limit("10/minute")
 async def search(
     request: Request, 
     query: str = Query(...), 
-    type: str = Query(...)
+    type: str = Query(..., description="movie, series, anime, game, manga, book, a comma-separated list or all"),
+    deadline: Optional[float] = Query(None, gt=0, le=10, description="Per-provider deadline in seconds for multi-type searches")
 ):
     type = type.lower()
     await log_request(request)
 
-    if type == "movie" or type == "series":
-        return await tmdb.search(query, type)
-    elif type == "anime":
-        return await anilist.search(query)
-    elif type == "game":
-        return await rawg.search(query)
-    elif type == "manga":
-        return await mangadex.search(query)
-    elif type == "book":
-        return await openlibrary.search(query)
+    if type == "all":
+        types = list(SEARCH_PROVIDERS)
     else:
+        types = list(dict.fromkeys(t.strip() for t in type.split(",") if t.strip()))
+    if not types or any(t not in SEARCH_PROVIDERS for t in types):
         raise HTTPException(status_code=400, detail="Invalid media type")
+
+    if len(types) == 1:
+        try:
+            _, _, body = await search_one(query, types[0])
+        except Exception as e:
+            # A single-type search has no status to report, so it keeps
+            # answering with an empty list when the provider fails
+            logger.error(f"[Search] {types[0]} failed for '{query}': {e}")
+            body = b"[]"
+        return json_response(body)
+
+    return json_response(await federated_search(query, types, deadline or PROVIDER_DEADLINE))
+
+
+async def search_one(query: str, type: str):
+    """(from_catalog, result count, encoded results) for one media type.
+
+    Order: response cache, then the local catalog when it has enough
+    full-text matches (stale ones are refreshed in the background), then
+    the provider. Whatever the provider returns is indexed into the catalog.
+    Provider failures raise, so the federated search can report them.
+    """
+    source, search_fn, args = SEARCH_PROVIDERS[type]
+    # A probe: the lookup is counted once, by with_body or not at all when
+    # the catalog answers
+    if await search_fn.peek(query, *args, record=False) is None:
+        found = await catalog.lookup(query, type)
+        if found is not None:
+            count, body, stale = found
+            if stale:
+                catalog.refresh(make_key(source, "search", query, *args), lambda: search_fn(query, *args))
+            return True, count, body
+
+    # Results are served as the bytes cached alongside them
+    results, body = await search_fn.with_body(query, *args)
+    return False, len(results), body
+
+
+async def federated_search(query: str, types: list[str], deadline: float) -> bytes:
+    """Encoded FederatedSearchOut, spliced from each provider's cached bytes."""
+    async def run(type: str):
+        source = SEARCH_PROVIDERS[type][0]
+        start = time.perf_counter()
+        count, body = 0, b"[]"
+        try:
+            from_catalog, count, body = await asyncio.wait_for(search_one(query, type), deadline)
+            status = "catalog" if from_catalog else "ok"
+        except asyncio.TimeoutError:
+            status = "timeout"
+        except Exception as e:
+            logger.error(f"[Search] {source} failed for '{query}' ({type}): {e}")
+            status = "error"
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return type, body, ProviderStatus(
+            source=source, status=status, count=count, elapsed_ms=elapsed_ms
+        )
+
+    outcomes = await asyncio.gather(*(run(t) for t in types))
+
+    results = join_arrays([body for _, body, _ in outcomes])
+    providers = dumps({type: status for type, _, status in outcomes})
+    return b'{"results":' + results + b',"providers":' + providers + b"}"
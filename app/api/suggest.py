@@ -0,0 +1,17 @@
+from typing import Optional
+from fastapi import APIRouter, Query
+from app.utils.serialization import json_response
+from app.utils.suggest import MAX_RESULTS, suggest_index
+
+router = APIRouter()
+
+
+# Not rate limited like /api/search: it is answered from memory and is
+# meant to be called on every keystroke
+@router.get("/suggest")
+async def suggest(
+    prefix: str = Query(..., max_length=100),
+    type: Optional[str] = Query(None, description="movie, series, anime, game, manga or book; all types if omitted"),
+    limit: int = Query(MAX_RESULTS, ge=1, le=MAX_RESULTS),
+):
+    return json_response(suggest_index.suggest(prefix, type.lower() if type else None, limit))
@@ -5,7 +5,8 @@ from sqlalchemy import func
 from datetime import datetime, timedelta
 
 from app.db import get_db
-from app.models import SearchLog
+from app.models import TrendingDaily, TrendingTotal
+from app.utils.topk import trending_engine
 
 router = APIRouter()
 
@@ -22,14 +23,45 @@ async def get_trending(
     ),
     session: AsyncSession = Depends(get_db),
 ):
-    stmt = select(SearchLog.title, func.count().label("count")).where(SearchLog.type == type)
+    if trending_engine.ready:
+        trending = trending_engine.top(type, days)
+        return {"type": type, "days": days, "trending": trending}
 
+    # Until the in-memory engine is ready, answer from the rollups maintained
+    # on log ingestion, never from the raw search_logs table. Windows are
+    # whole UTC days: `days` of them, today included, as in the engine.
     if days > 0:
-        since = datetime.utcnow() - timedelta(days=days)
-        stmt = stmt.where(SearchLog.timestamp >= since)
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        total = func.sum(TrendingDaily.count)
+        stmt = (
+            select(
+                TrendingDaily.source,
+                TrendingDaily.source_id,
+                func.max(TrendingDaily.title),
+                total.label("count")
+            )
+            .where(TrendingDaily.type == type, TrendingDaily.day >= since)
+            .group_by(TrendingDaily.source, TrendingDaily.source_id)
+            .order_by(total.desc())
+            .limit(10)
+        )
+    else:
+        stmt = (
+            select(
+                TrendingTotal.source,
+                TrendingTotal.source_id,
+                TrendingTotal.title,
+                TrendingTotal.count
+            )
+            .where(TrendingTotal.type == type)
+            .order_by(TrendingTotal.count.desc())
+            .limit(10)
+        )
 
-    stmt = stmt.group_by(SearchLog.title).order_by(func.count().desc()).limit(10)
     result = await session.execute(stmt)
 
-    trending = [{"title": row[0], "count": row[1]} for row in result.all()]
+    trending = [
+        {"title": row[2], "count": int(row[3]), "source": row[0], "source_id": row[1]}
+        for row in result.all()
+    ]
     return {"type": type, "days": days, "trending": trending}
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Request
+
+from app.utils import outbound
+from app.utils.auth import require_dev_token
+
+router = APIRouter()
+
+
+@router.get("/upstream/stats")
+async def get_upstream_stats(request: Request):
+    require_dev_token(request)
+    return {"schedulers": outbound.snapshot()}
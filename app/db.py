@@ -1,12 +1,67 @@
+import asyncio
 import os
+import re
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.utils.logger import logger
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+WARMUP_CONNECTIONS = int(os.getenv("DB_WARMUP_CONNECTIONS", str(min(POOL_SIZE, 4))))
+# Create missing tables and run pending migrations when the database is
+# behind SCHEMA_VERSION; with this off, startup fails instead and schema.sql
+# has to be applied by hand.
+AUTO_CREATE_SCHEMA = os.getenv("DB_AUTO_CREATE_SCHEMA", "true").lower() in ("1", "true", "yes")
+# Arbitrary key for the advisory lock that serializes schema creation
+SCHEMA_LOCK_ID = 727431
+
+pool_waits = {"checkouts": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = (time.perf_counter() - start) * 1000
+            pool_waits["checkouts"] += 1
+            pool_waits["total_wait_ms"] += waited
+            if waited > pool_waits["max_wait_ms"]:
+                pool_waits["max_wait_ms"] = waited
+
+
+def _connect_args() -> dict:
+    if DATABASE_URL and make_url(DATABASE_URL).get_driver_name() == "asyncpg":
+        return {"prepared_statement_cache_size": STATEMENT_CACHE_SIZE}
+    return {}
+
+
 try:
-    engine = create_async_engine(DATABASE_URL, echo=False)
+    engine = create_async_engine(
+        DATABASE_URL,
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+        connect_args=_connect_args(),
+    )
     SessionLocal = async_sessionmaker(
         bind=engine, 
         class_=AsyncSession, 
@@ -24,3 +79,126 @@ except Exception as e:
 async def get_db() -> AsyncSession:
     async with SessionLocal() as session:
         yield session
+
+
+async def warm_pool(count: int = WARMUP_CONNECTIONS):
+    """Open `count` connections concurrently so first requests skip the handshake."""
+    async def open_one():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(open_one() for _ in range(count)), return_exceptions=True)
+    opened = 0
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"[DB] Warmup connection failed: {result}")
+            continue
+        await result.close()
+        opened += 1
+    elapsed = (time.perf_counter() - start) * 1000
+    logger.info(f"[DB] Warmed {opened}/{count} pooled connections in {elapsed:.0f} ms")
+
+
+async def _schema_version(conn):
+    try:
+        # In a savepoint, so a missing table does not abort the transaction
+        async with conn.begin_nested():
+            return (await conn.execute(text("SELECT max(version) FROM schema_version"))).scalar()
+    except DBAPIError:
+        return None
+
+
+# Name of the index a CREATE INDEX CONCURRENTLY statement builds
+CONCURRENT_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.I)
+
+
+async def _wait_for_schema_lock(conn):
+    # Polled rather than blocking: a session stuck in pg_advisory_lock holds
+    # a snapshot, which CREATE INDEX CONCURRENTLY in the holder waits out
+    while not (await conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": SCHEMA_LOCK_ID})).scalar():
+        await asyncio.sleep(0.5)
+
+
+async def _run_concurrently(conn, statement: str):
+    match = CONCURRENT_INDEX.search(statement)
+    if match is not None:
+        # A build that failed or was killed leaves an invalid index behind,
+        # which IF NOT EXISTS would then skip
+        invalid = (await conn.execute(
+            text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": match.group(1)},
+        )).scalar()
+        if invalid:
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}"))
+    await conn.execute(text(statement))
+
+
+async def ensure_schema(version: int, migrations: dict):
+    """Check the recorded schema version; only migrate when behind.
+
+    The common case is one indexed read instead of reflecting every table.
+    Otherwise create_all adds missing tables (it never alters existing
+    ones), then the DDL in `migrations` runs for every version after the
+    recorded one. Each version is one transaction that records it, so a
+    failed step leaves the recorded version at the last one that completed.
+    Versions whose DDL is CONCURRENTLY (index builds on busy tables) cannot
+    run in a transaction; they run statement by statement and are safe to
+    repeat. Workers booting together serialize on an advisory lock, so only
+    one of them migrates.
+    """
+    async with engine.connect() as conn:
+        current = await _schema_version(conn)
+    if current is not None and current >= version:
+        if current > version:
+            logger.warning(f"[DB] Schema version {current} is newer than this build ({version})")
+        return
+
+    if not AUTO_CREATE_SCHEMA:
+        raise RuntimeError(
+            f"Database schema is at version {current}, expected {version}; apply schema.sql"
+        )
+
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await _wait_for_schema_lock(lock_conn)
+        try:
+            async with engine.begin() as conn:
+                current = await _schema_version(conn)
+                await conn.run_sync(Base.metadata.create_all)
+            # A database created before versioning has the original tables
+            # and none of the later DDL, so it starts from the first migration
+            for step in range((current or 0) + 1, version + 1):
+                statements = migrations.get(step, ())
+                record = text("INSERT INTO schema_version (version) VALUES (:version)")
+                if any("CONCURRENTLY" in statement for statement in statements):
+                    for statement in statements:
+                        await _run_concurrently(lock_conn, statement)
+                    await lock_conn.execute(record, {"version": step})
+                    continue
+                async with engine.begin() as conn:
+                    for statement in statements:
+                        await conn.execute(text(statement))
+                    await conn.execute(record, {"version": step})
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEMA_LOCK_ID})
+    logger.info(f"[DB] Schema migrated from version {current} to {version}")
+
+
+def pool_stats() -> dict:
+    pool = engine.sync_engine.pool
+    checked_out = pool.checkedout()
+    capacity = pool.size() + MAX_OVERFLOW
+    checkouts = pool_waits["checkouts"]
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": MAX_OVERFLOW,
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "utilization": round(checked_out / capacity, 4) if capacity else 0.0,
+        "checkouts": checkouts,
+        "avg_wait_ms": round(pool_waits["total_wait_ms"] / checkouts, 3) if checkouts else 0.0,
+        "max_wait_ms": round(pool_waits["max_wait_ms"], 3),
+    }
@@ -1,42 +1,110 @@
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
 
-from slowapi import _rate_limit_exceeded_handler
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.models import Base, engine
+from app.db import engine, SessionLocal, ensure_schema, warm_pool, pool_stats
+from app.models import MIGRATIONS, SCHEMA_VERSION
 from app.utils.limiter import limiter
+from app.utils.http_client import start_clients, close_clients
+from app.utils import deadline, outbound
+from app.utils.cache import revalidator
+from app.utils.metrics import MetricsMiddleware, start_loop_monitor, stop_loop_monitor
+from app.utils import trending_rollup
+from app.utils.catalog import catalog_writer, refresher as catalog_refresher, start_catalog
+from app.utils.suggest import start_suggest_index
+from app.utils.warmer import start_cache_warmer, stop_cache_warmer
+from app.utils.topk import start_trending_engine, stop_trending_engine
+from app.utils.serialization import JSONBytesResponse
 
 from starlette.status import HTTP_401_UNAUTHORIZED
 
 from app.api.search import router as search_router
+from app.api.suggest import router as suggest_router
 from app.api.detail import router as detail_router
 from app.api.chapter import router as chapter_router
 from app.api.trending import router as trending_router
 from app.api.history import router as history_router
-from app.api.log import router as log_router
+from app.api.log import router as log_router, log_writer
 from app.api.devlogs import router as devlog_router
+from app.api.cache import router as cache_router
+from app.api.rate import router as rate_router
+from app.api.upstream import router as upstream_router
+from app.api.metrics import router as metrics_router
 
 from fastapi.exceptions import RequestValidationError
-from app.utils.logger import logger 
+from app.utils.logger import logger, stop_logging
 
 logger.info("Backend started and logger initialized.")
 
+# End-to-end budget for a request, passed down to every upstream call
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "10"))
+
+
+async def _warm_background():
+    # Nothing here gates serving: provider clients are also built on first
+    # use, and /api/trending answers from the SQL rollups until the
+    # in-memory engine is ready.
+    async def rollups():
+        try:
+            async with SessionLocal() as session:
+                await trending_rollup.rebuild_if_empty(session)
+        except Exception as e:
+            logger.error(f"[Startup] Rollup rebuild failed: {e}")
+        # Both load from the rollups, so they wait for a rebuild
+        return await asyncio.gather(
+            start_trending_engine(SessionLocal), start_suggest_index(SessionLocal),
+            return_exceptions=True,
+        )
+
+    clients, loaded, catalog = await asyncio.gather(
+        start_clients(), rollups(), start_catalog(), return_exceptions=True
+    )
+    for result in [clients, catalog, *(loaded if isinstance(loaded, list) else [loaded])]:
+        if isinstance(result, Exception):
+            logger.error(f"[Startup] Background warmup failed: {result}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start = time.perf_counter()
+    start_loop_monitor()
+    log_writer.start()
+    catalog_writer.start()
+    await asyncio.gather(ensure_schema(SCHEMA_VERSION, MIGRATIONS), warm_pool())
+    background = asyncio.create_task(_warm_background())
+    start_cache_warmer()
+    logger.info(f"[Startup] Ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+    try:
+        yield
+    finally:
+        background.cancel()
+        await asyncio.gather(background, return_exceptions=True)
+        await stop_cache_warmer()
+        await revalidator.stop()
+        await catalog_refresher.stop()
+        await log_writer.stop()
+        await catalog_writer.stop()
+        await stop_trending_engine()
+        await close_clients()
+        await limiter.close()
+        await engine.dispose()
+        stop_loop_monitor()
+        stop_logging()
+
+
 app = FastAPI(
     title="BingePal API",
     description="API for movies, anime, tv series, games, manga and books",
-    version="0.1.0"
+    version="0.1.0",
+    # Endpoints on the hot path return pre-encoded bytes via app.utils.serialization
+    default_response_class=JSONBytesResponse,
+    lifespan=lifespan,
 )
 
-
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-# https://www.youtube.com/watch?v=lFTNS_QStTs
-app.state.limiter = limiter
-app.add_exception_handler(429, _rate_limit_exceeded_handler)
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -44,9 +112,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    # Streams run long by design; their pages are bounded by the HTTP timeouts
+    if request.url.path.endswith("/stream"):
+        return await call_next(request)
+    with deadline.scope(REQUEST_DEADLINE):
+        return await call_next(request)
+
+# Added last so it is outermost and times the whole middleware stack
+app.add_middleware(MetricsMiddleware)
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled error: {exc}")
@@ -68,21 +149,24 @@ async def validation_exception_handler(
     )
 
 app.include_router(search_router, prefix="/api")
+app.include_router(suggest_router, prefix="/api")
 app.include_router(detail_router, prefix="/api")
 app.include_router(chapter_router, prefix="/api")
 app.include_router(trending_router, prefix="/api")
 app.include_router(history_router, prefix="/api")
 app.include_router(log_router, prefix="/api")
 app.include_router(devlog_router, prefix="/api")
+app.include_router(cache_router, prefix="/api")
+app.include_router(rate_router, prefix="/api")
+app.include_router(upstream_router, prefix="/api")
+app.include_router(metrics_router)
 
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "message": "BingePal API is alive"}
-
-# DB startup
-@app.on_event("startup")
-async def on_startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
+    return {
+        "status": "ok",
+        "message": "BingePal API is alive",
+        "db_pool": pool_stats(),
+        "upstreams": outbound.breaker_states(),
+    }
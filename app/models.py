@@ -1,22 +1,54 @@
 from pydantic import BaseModel
-from typing import Optional, List
-from sqlalchemy import Column, String, Integer, DateTime, Float, ForeignKey, Enum, Text, TIMESTAMP, func
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import Literal, Optional, List, get_args
+from sqlalchemy import Column, String, Integer, DateTime, Date, Float, ForeignKey, Enum, Text, TIMESTAMP, Index, Computed, Boolean, false, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
 import enum
 import datetime
-import os
-# from app.db import Base
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-engine = create_async_engine(DATABASE_URL, echo=True)
-SessionLocal = sessionmaker(
-    engine, 
-    expire_on_commit=False, 
-    class_=AsyncSession
-)
-Base = declarative_base()
+from app.db import Base
+
+# Bump whenever a table or index below changes (and update schema.sql); the
+# app compares it with the schema_version table at startup.
+SCHEMA_VERSION = 4
+
+# version -> DDL that brings an existing database from the previous version
+# to it. New tables come from create_all, which runs first and never touches
+# existing ones, so changes to existing tables go here. Statements also run
+# on freshly created schemas and must be no-ops there (IF [NOT] EXISTS).
+# Index builds on large, busy tables use CONCURRENTLY, so they do not
+# block writes; such a version must contain only statements that can run
+# outside a transaction.
+MIGRATIONS = {
+    # Keyset pagination indexes for /api/history; the composite
+    # (timestamp, id) one supersedes the single-column timestamp index
+    3: [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_search_logs_type_ts_id ON search_logs (type, timestamp DESC, id DESC)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_search_logs_ts_id ON search_logs (timestamp DESC, id DESC)",
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_search_logs_timestamp",
+    ],
+    # One rating per user and title, which the upserts in app/api/rate.py
+    # conflict on: keep each user's latest rating, then rebuild the
+    # aggregates from what is left
+    4: [
+        """DELETE FROM ratings r USING ratings newer
+           WHERE newer.username = r.username AND newer.source = r.source
+             AND newer.source_id = r.source_id AND newer.id > r.id""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_ratings_user_title ON ratings (username, source, source_id)",
+        "CREATE INDEX IF NOT EXISTS ix_ratings_title_id ON ratings (source, source_id, id DESC)",
+        "DELETE FROM rating_aggregates",
+        """INSERT INTO rating_aggregates (source, source_id, rating_count, rating_sum, histogram)
+           SELECT source, source_id, count(*), sum(rate_score), ARRAY["""
+        + ", ".join(
+            f"count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = {i})::int"
+            for i in range(11)
+        )
+        + """]
+           FROM ratings GROUP BY source, source_id""",
+    ],
+}
+
+
+MediaType = Literal["movie", "series", "anime", "game", "manga", "book"]
+MEDIA_TYPES = get_args(MediaType)
 
 
 class SearchResult(BaseModel):
@@ -65,6 +97,23 @@ class Rating(Base):
     rate_descr = Column(Text)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        Index("uq_ratings_user_title", "username", "source", "source_id", unique=True),
+        Index("ix_ratings_title_id", "source", "source_id", id.desc()),
+    )
+
+
+# Per-title rating totals kept in step with every write in app/api/rate.py.
+# histogram[i] counts scores that round to i - 1 (scores are 0-10).
+class RatingAggregate(Base):
+    __tablename__ = "rating_aggregates"
+
+    source = Column(String, primary_key=True)
+    source_id = Column(String, primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0)
+    histogram = Column(ARRAY(Integer), nullable=False)
+
 
 class ChapterOut(BaseModel):
     season: Optional[int] = None  # only for series/anime
@@ -81,11 +130,81 @@ class SearchLog(Base):
     source_id = Column(String, nullable=False)
     type = Column(String, nullable=False, index=True)
     title = Column(String, nullable=False)
-    timestamp = Column(TIMESTAMP, server_default=func.now(), index=True)
+    timestamp = Column(TIMESTAMP, server_default=func.now())
+
+    # Keyset pagination for /api/history walks (timestamp, id) newest first
+    __table_args__ = (
+        Index("ix_search_logs_type_ts_id", "type", timestamp.desc(), id.desc()),
+        Index("ix_search_logs_ts_id", timestamp.desc(), id.desc()),
+    )
+
+
+# Pre-aggregated view counts maintained as logs are flushed; see
+# app/utils/trending_rollup.py
+class TrendingDaily(Base):
+    __tablename__ = "trending_daily"
+
+    day = Column(Date, primary_key=True)
+    type = Column(String, primary_key=True)
+    source = Column(String, primary_key=True)
+    source_id = Column(String, primary_key=True)
+    title = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_trending_daily_type_day", "type", "day"),
+    )
+
+
+class TrendingTotal(Base):
+    __tablename__ = "trending_totals"
+
+    type = Column(String, primary_key=True)
+    source = Column(String, primary_key=True)
+    source_id = Column(String, primary_key=True)
+    title = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_trending_totals_type_count", "type", count.desc()),
+    )
+
+
+# Every search/detail result we have seen, searchable locally (app/utils/catalog.py).
+# payload is the SearchResult as served.
+class CatalogItem(Base):
+    __tablename__ = "catalog"
+
+    source = Column(String, primary_key=True)
+    source_id = Column(String, primary_key=True)
+    type = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    # Detail payloads are richer than search ones and are not overwritten by them
+    detailed = Column(Boolean, nullable=False, server_default=false())
+    updated_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    search_vector = Column(
+        TSVECTOR, Computed("to_tsvector('simple', coalesce(title, ''))", persisted=True)
+    )
+
+    __table_args__ = (
+        Index("ix_catalog_search_vector", "search_vector", postgresql_using="gin"),
+        # ix_catalog_title_trgm is created by app/utils/catalog.py when the
+        # optional pg_trgm extension is installed
+        Index("ix_catalog_type", "type"),
+    )
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(TIMESTAMP, server_default=func.now())
 
 
 class LogEntry(BaseModel):
     source: str
     source_id: str
-    type: str
+    # Validated: each type gets its own in-memory trending and suggest index
+    type: MediaType
     title: str
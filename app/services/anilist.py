@@ -1,9 +1,17 @@
-import httpx
+import os
+import re
 from app.models import SearchResult
 from app.utils.logger import logger
+from app.utils import outbound
+from app.utils.cache import cached
+from app.utils.singleflight import coalesced
 from app.models import ChapterOut
+from app.utils.paging import fetch_pages
 
-API_URL = "https://graphql.anilist.co"
+API_URL = "/"
+
+# Jikan allows ~3 requests/second, so keep page fan-out small
+EPISODE_CONCURRENCY = int(os.getenv("JIKAN_PAGE_CONCURRENCY", "2"))
 
 search_query = """
 query ($search: String) {
@@ -53,21 +61,50 @@ query ($id: Int) {
 }
 """
 
+bulk_query = """
+query ($ids: [Int], $perPage: Int) {
+  Page(perPage: $perPage) {
+    media(id_in: $ids, type: ANIME) {
+      id
+      title {
+        romaji
+        english
+      }
+      description(asHtml: false)
+      coverImage {
+        large
+      }
+      startDate {
+        year
+      }
+      episodes
+      duration
+      genres
+      averageScore
+    }
+  }
+}
+"""
 
+# AniList pages top out at 50 items
+BULK_PAGE_SIZE = 50
+
+
+@cached("anilist", "search", SearchResult, many=True)
+@coalesced("anilist", "search")
 async def search(query: str) -> list[SearchResult]:
     logger.info(f"[AniList] Searching '{query}'")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(API_URL, json={
-                "query": search_query,
-                "variables": {"search": query}
-            })
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.post("anilist", API_URL, op="search", json={
+            "query": search_query,
+            "variables": {"search": query}
+        })
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         logger.error(f"[AniList] API error: {e}")
-        return []
+        raise
 
     results = []
     for item in data["data"]["Page"]["media"]:
@@ -91,21 +128,69 @@ async def search(query: str) -> list[SearchResult]:
     return results
 
 
+@cached("anilist", "detail", SearchResult, revalidate=True)
+@coalesced("anilist", "detail")
 async def get_detail(id: str) -> SearchResult:
     logger.info(f"[AniList] Fetching detail for anime ID: {id}")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(API_URL, json={
-                "query": detail_query,
-                "variables": {"id": int(id)}
-            })
-            response.raise_for_status()
-            data = response.json()["data"]["Media"]
+        response = await outbound.post("anilist", API_URL, op="detail", json={
+            "query": detail_query,
+            "variables": {"id": int(id)}
+        })
+        response.raise_for_status()
+        data = response.json()["data"]["Media"]
     except Exception as e:
         logger.error(f"[AniList] API error: {e}")
         raise
 
+    return _parse_media(data)
+
+
+def normalize_id(id: str):
+    """The canonical form of an AniList id, or None if it is not one."""
+    id = id.strip()
+    return str(int(id)) if re.fullmatch(r"[0-9]{1,10}", id) else None
+
+
+async def get_details(ids: list[str]) -> dict[str, SearchResult]:
+    """Resolve many anime ids with one id_in query per 50 ids.
+
+    Results are keyed by normalize_id(id). Cached ids are served locally;
+    invalid ids and ids AniList does not return are absent from the result.
+    """
+    found = {}
+    missing = []
+    for id in dict.fromkeys(filter(None, map(normalize_id, ids))):
+        hit = await get_detail.peek(id)
+        if hit is not None:
+            found[id] = hit
+        else:
+            missing.append(id)
+
+    for i in range(0, len(missing), BULK_PAGE_SIZE):
+        chunk = missing[i:i + BULK_PAGE_SIZE]
+        logger.info(f"[AniList] Bulk fetching {len(chunk)} anime")
+        try:
+            response = await outbound.post("anilist", API_URL, op="bulk_detail", json={
+                "query": bulk_query,
+                "variables": {"ids": [int(id) for id in chunk], "perPage": len(chunk)}
+            })
+            response.raise_for_status()
+            media = response.json()["data"]["Page"]["media"]
+        except Exception as e:
+            logger.error(f"[AniList] Bulk API error: {e}")
+            raise
+
+        for item in media:
+            result = _parse_media(item)
+            found[result.id] = result
+            await get_detail.store(result, result.id)
+
+    return found
+
+
+def _parse_media(data: dict) -> SearchResult:
     return SearchResult(
         id=str(data["id"]),
         title=data["title"]["english"] or data["title"]["romaji"],
@@ -123,17 +208,49 @@ async def get_detail(id: str) -> SearchResult:
     )
 
 
+@cached("jikan", "chapters", ChapterOut, many=True, revalidate=True)
+@coalesced("jikan", "chapters")
 async def get_episodes(id: str) -> list[ChapterOut]:
     logger.info(f"[Jikan] Fetching episodes for anime ID: {id}")
+    pages = {}
+    async for page, chapters in iter_episode_pages(id):
+        pages[page] = chapters
+
+    chapters = [ch for page in sorted(pages) for ch in pages[page]]
+    logger.info(f"[Jikan] Found {len(chapters)} episodes for anime {id}")
+    return chapters
+
+
+async def iter_episode_pages(id: str):
+    """Yield (page, episodes) for every Jikan page as it arrives.
+
+    Pages arrive in completion order; a failed page raises.
+    """
+    first = await _fetch_episode_page(id, 1)
+    yield 1, _parse_episodes(first)
+
+    last_page = first.get("pagination", {}).get("last_visible_page") or 1
+    async for page, data in fetch_pages(
+        lambda page: _fetch_episode_page(id, page),
+        range(2, last_page + 1),
+        EPISODE_CONCURRENCY
+    ):
+        yield page, _parse_episodes(data)
+
+
+async def _fetch_episode_page(id: str, page: int):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"https://api.jikan.moe/v4/anime/{id}/episodes")
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get(
+            "jikan", f"/anime/{id}/episodes", op="chapters", params={"page": page}
+        )
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
-        logger.error(f"[Jikan] API error for anime {id}: {e}")
-        return []
+        logger.error(f"[Jikan] API error for anime {id} page {page}: {e}")
+        raise
+
 
+def _parse_episodes(data: dict) -> list[ChapterOut]:
     chapters = []
     for ep in data.get("data", []):
         chapters.append(ChapterOut(
@@ -146,5 +263,4 @@ async def get_episodes(id: str) -> list[ChapterOut]:
               else None
         ))
 
-    logger.info(f"[Jikan] Found {len(chapters)} episodes for anime {id}")
     return chapters
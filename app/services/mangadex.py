@@ -1,28 +1,37 @@
 # manga handler
 
-import httpx
+import os
+import re
 from app.models import SearchResult
 from app.utils.logger import logger
+from app.utils import outbound
+from app.utils.cache import cached
+from app.utils.singleflight import coalesced
 from app.models import ChapterOut
+from app.utils.paging import fetch_pages
 
-BASE_URL = "https://api.mangadex.org"
+CHAPTER_PAGE_SIZE = 100
+CHAPTER_WINDOW = 10000
+CHAPTER_CONCURRENCY = int(os.getenv("MANGADEX_PAGE_CONCURRENCY", "4"))
+BULK_PAGE_SIZE = 100
 
 
+@cached("mangadex", "search", SearchResult, many=True)
+@coalesced("mangadex", "search")
 async def search(query: str) -> list[SearchResult]:
     logger.info(f"[MangaDex] Searching '{query}'")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{BASE_URL}/manga", params={
-                "title": query,
-                "limit": 10,
-                "includes[]": "cover_art"
-            })
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get("mangadex", "/manga", op="search", params={
+            "title": query,
+            "limit": 10,
+            "includes[]": "cover_art"
+        })
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         logger.error(f"[MangaDex] API error: {e}")
-        return []
+        raise
 
     results = []
     for item in data.get("data", []):
@@ -61,18 +70,68 @@ async def search(query: str) -> list[SearchResult]:
     return results
 
 
+@cached("mangadex", "detail", SearchResult, revalidate=True)
+@coalesced("mangadex", "detail")
 async def get_detail(id: str) -> SearchResult:
     logger.info(f"[MangaDex] Fetching detail for manga ID: {id}")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"https://api.mangadex.org/manga/{id}", params={"includes[]": "cover_art"})
-            response.raise_for_status()
-            data = response.json()["data"]
+        response = await outbound.get("mangadex", f"/manga/{id}", op="detail", params={"includes[]": "cover_art"})
+        response.raise_for_status()
+        data = response.json()["data"]
     except Exception as e:
         logger.error(f"[MangaDex] API error: {e}")
         raise
 
+    return _parse_manga(data)
+
+
+def normalize_id(id: str):
+    """The canonical (lowercase UUID) form of a MangaDex id, or None if it is not one."""
+    id = id.strip().lower()
+    return id if re.fullmatch(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", id) else None
+
+
+async def get_details(ids: list[str]) -> dict[str, SearchResult]:
+    """Resolve many manga ids with one /manga?ids[]= call per 100 ids.
+
+    Results are keyed by normalize_id(id), since MangaDex answers with
+    lowercase ids. Cached ids are served locally; invalid ids and ids
+    MangaDex does not return are absent from the result.
+    """
+    found = {}
+    missing = []
+    for id in dict.fromkeys(filter(None, map(normalize_id, ids))):
+        hit = await get_detail.peek(id)
+        if hit is not None:
+            found[id] = hit
+        else:
+            missing.append(id)
+
+    for i in range(0, len(missing), BULK_PAGE_SIZE):
+        chunk = missing[i:i + BULK_PAGE_SIZE]
+        logger.info(f"[MangaDex] Bulk fetching {len(chunk)} manga")
+        try:
+            response = await outbound.get("mangadex", "/manga", op="bulk_detail", params={
+                "ids[]": chunk,
+                "includes[]": "cover_art",
+                "limit": len(chunk)
+            })
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            logger.error(f"[MangaDex] Bulk API error: {e}")
+            raise
+
+        for item in data.get("data", []):
+            result = _parse_manga(item)
+            found[result.id] = result
+            await get_detail.store(result, result.id)
+
+    return found
+
+
+def _parse_manga(data: dict) -> SearchResult:
     attr = data["attributes"]
     title = attr["title"].get("en") or list(attr["title"].values())[0]
     description = attr.get("description", {}).get("en") or "No description."
@@ -86,7 +145,7 @@ async def get_detail(id: str) -> SearchResult:
     poster_url = f"https://uploads.mangadex.org/covers/{data['id']}/{cover}" if cover else None
 
     return SearchResult(
-        id=id,
+        id=data["id"],
         title=title,
         type="manga",
         description=description,
@@ -102,30 +161,60 @@ async def get_detail(id: str) -> SearchResult:
     )
 
 
+@cached("mangadex", "chapters", ChapterOut, many=True, revalidate=True)
+@coalesced("mangadex", "chapters")
 async def get_chapters(id: str) -> list[ChapterOut]:
-    url = "https://api.mangadex.org/chapter"
+    pages = {}
+    async for offset, chapters in iter_chapter_pages(id):
+        pages[offset] = chapters
+    return [ch for offset in sorted(pages) for ch in pages[offset]]
+
+
+async def iter_chapter_pages(id: str):
+    """Yield (offset, chapters) for every chapter page as it arrives.
+
+    Pages arrive in completion order; a failed page raises.
+    """
+    first = await _fetch_chapter_page(id, 0)
+    yield 0, _parse_chapters(first)
+
+    # MangaDex refuses offset + limit beyond 10,000
+    total = min(first.get("total", 0), CHAPTER_WINDOW)
+    offsets = range(CHAPTER_PAGE_SIZE, total, CHAPTER_PAGE_SIZE)
+
+    async for offset, data in fetch_pages(
+        lambda offset: _fetch_chapter_page(id, offset),
+        offsets,
+        CHAPTER_CONCURRENCY
+    ):
+        yield offset, _parse_chapters(data)
+
+
+async def _fetch_chapter_page(id: str, offset: int):
     params = {
         "manga": id,
         "translatedLanguage[]": "en",
-        "limit": 100,
+        "limit": CHAPTER_PAGE_SIZE,
+        "offset": offset,
         "order[chapter]": "asc"
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get("mangadex", "/chapter", op="chapters", params=params)
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
-        logger.error(f"[MangaDex] Chapter fetch failed: {e}")
-        return []
+        logger.error(f"[MangaDex] Chapter fetch failed for {id} at offset {offset}: {e}")
+        raise
+
 
+def _parse_chapters(data: dict) -> list[ChapterOut]:
     chapters = []
     for ch in data.get("data", []):
         attr = ch["attributes"]
         chapters.append(ChapterOut(
             season=None,
-            number= int(attr["chapter"]) if attr.get("chapter", "").isdigit() else 0,
+            number= int(attr["chapter"]) if (attr.get("chapter") or "").isdigit() else 0,
             title=attr.get("title") or "Untitled",
             air_date=attr.get("publishAt")
         ))
@@ -1,23 +1,26 @@
 # book handler
 
-import httpx
 from app.models import SearchResult
 from app.utils.logger import logger
+from app.utils import outbound
+from app.utils.cache import cached
+from app.utils.singleflight import coalesced
 
-BASE_URL = "https://openlibrary.org/search.json"
+BASE_URL = "/search.json"
 
 
+@cached("openlibrary", "search", SearchResult, many=True)
+@coalesced("openlibrary", "search")
 async def search(query: str) -> list[SearchResult]:
     logger.info(f"[OpenLibrary] Searching '{query}'")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(BASE_URL, params={"q": query})
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get("openlibrary", BASE_URL, op="search", params={"q": query})
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         logger.error(f"[OpenLibrary] API error: {e}")
-        return []
+        raise
 
     results = []
     for item in data.get("docs", [])[:10]:
@@ -43,14 +46,15 @@ async def search(query: str) -> list[SearchResult]:
     return results
 
 
+@cached("openlibrary", "detail", SearchResult, revalidate=True)
+@coalesced("openlibrary", "detail")
 async def get_detail(id: str) -> SearchResult:
     logger.info(f"[OpenLibrary] Fetching detail for book ID: {id}")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"https://openlibrary.org/works/{id}.json")
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get("openlibrary", f"/works/{id}.json", op="detail")
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         logger.error(f"[OpenLibrary] API error: {e}")
         raise
@@ -2,16 +2,20 @@
 
 from app.utils.logger import logger
 import os
-import httpx
 from dotenv import load_dotenv
 from app.models import SearchResult
+from app.utils import outbound
+from app.utils.cache import cached
+from app.utils.singleflight import coalesced
 
 load_dotenv()
 
 API_KEY = os.getenv("RAWG_API_KEY")
-BASE_URL = "https://api.rawg.io/api/games"
+BASE_URL = "/games"
 
 
+@cached("rawg", "search", SearchResult, many=True)
+@coalesced("rawg", "search")
 async def search(query: str) -> list[SearchResult]:
     logger.info(f"[RAWG] Searching '{query}'")
 
@@ -22,13 +26,12 @@ async def search(query: str) -> list[SearchResult]:
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(BASE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get("rawg", BASE_URL, op="search", params=params)
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         logger.error(f"[RAWG] API error: {e}")
-        return []
+        raise
 
     results = []
     for item in data.get("results", []):
@@ -53,17 +56,18 @@ async def search(query: str) -> list[SearchResult]:
     return results
 
 
+@cached("rawg", "detail", SearchResult, revalidate=True)
+@coalesced("rawg", "detail")
 async def get_detail(id: str) -> SearchResult:
     logger.info(f"[RAWG] Fetching detail for game ID: {id}")
 
-    url = f"https://api.rawg.io/api/games/{id}"
+    url = f"{BASE_URL}/{id}"
     params = {"key": API_KEY}
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get("rawg", url, op="detail", params=params)
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         logger.error(f"[RAWG] API error: {e}")
         raise
@@ -1,33 +1,40 @@
 # movie + series handler
 
 import os
-import httpx
 from app.utils.logger import logger
+from app.utils import outbound
+from app.utils.cache import cached
+from app.utils.singleflight import coalesced
 from dotenv import load_dotenv
 from app.models import SearchResult
 from app.models import ChapterOut
+from app.utils.paging import fetch_pages
 
 load_dotenv()
 
 API_KEY = os.getenv("TMDB_API_KEY")
-BASE_URL = "https://api.themoviedb.org/3/search"
 
+# TMDb accepts at most 20 sub-requests per append_to_response
+SEASONS_PER_REQUEST = 20
+SEASON_CONCURRENCY = int(os.getenv("TMDB_SEASON_CONCURRENCY", "4"))
 
+
+@cached("tmdb", "search", SearchResult, many=True)
+@coalesced("tmdb", "search")
 async def search(query: str, type: str) -> list[SearchResult]:
     endpoint = "movie" if type == "movie" else "tv"
-    url = f"{BASE_URL}/{endpoint}"
+    url = f"/search/{endpoint}"
     params = {"api_key": API_KEY, "query": query}
 
     logger.info(f"[TMDb] Searching '{query}' as type '{type}'")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get("tmdb", url, op="search", params=params)
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         logger.error(f"[TMDb] API error: {e}")
-        return []
+        raise
 
     results = []
     for item in data.get("results", [])[:10]:
@@ -52,18 +59,19 @@ async def search(query: str, type: str) -> list[SearchResult]:
     return results
 
 
+@cached("tmdb", "detail", SearchResult, revalidate=True)
+@coalesced("tmdb", "detail")
 async def get_detail(id: str, type: str) -> SearchResult:
     logger.info(f"[TMDb] Fetching detail for {type} with ID: {id}")
 
     endpoint = "movie" if type == "movie" else "tv"
-    url = f"https://api.themoviedb.org/3/{endpoint}/{id}"
+    url = f"/{endpoint}/{id}"
     params = {"api_key": API_KEY}
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await outbound.get("tmdb", url, op="detail", params=params)
+        response.raise_for_status()
+        data = response.json()
     except Exception as e:
         logger.error(f"[TMDb] Detail API error: {e}")
         raise
@@ -85,34 +93,65 @@ async def get_detail(id: str, type: str) -> SearchResult:
     )
 
 
+@cached("tmdb", "chapters", ChapterOut, many=True, revalidate=True)
+@coalesced("tmdb", "chapters")
 async def get_episodes(id: str) -> list[ChapterOut]:
-    url = f"https://api.themoviedb.org/3/tv/{id}"
-    params = {"api_key": API_KEY}
+    pages = {}
+    async for batch, chapters in iter_episode_pages(id):
+        pages[batch] = chapters
+    return [ch for batch in sorted(pages) for ch in pages[batch]]
+
+
+async def iter_episode_pages(id: str):
+    """Yield (batch, episodes) for each batch of seasons as it arrives.
+
+    Batches arrive in completion order, not season order. A failed batch
+    raises, so a partial list is never mistaken for the whole one.
+    """
+    url = f"/tv/{id}"
+
+    # The show request speculatively appends the first batch of seasons, so
+    # most series load in a single round trip.
+    data = await _fetch_seasons(url, range(SEASONS_PER_REQUEST))
+    season_numbers = [season["season_number"] for season in data.get("seasons", [])]
+    fetched = [n for n in season_numbers if f"season/{n}" in data]
+    yield 0, _parse_seasons(data, fetched)
+
+    missing = [n for n in season_numbers if n not in fetched]
+    batches = [
+        missing[i:i + SEASONS_PER_REQUEST]
+        for i in range(0, len(missing), SEASONS_PER_REQUEST)
+    ]
+    async for index, payload in fetch_pages(
+        lambda index: _fetch_seasons(url, batches[index - 1]),
+        range(1, len(batches) + 1),
+        SEASON_CONCURRENCY
+    ):
+        yield index, _parse_seasons(payload, batches[index - 1])
+
+
+async def _fetch_seasons(url: str, numbers):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            data = response.json()
+        response = await outbound.get("tmdb", url, op="chapters", params={
+            "api_key": API_KEY,
+            "append_to_response": ",".join(f"season/{n}" for n in numbers)
+        })
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
-        logger.error(f"[TMDb] Episode fetch failed: {e}")
-        return []
+        logger.error(f"[TMDb] Season fetch failed for {url}: {e}")
+        raise
+
 
+def _parse_seasons(data: dict, numbers) -> list[ChapterOut]:
     chapters = []
-    for season in data.get("seasons", []):
-        season_num = season["season_number"]
-        try:
-            season_url = f"{url}/season/{season_num}"
-            season_resp = await client.get(season_url, params=params)
-            season_data = season_resp.json()
-
-            for ep in season_data.get("episodes", []):
-                chapters.append(ChapterOut(
-                    season=season_num,
-                    number=ep["episode_number"],
-                    title=ep["name"],
-                    air_date=ep.get("air_date")
-                ))
-        except Exception as e:
-            logger.error(f"[TMDb] Season fetch failed: {e}")
-            continue
+    for season_num in numbers:
+        for ep in data.get(f"season/{season_num}", {}).get("episodes", []):
+            chapters.append(ChapterOut(
+                season=season_num,
+                number=ep["episode_number"],
+                title=ep["name"],
+                air_date=ep.get("air_date")
+            ))
 
     return chapters
@@ -0,0 +1,12 @@
+import os
+from fastapi import Request, HTTPException
+from starlette.status import HTTP_401_UNAUTHORIZED
+
+
+def require_dev_token(request: Request):
+    token = request.headers.get("Authorization")
+    if not token:
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Missing Authorization token")
+
+    if token != os.getenv("STORED_HASH"):
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Unauthorized")
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from app.utils.logger import logger
+
+
+class QueueFull(Exception):
+    pass
+
+
+class BatchWriter:
+    """Bounded in-process queue drained by a background task in batches.
+
+    A batch is flushed when it reaches `max_batch` items or `max_delay`
+    seconds after its first item arrived, whichever comes first. `put`
+    waits up to `put_timeout` for room and then raises QueueFull, which
+    callers surface as backpressure.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush,
+        max_batch: int = 500,
+        max_delay: float = 1.0,
+        max_queue: int = 10000,
+        put_timeout: float = 0.5,
+        retries: int = 3,
+    ):
+        self.name = name
+        self._flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._batch = []
+        self._inflight = None
+        self.stats = {
+            "enqueued": 0,
+            "rejected": 0,
+            "flushed": 0,
+            "failed": 0,
+            "flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    async def put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(item), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"{self.name} queue is full")
+        self.stats["enqueued"] += 1
+
+    def offer(self, item) -> bool:
+        """Enqueue without waiting; for best-effort writes that may be dropped."""
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Graceful shutdown: finish the write in progress, then flush the
+        # partially collected batch and whatever is still queued.
+        if self._inflight is not None and not self._inflight.done():
+            await self._inflight
+        if self._batch:
+            batch, self._batch = self._batch, []
+            await self._write(batch)
+        while not self._queue.empty():
+            batch = []
+            while not self._queue.empty() and len(batch) < self.max_batch:
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+        logger.info(f"[Batch] {self.name} writer stopped after flushing {self.stats['flushed']} items")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.max_delay
+            while len(self._batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._batch = self._batch, []
+            # Shielded so stop() cancelling the loop never aborts a write
+            self._inflight = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._inflight)
+
+    async def _write(self, batch: list):
+        for attempt in range(1, self.retries + 1):
+            start = time.perf_counter()
+            try:
+                await self._flush(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Batch] {self.name} flush of {len(batch)} failed (attempt {attempt}): {e}")
+                if attempt < self.retries:
+                    await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                continue
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stats["flushed"] += len(batch)
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 2)
+            self.stats["total_flush_ms"] += elapsed_ms
+            return
+
+        self.stats["failed"] += len(batch)
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def snapshot(self) -> dict:
+        flushes = self.stats["flushes"]
+        return {
+            **self.stats,
+            "total_flush_ms": round(self.stats["total_flush_ms"], 2),
+            "avg_flush_ms": round(self.stats["total_flush_ms"] / flushes, 2) if flushes else 0.0,
+            "queue_depth": self.depth(),
+            "queue_capacity": self._queue.maxsize,
+        }
@@ -0,0 +1,82 @@
+import os
+import time
+from app.utils.logger import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream.
+
+    After `threshold` failures in a row the circuit opens and calls fail
+    fast for `reset_timeout` seconds. Then a single trial call is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, threshold: int, reset_timeout: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.stats = {"rejected": 0, "opened": 0}
+
+    def before_call(self):
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self.trial_running = False
+        if self.state == HALF_OPEN and not self.trial_running:
+            self.trial_running = True
+            return
+        self.stats["rejected"] += 1
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"[Breaker] {self.name} recovered, closing circuit")
+        self.state = CLOSED
+        self.failures = 0
+        self.trial_running = False
+
+    def release(self):
+        """Give back a half-open trial slot when the call ended without an outcome."""
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            if self.state != OPEN:
+                self.stats["opened"] += 1
+                logger.error(f"[Breaker] {self.name} failing ({self.failures} in a row), opening circuit")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def snapshot(self) -> dict:
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in_s": round(retry_in, 1),
+            **self.stats,
+        }
+
+
+def breaker_for(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        threshold=int(os.getenv("BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("BREAKER_RESET_TIMEOUT", "30")),
+    )
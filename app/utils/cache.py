@@ -0,0 +1,430 @@
+import asyncio
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from app.utils import deadline, outbound
+from app.utils.logger import logger
+from app.utils.serialization import dumps, loads
+
+# Seconds a provider response stays fresh; override with CACHE_TTL_<SOURCE>.
+DEFAULT_TTLS = {
+    "tmdb": 6 * 3600,
+    "anilist": 6 * 3600,
+    "jikan": 12 * 3600,
+    "mangadex": 3 * 3600,
+    "rawg": 24 * 3600,
+    "openlibrary": 24 * 3600,
+}
+
+
+# How long past expiry an entry is kept around to serve while its provider
+# is failing (circuit open, deadline exceeded, ...)
+STALE_GRACE = float(os.getenv("CACHE_STALE_GRACE", "86400"))
+
+# For lookups cached with revalidate=True: past the soft TTL an entry is
+# still served, and refreshed in the background. The TTL above is the hard
+# one, after which callers wait for the provider again.
+SOFT_TTL_RATIO = float(os.getenv("CACHE_SOFT_TTL_RATIO", "0.5"))
+REVALIDATE_CONCURRENCY = int(os.getenv("CACHE_REVALIDATE_CONCURRENCY", "4"))
+REVALIDATE_MAX_PENDING = int(os.getenv("CACHE_REVALIDATE_MAX_PENDING", "500"))
+REVALIDATE_DEADLINE = float(os.getenv("CACHE_REVALIDATE_DEADLINE", "30"))
+# Seconds between sweeps of expired rows from the disk tier, run on a write
+DISK_EVICT_INTERVAL = float(os.getenv("CACHE_DISK_EVICT_INTERVAL", "3600"))
+
+
+def ttl_for(source: str) -> int:
+    value = os.getenv(f"CACHE_TTL_{source.upper()}")
+    return int(value) if value else DEFAULT_TTLS.get(source, 3600)
+
+
+def soft_ttl_for(source: str) -> int:
+    value = os.getenv(f"CACHE_SOFT_TTL_{source.upper()}")
+    return int(value) if value else int(ttl_for(source) * SOFT_TTL_RATIO)
+
+
+def normalize(part) -> str:
+    return " ".join(str(part).split()).casefold()
+
+
+def make_key(source: str, op: str, *parts) -> str:
+    return ":".join([source, op, *(normalize(p) for p in parts)])
+
+
+class Entry:
+    # body: the value encoded as JSON, kept so hits are served without re-encoding
+    __slots__ = ("value", "expires_at", "refresh_at", "stale_until", "body")
+
+    def __init__(self, value, expires_at: float, body: bytes = None, refresh_at: float = None):
+        self.value = value
+        self.expires_at = expires_at
+        self.refresh_at = expires_at if refresh_at is None else refresh_at
+        self.stale_until = expires_at + STALE_GRACE
+        self.body = body
+
+    def fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+    def due(self, now: float) -> bool:
+        return now >= self.refresh_at
+
+
+class MemoryCache:
+    """In-process LRU with per-entry expiry, bounded by entry count."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, Entry] = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if not entry.fresh(now):
+            if now >= entry.stale_until:
+                del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def get_stale(self, key: str):
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() >= entry.stale_until:
+            return None
+        return entry
+
+    def peek(self, key: str):
+        # No expiry check or LRU bump; for callers already holding a value
+        return self._data.get(key)
+
+    def set(self, key: str, value, ttl: float, body: bytes = None, soft_ttl: float = None) -> Entry:
+        now = time.monotonic()
+        refresh_at = now + soft_ttl if soft_ttl is not None else None
+        entry = self._data[key] = Entry(value, now + ttl, body, refresh_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return entry
+
+    def delete(self, key: str) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = [k for k in self._data if k.startswith(prefix)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+
+class DiskCache:
+    """Optional SQLite tier so warm entries survive restarts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row
+
+    def set(self, key: str, payload: str, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, payload, expires_at) VALUES (?, ?, ?)",
+                (key, payload, time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+        return cur.rowcount
+
+    def delete_prefix(self, prefix: str) -> int:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (escaped + "%",)
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+        return cur.rowcount
+
+
+class ResponseCache:
+    def __init__(self):
+        self.memory = MemoryCache(int(os.getenv("CACHE_MAX_ENTRIES", "5000")))
+        path = os.getenv("CACHE_DB_PATH")
+        self.disk = DiskCache(path) if path else None
+        self._evicted_at = float("-inf")
+        self.stats = defaultdict(lambda: {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "stale_served": 0, "revalidated": 0,
+        })
+
+    async def get(self, key: str, namespace: str, decode, soft_margin: float = None, record: bool = True):
+        # soft_margin: hard minus soft TTL, to restore refresh_at for disk hits.
+        # record=False keeps internal probes (the cache warmer) out of the stats.
+        counts = self.stats[namespace] if record else defaultdict(int)
+        entry = self.memory.get(key)
+        if entry is not None:
+            counts["memory_hits"] += 1
+            return entry
+        if self.disk is not None:
+            row = await asyncio.to_thread(self.disk.get, key)
+            if row is not None:
+                payload, expires_at = row
+                ttl = expires_at - time.time()
+                value = decode(loads(payload))
+                soft_ttl = ttl - soft_margin if soft_margin is not None else None
+                self.memory.set(key, value, ttl, payload.encode(), soft_ttl)
+                counts["disk_hits"] += 1
+                return self.memory.get(key)
+        counts["misses"] += 1
+        return None
+
+    def get_stale(self, key: str, namespace: str):
+        entry = self.memory.get_stale(key)
+        if entry is not None:
+            self.stats[namespace]["stale_served"] += 1
+        return entry
+
+    async def set(self, key: str, value, ttl: float, encode, soft_ttl: float = None):
+        # Encoded once, for the disk tier and for serving memory hits
+        body = dumps(encode(value))
+        self.memory.set(key, value, ttl, body, soft_ttl)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, body.decode(), ttl)
+            now = time.monotonic()
+            if now - self._evicted_at >= DISK_EVICT_INTERVAL:
+                self._evicted_at = now
+                removed = await asyncio.to_thread(self.disk.evict_expired)
+                if removed:
+                    logger.info(f"[Cache] Evicted {removed} expired entries from {self.disk.path}")
+
+    async def purge(self, key: str) -> int:
+        removed = int(self.memory.delete(key))
+        if self.disk is not None:
+            removed += await asyncio.to_thread(self.disk.delete, key)
+        return removed
+
+    async def purge_prefix(self, prefix: str) -> int:
+        removed = self.memory.delete_prefix(prefix)
+        if self.disk is not None:
+            removed += await asyncio.to_thread(self.disk.delete_prefix, prefix)
+        return removed
+
+    def snapshot(self) -> dict:
+        namespaces = {}
+        for name, counts in self.stats.items():
+            lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+            # stale_served is a subset of misses, revalidated one of hits
+            hits = lookups - counts["misses"]
+            namespaces[name] = {**counts, "hit_ratio": round(hits / lookups, 4) if lookups else 0.0}
+        return {
+            "memory_entries": len(self.memory),
+            "memory_max_entries": self.memory.maxsize,
+            "disk": self.disk.path if self.disk else None,
+            "namespaces": namespaces,
+        }
+
+
+cache = ResponseCache()
+
+
+class Revalidator:
+    """Runs `fetch()` for a key in the background, at most once at a time.
+
+    At most `concurrency` fetches run at once, at background priority in
+    the outbound scheduler, and no more than `max_pending` are queued, so
+    a burst of stale hits does not become a burst of upstream calls. Keys
+    that are skipped are picked up again on their next hit.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_pending: int):
+        self.name = name
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending: dict[str, asyncio.Task] = {}
+        self.stats = {"scheduled": 0, "refreshed": 0, "failed": 0, "skipped": 0}
+
+    def submit(self, key: str, fetch) -> bool:
+        if key in self._pending:
+            return False
+        if len(self._pending) >= self.max_pending:
+            self.stats["skipped"] += 1
+            return False
+        self.stats["scheduled"] += 1
+        self._pending[key] = asyncio.create_task(self._run(key, fetch))
+        return True
+
+    async def _run(self, key: str, fetch):
+        deadline.detach()
+        try:
+            async with self._slots:
+                with outbound.background(), deadline.scope(REVALIDATE_DEADLINE):
+                    await fetch()
+            self.stats["refreshed"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning(f"[Cache] {self.name} refresh of {key} failed: {e}")
+        finally:
+            self._pending.pop(key, None)
+
+    async def stop(self):
+        tasks = list(self._pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "pending": len(self._pending)}
+
+
+revalidator = Revalidator("cache", REVALIDATE_CONCURRENCY, REVALIDATE_MAX_PENDING)
+
+_fetch_hooks = []
+
+
+def on_fetch(fn):
+    """Call fn(source, op, value) with every non-empty result fetched upstream."""
+    _fetch_hooks.append(fn)
+    return fn
+
+
+def _notify(source: str, op: str, value):
+    for hook in _fetch_hooks:
+        try:
+            hook(source, op, value)
+        except Exception as e:
+            logger.error(f"[Cache] Fetch hook {hook.__name__} failed: {e}")
+
+
+def cached(source: str, op: str, model, many: bool = False, revalidate: bool = False):
+    """Cache an async provider lookup keyed by source, op and its arguments.
+
+    Empty results are not stored, so a title that is missing upstream today
+    is looked up again next time. If the lookup raises (or comes back empty)
+    and an expired entry is still within CACHE_STALE_GRACE, that entry is
+    served.
+    With `revalidate`, hits past the soft TTL are served as they are while
+    the revalidator refreshes them.
+    """
+    if many:
+        encode = lambda value: [item.model_dump() for item in value]
+        decode = lambda data: [model(**item) for item in data]
+    else:
+        encode = lambda value: value.model_dump()
+        decode = lambda data: model(**data)
+    namespace = f"{source}.{op}"
+    ttl = ttl_for(source)
+    soft_ttl = soft_ttl_for(source) if revalidate else None
+    soft_margin = ttl - soft_ttl if revalidate else None
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        def bind(args, kwargs):
+            # Keyword and positional spellings of one call share a cache key
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return make_key(source, op, *bound.arguments.values()), bound
+
+        async def refresh(key: str, bound):
+            value = await fn(*bound.args, **bound.kwargs)
+            if value:
+                _notify(source, op, value)
+                await cache.set(key, value, ttl, encode, soft_ttl)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key, bound = bind(args, kwargs)
+            entry = await cache.get(key, namespace, decode, soft_margin)
+            if entry is not None:
+                if revalidate and entry.due(time.monotonic()):
+                    # Not counted when a refresh of the key is already pending
+                    if revalidator.submit(key, lambda: refresh(key, bound)):
+                        cache.stats[namespace]["revalidated"] += 1
+                return entry.value
+            try:
+                value = await fn(*bound.args, **bound.kwargs)
+            except Exception:
+                stale = cache.get_stale(key, namespace)
+                if stale is None:
+                    raise
+                logger.warning(f"[Cache] Upstream failed, serving stale {key}")
+                return stale.value
+            if not value:
+                stale = cache.get_stale(key, namespace)
+                return stale.value if stale is not None else value
+            _notify(source, op, value)
+            try:
+                await cache.set(key, value, ttl, encode, soft_ttl)
+            except Exception as e:
+                logger.error(f"[Cache] Failed to store {key}: {e}")
+            return value
+
+        def cache_key(*args, **kwargs) -> str:
+            return bind(args, kwargs)[0]
+
+        async def peek(*args, record: bool = True, **kwargs):
+            # record=False for probes that are followed by the real lookup
+            entry = await cache.get(cache_key(*args, **kwargs), namespace, decode, soft_margin, record=record)
+            return entry.value if entry is not None else None
+
+        async def warm(*args, **kwargs) -> bool:
+            """Fetch into the cache unless a fresh entry is there; True if it fetched."""
+            key, bound = bind(args, kwargs)
+            entry = await cache.get(key, namespace, decode, soft_margin, record=False)
+            if entry is not None and not entry.due(time.monotonic()):
+                return False
+            await refresh(key, bound)
+            return True
+
+        async def store(value, *args, **kwargs):
+            _notify(source, op, value)
+            await cache.set(cache_key(*args, **kwargs), value, ttl, encode, soft_ttl)
+
+        async def with_body(*args, **kwargs):
+            """Return (value, value encoded as JSON), reusing the cached encoding."""
+            value = await wrapper(*args, **kwargs)
+            entry = cache.memory.peek(cache_key(*args, **kwargs))
+            if entry is not None and entry.value is value:
+                if entry.body is None:
+                    entry.body = dumps(encode(value))
+                return value, entry.body
+            return value, dumps(encode(value))
+
+        # Used by bulk lookups that resolve many keys in one upstream call
+        wrapper.cache_key = cache_key
+        wrapper.peek = peek
+        wrapper.store = store
+        wrapper.warm = warm
+        wrapper.with_body = with_body
+        return wrapper
+
+    return decorator
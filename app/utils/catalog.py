@@ -0,0 +1,287 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from sqlalchemy import and_, case, func, not_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.db import AUTO_CREATE_SCHEMA, SCHEMA_LOCK_ID, SessionLocal, engine
+from app.models import CatalogItem
+from app.utils.batching import BatchWriter
+from app.utils.cache import Revalidator, on_fetch
+from app.utils.logger import logger
+from app.utils.serialization import dumps
+
+# postgres (catalog table, tsvector, plus pg_trgm fuzzy matching when the
+# extension is installed), sqlite (FTS5 file at CATALOG_DB_PATH, for local
+# runs) or off
+BACKEND = os.getenv("CATALOG_BACKEND", "postgres").lower()
+DB_PATH = os.getenv("CATALOG_DB_PATH", "catalog.db")
+# Full-text matches needed before /api/search skips the provider
+MIN_RESULTS = int(os.getenv("CATALOG_MIN_RESULTS", "5"))
+# Entries older than this are still served, but refreshed from the provider
+MAX_AGE = float(os.getenv("CATALOG_MAX_AGE", str(7 * 86400)))
+REFRESH_CONCURRENCY = int(os.getenv("CATALOG_REFRESH_CONCURRENCY", "2"))
+RESULT_LIMIT = 10
+
+POSTGRES_SEARCH = text("""
+    SELECT payload::text, true AS full_match,
+           updated_at < now() - make_interval(secs => :max_age) AS stale
+    FROM catalog, plainto_tsquery('simple', :query) AS query
+    WHERE type = :type AND search_vector @@ query
+    ORDER BY ts_rank(search_vector, query) DESC
+    LIMIT :limit
+""")
+# Also returns near misses by trigram similarity; needs pg_trgm
+POSTGRES_FUZZY_SEARCH = text("""
+    SELECT payload::text, search_vector @@ query AS full_match,
+           updated_at < now() - make_interval(secs => :max_age) AS stale
+    FROM catalog, plainto_tsquery('simple', :query) AS query
+    WHERE type = :type AND (search_vector @@ query OR title % :query)
+    ORDER BY full_match DESC, ts_rank(search_vector, query) DESC, similarity(title, :query) DESC
+    LIMIT :limit
+""")
+TRIGRAM_INDEX = "CREATE INDEX IF NOT EXISTS ix_catalog_title_trgm ON catalog USING gin (title gin_trgm_ops)"
+
+
+class PostgresCatalog:
+    def __init__(self):
+        # Set by start() once pg_trgm and the trigram index are known to exist
+        self.fuzzy = False
+
+    async def start(self):
+        async with engine.begin() as conn:
+            installed = (await conn.execute(
+                text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+            )).scalar()
+            if installed and AUTO_CREATE_SCHEMA:
+                # Serialized with schema migrations and other workers
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+                await conn.execute(text(TRIGRAM_INDEX))
+            indexed = (await conn.execute(
+                text("SELECT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'ix_catalog_title_trgm')")
+            )).scalar()
+        self.fuzzy = bool(installed and indexed)
+        if not self.fuzzy:
+            logger.info("[Catalog] pg_trgm is not set up, searching by full text only")
+
+    async def upsert(self, rows: list[dict]):
+        stmt = pg_insert(CatalogItem).values(rows)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CatalogItem.source, CatalogItem.source_id],
+            set_={
+                "type": excluded.type,
+                "title": excluded.title,
+                "payload": case(
+                    (and_(CatalogItem.detailed, not_(excluded.detailed)), CatalogItem.payload),
+                    else_=excluded.payload,
+                ),
+                "detailed": CatalogItem.detailed | excluded.detailed,
+                "updated_at": func.now(),
+            },
+        )
+        async with SessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def search(self, query: str, type: str, limit: int):
+        async with SessionLocal() as session:
+            result = await session.execute(POSTGRES_FUZZY_SEARCH if self.fuzzy else POSTGRES_SEARCH, {
+                "query": query, "type": type, "limit": limit, "max_age": MAX_AGE,
+            })
+            return result.all()
+
+    async def titles(self, limit: int):
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(CatalogItem.type, CatalogItem.source, CatalogItem.source_id, CatalogItem.title)
+                .order_by(CatalogItem.updated_at.desc())
+                .limit(limit)
+            )
+            return result.all()
+
+
+class SqliteCatalog:
+    """Same catalog in a local SQLite file, searched through an FTS5 index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS catalog (
+                source TEXT NOT NULL, source_id TEXT NOT NULL, type TEXT NOT NULL,
+                title TEXT NOT NULL, payload TEXT NOT NULL,
+                detailed INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL,
+                PRIMARY KEY (source, source_id)
+            );
+            CREATE INDEX IF NOT EXISTS ix_catalog_type ON catalog (type);
+            CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts
+                USING fts5(title, content='catalog', content_rowid='rowid');
+            CREATE TRIGGER IF NOT EXISTS catalog_ai AFTER INSERT ON catalog BEGIN
+                INSERT INTO catalog_fts (rowid, title) VALUES (new.rowid, new.title);
+            END;
+            CREATE TRIGGER IF NOT EXISTS catalog_ad AFTER DELETE ON catalog BEGIN
+                INSERT INTO catalog_fts (catalog_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+            END;
+            CREATE TRIGGER IF NOT EXISTS catalog_au AFTER UPDATE OF title ON catalog BEGIN
+                INSERT INTO catalog_fts (catalog_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+                INSERT INTO catalog_fts (rowid, title) VALUES (new.rowid, new.title);
+            END;
+        """)
+        self._conn.commit()
+
+    async def start(self):
+        pass
+
+    def _upsert(self, rows: list[dict]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO catalog (source, source_id, type, title, payload, detailed, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (source, source_id) DO UPDATE SET "
+                "type = excluded.type, title = excluded.title, "
+                "payload = CASE WHEN catalog.detailed AND NOT excluded.detailed "
+                "THEN catalog.payload ELSE excluded.payload END, "
+                "detailed = max(catalog.detailed, excluded.detailed), "
+                "updated_at = excluded.updated_at",
+                [
+                    (r["source"], r["source_id"], r["type"], r["title"],
+                     dumps(r["payload"]).decode(), int(r["detailed"]), now)
+                    for r in rows
+                ],
+            )
+            self._conn.commit()
+
+    def _search(self, query: str, type: str, limit: int):
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"' for term in terms)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT c.payload, 1, c.updated_at < ? FROM catalog_fts "
+                "JOIN catalog c ON c.rowid = catalog_fts.rowid "
+                "WHERE catalog_fts MATCH ? AND c.type = ? "
+                "ORDER BY bm25(catalog_fts) LIMIT ?",
+                (time.time() - MAX_AGE, match, type, limit),
+            ).fetchall()
+
+    def _titles(self, limit: int):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT type, source, source_id, title FROM catalog ORDER BY updated_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    async def upsert(self, rows: list[dict]):
+        await asyncio.to_thread(self._upsert, rows)
+
+    async def search(self, query: str, type: str, limit: int):
+        return await asyncio.to_thread(self._search, query, type, limit)
+
+    async def titles(self, limit: int):
+        return await asyncio.to_thread(self._titles, limit)
+
+
+def _backend():
+    if BACKEND == "postgres":
+        return PostgresCatalog()
+    if BACKEND == "sqlite":
+        return SqliteCatalog(DB_PATH)
+    return None
+
+
+backend = _backend()
+stats = {"lookups": 0, "served": 0, "stale_served": 0}
+
+
+async def _flush(rows: list[dict]):
+    # One row per title; a detail payload wins over a search one in the batch
+    unique = {}
+    for row in rows:
+        key = (row["source"], row["source_id"])
+        if key not in unique or row["detailed"] or not unique[key]["detailed"]:
+            unique[key] = row
+    await backend.upsert([unique[key] for key in sorted(unique)])
+
+
+catalog_writer = BatchWriter(
+    "catalog",
+    _flush,
+    max_batch=int(os.getenv("CATALOG_BATCH_SIZE", "500")),
+    max_delay=float(os.getenv("CATALOG_FLUSH_INTERVAL", "2.0")),
+    max_queue=int(os.getenv("CATALOG_QUEUE_SIZE", "20000")),
+    retries=2,
+)
+
+
+@on_fetch
+def index_results(source: str, op: str, value):
+    """Queue every search/detail result fetched upstream for indexing."""
+    if backend is None or op not in ("search", "detail"):
+        return
+    for result in value if isinstance(value, list) else [value]:
+        catalog_writer.offer({
+            "source": result.source,
+            "source_id": result.id,
+            "type": result.type,
+            "title": result.title,
+            "payload": result.model_dump(),
+            "detailed": op == "detail",
+        })
+
+
+async def lookup(query: str, type: str):
+    """(count, encoded JSON array, any stale) when the catalog alone can answer."""
+    if backend is None:
+        return None
+    stats["lookups"] += 1
+    try:
+        rows = await backend.search(query, type, RESULT_LIMIT)
+    except Exception as e:
+        logger.error(f"[Catalog] Lookup failed for '{query}' ({type}): {e}")
+        return None
+    if sum(1 for _, full_match, _ in rows if full_match) < MIN_RESULTS:
+        return None
+    stale = any(is_stale for _, _, is_stale in rows)
+    stats["served"] += 1
+    if stale:
+        stats["stale_served"] += 1
+    body = ("[" + ",".join(payload for payload, _, _ in rows) + "]").encode()
+    return len(rows), body, stale
+
+
+refresher = Revalidator("catalog", REFRESH_CONCURRENCY, 100 * REFRESH_CONCURRENCY)
+
+
+def refresh(key: str, fetch):
+    """Re-run `fetch()` in the background at low priority, once per key."""
+    refresher.submit(key, fetch)
+
+
+async def start_catalog():
+    """Detect optional search features; the catalog serves without them meanwhile."""
+    if backend is not None:
+        await backend.start()
+
+
+async def known_titles(limit: int) -> list:
+    """(type, source, source_id, title) of the most recently seen entries."""
+    if backend is None:
+        return []
+    return await backend.titles(limit)
+
+
+def snapshot() -> dict:
+    return {
+        "backend": BACKEND,
+        "fuzzy": getattr(backend, "fuzzy", False),
+        **stats,
+        "refresh": refresher.snapshot(),
+        "writer": catalog_writer.snapshot(),
+    }
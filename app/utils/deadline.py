@@ -0,0 +1,44 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Absolute time.monotonic() by which the current request must finish
+_deadline = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def remaining():
+    """Seconds left for the current request, or None when unbounded."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left
+
+
+def detach():
+    """Drop the inherited deadline, for tasks that outlive their request."""
+    _deadline.set(None)
+
+
+@contextmanager
+def scope(seconds: float):
+    """Bound everything inside the block; nested scopes only ever tighten."""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
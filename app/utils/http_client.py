@@ -0,0 +1,107 @@
+import asyncio
+import os
+import httpx
+from app.utils.logger import logger
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+# Upstream hosts and whether they negotiate HTTP/2 (all of these sit behind
+# CDNs that speak h2; OpenLibrary does not).
+PROVIDERS = {
+    "tmdb": {"base_url": "https://api.themoviedb.org/3", "http2": True},
+    "anilist": {"base_url": "https://graphql.anilist.co", "http2": True},
+    "jikan": {"base_url": "https://api.jikan.moe/v4", "http2": True},
+    "mangadex": {"base_url": "https://api.mangadex.org", "http2": True},
+    "rawg": {"base_url": "https://api.rawg.io/api", "http2": True},
+    "openlibrary": {"base_url": "https://openlibrary.org", "http2": False},
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _settings(name: str) -> dict:
+    prefix = f"HTTP_{name.upper()}_"
+    return {
+        "max_connections": _env_int(
+            prefix + "MAX_CONNECTIONS", _env_int("HTTP_MAX_CONNECTIONS", 50)
+        ),
+        "max_keepalive": _env_int(
+            prefix + "MAX_KEEPALIVE", _env_int("HTTP_MAX_KEEPALIVE", 20)
+        ),
+        "keepalive_expiry": _env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+        "connect_timeout": _env_float(
+            prefix + "CONNECT_TIMEOUT", _env_float("HTTP_CONNECT_TIMEOUT", 3.0)
+        ),
+        "read_timeout": _env_float(
+            prefix + "READ_TIMEOUT", _env_float("HTTP_READ_TIMEOUT", 10.0)
+        ),
+        "pool_timeout": _env_float("HTTP_POOL_TIMEOUT", 5.0),
+        "http2": os.getenv(
+            prefix + "HTTP2", str(PROVIDERS[name]["http2"])
+        ).lower() in ("1", "true", "yes"),
+    }
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    cfg = _settings(name)
+    return httpx.AsyncClient(
+        base_url=PROVIDERS[name]["base_url"],
+        http2=cfg["http2"],
+        limits=httpx.Limits(
+            max_connections=cfg["max_connections"],
+            max_keepalive_connections=cfg["max_keepalive"],
+            keepalive_expiry=cfg["keepalive_expiry"],
+        ),
+        timeout=httpx.Timeout(
+            connect=cfg["connect_timeout"],
+            read=cfg["read_timeout"],
+            write=cfg["read_timeout"],
+            pool=cfg["pool_timeout"],
+        ),
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    # Created lazily so scripts and one-off calls work without the app
+    # lifecycle; the app opens them all up front in start_clients().
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _clients[name] = client
+    return client
+
+
+async def start_clients():
+    """Build any missing clients off the event loop, all at once.
+
+    Building a client loads its TLS context, which is slow and blocking, so
+    this runs in threads alongside the rest of startup. get_client() still
+    builds one on demand if a request gets there first.
+    """
+    async def build(name: str):
+        if name in _clients:
+            return
+        client = await asyncio.to_thread(_build_client, name)
+        if name in _clients:
+            await client.aclose()
+        else:
+            _clients[name] = client
+
+    await asyncio.gather(*(build(name) for name in PROVIDERS))
+    logger.info(f"[HTTP] Opened pooled clients for {', '.join(PROVIDERS)}")
+
+
+async def close_clients():
+    for name, client in list(_clients.items()):
+        await client.aclose()
+        _clients.pop(name, None)
+    logger.info("[HTTP] Closed pooled clients")
@@ -1,4 +1,309 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import asyncio
+import functools
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from fastapi import HTTPException, Request
+from app.utils.logger import logger
 
-limiter = Limiter(key_func=get_remote_address)
+# Where limiter state lives, shared by every worker pointing at it:
+#   sqlite:///path/to/file.db  one host (default; several uvicorn workers)
+#   redis://host:6379/0        several hosts, or any Redis-compatible server
+#   memory://                  this process only
+STORAGE = os.getenv("RATELIMIT_STORAGE", "sqlite:///ratelimit.db")
+# Checks are sent to the backend in batches: everything that arrives while
+# the previous batch is in flight, plus up to this many seconds of waiting
+BATCH_WINDOW = float(os.getenv("RATELIMIT_BATCH_WINDOW", "0"))
+MAX_BATCH = int(os.getenv("RATELIMIT_MAX_BATCH", "256"))
+# Seconds between sweeps of keys that have fully recovered
+SWEEP_INTERVAL = 60.0
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """"10/minute" or "10 per 2 minutes" -> (10, 120.0)."""
+    match = re.fullmatch(r"\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*", rate)
+    if match is None:
+        raise ValueError(f"Invalid rate limit {rate!r}")
+    count, multiple, unit = match.groups()
+    return int(count), int(multiple or 1) * PERIODS[unit]
+
+
+def gcra(tat: float, now: float, interval: float, period: float):
+    """One GCRA step: (allowed, new TAT, seconds until allowed, remaining).
+
+    The state of a key is a single timestamp, its theoretical arrival time;
+    a request is allowed while it is at most `period` ahead of now, which
+    permits bursts of up to limit = period / interval requests.
+    """
+    tat = max(tat, now)
+    new_tat = tat + interval
+    allow_at = new_tat - period
+    if now < allow_at:
+        return False, tat, allow_at - now, 0
+    return True, new_tat, 0.0, int((now - allow_at) / interval)
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self):
+        self._tats: dict[str, float] = {}
+        self._swept = time.time()
+
+    async def check(self, batch: list[tuple]) -> list[tuple]:
+        now = time.time()
+        results = []
+        for key, interval, period in batch:
+            allowed, tat, retry_after, remaining = gcra(self._tats.get(key, now), now, interval, period)
+            self._tats[key] = tat
+            results.append((allowed, retry_after, remaining))
+        if now - self._swept > SWEEP_INTERVAL:
+            self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+            self._swept = now
+        return results
+
+    async def close(self):
+        pass
+
+
+class SqliteBackend:
+    """GCRA state in a SQLite file shared by every process on the host.
+
+    A batch is one IMMEDIATE transaction, which SQLite serializes across
+    processes, so concurrent workers never double-spend a key.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS ratelimit (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+        self._swept = time.time()
+
+    def _check(self, batch: list[tuple]) -> list[tuple]:
+        results = []
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                keys = list({key for key, _, _ in batch})
+                tats = dict(conn.execute(
+                    f"SELECT key, tat FROM ratelimit WHERE key IN ({','.join('?' * len(keys))})", keys
+                ).fetchall())
+                for key, interval, period in batch:
+                    allowed, tats[key], retry_after, remaining = gcra(tats.get(key, now), now, interval, period)
+                    results.append((allowed, retry_after, remaining))
+                conn.executemany(
+                    "INSERT INTO ratelimit (key, tat) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET tat = excluded.tat",
+                    [(key, tats[key]) for key in keys],
+                )
+                if now - self._swept > SWEEP_INTERVAL:
+                    conn.execute("DELETE FROM ratelimit WHERE tat <= ?", (now,))
+                    self._swept = now
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return results
+
+    async def check(self, batch: list[tuple]) -> list[tuple]:
+        return await asyncio.to_thread(self._check, batch)
+
+    def _close(self):
+        with self._lock:
+            self._conn.close()
+
+    async def close(self):
+        # The lock may be held by a check running in a thread
+        await asyncio.to_thread(self._close)
+
+
+# KEYS[1]: key; ARGV: now, interval, period. Returns {allowed, retry_after, remaining}
+# with floats as strings, since Redis truncates Lua numbers to integers.
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if now < allow_at then
+    return {0, tostring(allow_at - now), 0}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0', math.floor((now - allow_at) / interval)}
+"""
+
+
+class RedisBackend:
+    """GCRA state in Redis (or a compatible server), one Lua call per check.
+
+    A batch goes out as one pipeline, so it costs a single round trip.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATELIMIT_STORAGE=redis:// needs the redis package")
+        self.url = url
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(GCRA_SCRIPT)
+
+    async def check(self, batch: list[tuple]) -> list[tuple]:
+        now = time.time()
+        pipe = self._client.pipeline(transaction=False)
+        for key, interval, period in batch:
+            await self._script(keys=[f"ratelimit:{key}"], args=[now, interval, period], client=pipe)
+        replies = await pipe.execute()
+        return [(bool(allowed), float(retry_after), int(remaining)) for allowed, retry_after, remaining in replies]
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def backend_for(url: str):
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith("sqlite://"):
+        return SqliteBackend(url[len("sqlite:///"):] or "ratelimit.db")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported RATELIMIT_STORAGE {url!r}")
+
+
+def get_remote_address(request: Request) -> str:
+    return request.client.host if request.client else "127.0.0.1"
+
+
+class Limiter:
+    """Per-client rate limits for route handlers, shared through `backend`.
+
+    Usage mirrors slowapi: decorate a handler that takes `request: Request`
+    with `@limiter.limit("10/minute")`. Rejected calls get a 429 with
+    Retry-After. If the backend fails, requests are let through and the
+    error is logged, so an unavailable store never takes the API down.
+    """
+
+    def __init__(self, storage: str, key_func=get_remote_address):
+        self.storage = storage
+        self.key_func = key_func
+        self.enabled = True
+        self._backend = None
+        self._pending: list[tuple] = []
+        self._flusher = None
+        self.stats = {
+            "checks": 0,
+            "rejected": 0,
+            "errors": 0,
+            "batches": 0,
+            "max_batch": 0,
+            "total_batch_ms": 0.0,
+            "max_batch_ms": 0.0,
+        }
+
+    @property
+    def backend(self):
+        # Built on first use so importing the app never touches the store
+        if self._backend is None:
+            self._backend = backend_for(self.storage)
+        return self._backend
+
+    async def hit(self, key: str, limit: int, period: float):
+        """(allowed, retry_after, remaining) for one request against `key`."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((key, period / limit, period, future))
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        # Group commit: one backend call per batch, and whatever queues up
+        # during that call forms the next batch
+        try:
+            while self._pending:
+                if BATCH_WINDOW > 0:
+                    await asyncio.sleep(BATCH_WINDOW)
+                else:
+                    await asyncio.sleep(0)
+                batch, self._pending = self._pending[:MAX_BATCH], self._pending[MAX_BATCH:]
+                start = time.perf_counter()
+                try:
+                    results = await self.backend.check([(key, interval, period) for key, interval, period, _ in batch])
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"[RateLimit] {self.storage} check failed, allowing {len(batch)} requests: {e}")
+                    results = [(True, 0.0, 0)] * len(batch)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.stats["checks"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+                self.stats["total_batch_ms"] += elapsed_ms
+                self.stats["max_batch_ms"] = round(max(self.stats["max_batch_ms"], elapsed_ms), 3)
+                for (_, _, _, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._flusher = None
+
+    def limit(self, rate: str):
+        limit, period = parse_rate(rate)
+
+        def decorator(fn):
+            scope = f"{fn.__module__}.{fn.__name__}:{rate}"
+
+            @functools.wraps(fn)
+            async def wrapper(*args, request: Request, **kwargs):
+                if self.enabled:
+                    key = f"{scope}:{self.key_func(request)}"
+                    allowed, retry_after, _ = await self.hit(key, limit, period)
+                    if not allowed:
+                        self.stats["rejected"] += 1
+                        raise HTTPException(
+                            status_code=429,
+                            detail=f"Rate limit exceeded: {rate}",
+                            headers={
+                                "Retry-After": str(math.ceil(retry_after)),
+                                "X-RateLimit-Limit": str(limit),
+                                "X-RateLimit-Remaining": "0",
+                            },
+                        )
+                return await fn(*args, request=request, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    async def close(self):
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+    def snapshot(self) -> dict:
+        batches = self.stats["batches"]
+        return {
+            "storage": self.storage,
+            "enabled": self.enabled,
+            **self.stats,
+            "total_batch_ms": round(self.stats["total_batch_ms"], 2),
+            "avg_batch_ms": round(self.stats["total_batch_ms"] / batches, 3) if batches else 0.0,
+            "avg_batch_size": round(self.stats["checks"] / batches, 2) if batches else 0.0,
+        }
+
+
+limiter = Limiter(STORAGE)
@@ -1,36 +1,147 @@
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
 from collections import deque
 
 # Create buffer for recent logs
 log_buffer = deque(maxlen=100)
 
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+log_stats = {
+    "enqueued": 0,
+    "dropped": 0,
+    "sampled_out": 0,
+    "enqueue_ns": 0,
+    "handled": 0,
+    "handle_ns": 0,
+}
+
+
 class InMemoryHandler(logging.Handler):
     def emit(self, record):
         log_entry = self.format(record)
         log_buffer.append(log_entry)
 
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any `extra=` fields."""
+
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them.
+
+    The stock QueueHandler formats in the caller; here message args are
+    merged only when the listener's handlers format the record, so the
+    event loop pays for little more than creating the record. When the
+    queue is full the record is dropped and counted instead of blocking.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        start = time.perf_counter_ns()
+        try:
+            self.queue.put_nowait(record)
+            log_stats["enqueued"] += 1
+        except queue.Full:
+            log_stats["dropped"] += 1
+        log_stats["enqueue_ns"] += time.perf_counter_ns() - start
+
+
+class TimedQueueListener(QueueListener):
+    def handle(self, record):
+        start = time.perf_counter_ns()
+        super().handle(record)
+        log_stats["handled"] += 1
+        log_stats["handle_ns"] += time.perf_counter_ns() - start
+
+
 # Logger config
 logger = logging.getLogger("bingepal")
 logger.setLevel(logging.INFO)
 
-formatter = logging.Formatter(
+text_formatter = logging.Formatter(
     "%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
 )
+json_formatter = JsonFormatter(datefmt="%Y-%m-%dT%H:%M:%S")
 
-# Console handler
+# Console handler (LOG_FORMAT=text for human-readable output)
 console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
+console_handler.setFormatter(
+    text_formatter if os.getenv("LOG_FORMAT", "json") == "text" else json_formatter
+)
 
-# In-memory handler
+# In-memory handler, read back as plain text by /api/dev-logs
 memory_handler = InMemoryHandler()
-memory_handler.setFormatter(formatter)
+memory_handler.setFormatter(text_formatter)
+
+log_queue = queue.Queue(maxsize=int(os.getenv("LOGGING_QUEUE_SIZE", "10000")))
+queue_handler = NonBlockingQueueHandler(log_queue)
+listener = TimedQueueListener(
+    log_queue, console_handler, memory_handler, respect_handler_level=True
+)
+
+_listening = False
 
 # Avoid duplicate handlers
 if not logger.hasHandlers():
-    logger.addHandler(console_handler)
-    logger.addHandler(memory_handler)
+    logger.addHandler(queue_handler)
+    listener.start()
+    _listening = True
+
+# High-volume per-request logs, sampled by LOG_REQUEST_SAMPLE_RATE (0..1)
+request_logger = logger.getChild("request")
+REQUEST_SAMPLE_RATE = float(os.getenv("LOG_REQUEST_SAMPLE_RATE", "1.0"))
+
+
+def sample_request() -> bool:
+    """Whether to log this request; decided before anything is formatted."""
+    if REQUEST_SAMPLE_RATE >= 1 or random.random() < REQUEST_SAMPLE_RATE:
+        return True
+    log_stats["sampled_out"] += 1
+    return False
+
+
+def stop_logging():
+    # Flushes whatever the listener has not written yet
+    global _listening
+    if _listening:
+        listener.stop()
+        _listening = False
+
 
 # Expose the log buffer
 def get_recent_logs():
-    return list(log_buffer)
\ No newline at end of file
+    return list(log_buffer)
+
+
+def get_log_stats():
+    enqueued = log_stats["enqueued"] + log_stats["dropped"]
+    return {
+        **log_stats,
+        "queue_depth": log_queue.qsize(),
+        "queue_capacity": log_queue.maxsize,
+        "avg_enqueue_us": round(log_stats["enqueue_ns"] / enqueued / 1000, 3) if enqueued else 0.0,
+        "avg_handle_us": round(log_stats["handle_ns"] / log_stats["handled"] / 1000, 3) if log_stats["handled"] else 0.0,
+    }
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from app.utils.logger import logger
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three increments."""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+def gauge(name: str, help: str, samples: list, label_names: tuple = (), type: str = "gauge") -> list[str]:
+    """Render a metric computed at scrape time from (labels, value) pairs."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(label_names, labels)} {value}")
+    return lines
+
+
+request_latency = Histogram(
+    "bingepal_request_duration_seconds",
+    "HTTP request latency by route and status",
+    ("method", "route", "status"),
+)
+upstream_latency = Histogram(
+    "bingepal_upstream_duration_seconds",
+    "Upstream provider call latency, including scheduling and retries",
+    ("provider", "op", "outcome"),
+)
+upstream_errors = Counter(
+    "bingepal_upstream_errors_total",
+    "Failed upstream provider calls",
+    ("provider", "op", "kind"),
+)
+loop_lag = Histogram(
+    "bingepal_event_loop_lag_seconds",
+    "How late the event loop woke a periodic probe",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+_collectors = []
+
+
+def register_collector(fn):
+    """Add a callable returning exposition lines, evaluated on each scrape."""
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines = []
+    for metric in (request_latency, upstream_latency, upstream_errors, loop_lag):
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            lines.extend(collect())
+        except Exception as e:
+            logger.error("[Metrics] Collector %s failed: %s", collect.__name__, e)
+    return "\n".join(lines) + "\n"
+
+
+def _route_template(scope) -> str:
+    # FastAPI resolves routers included with a prefix without copying their
+    # routes, so scope["route"] holds the path relative to the router; the
+    # effective route it records carries the mounted one (/api/suggest)
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    route = context if context is not None else scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_latency.observe(time.perf_counter() - start, scope["method"], _route_template(scope), status)
+
+
+LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+_lag_task = None
+last_loop_lag = 0.0
+
+
+async def _probe_loop_lag():
+    global last_loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        last_loop_lag = max(loop.time() - expected, 0.0)
+        loop_lag.observe(last_loop_lag)
+
+
+def start_loop_monitor():
+    global _lag_task
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(_probe_loop_lag())
+
+
+def stop_loop_monitor():
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        _lag_task = None
+
+
+@register_collector
+def _loop_lag_gauge():
+    return gauge(
+        "bingepal_event_loop_lag_last_seconds",
+        "Most recent event loop lag probe",
+        [((), last_loop_lag)],
+    )
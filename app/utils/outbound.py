@@ -0,0 +1,450 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+import httpx
+from app.utils import deadline
+from app.utils import metrics
+from app.utils.breaker import CircuitOpenError, breaker_for
+from app.utils.deadline import DeadlineExceeded
+from app.utils.http_client import get_client
+from app.utils.logger import logger
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+priority = ContextVar("outbound_priority", default=INTERACTIVE)
+# Flight shared with other callers, when running inside a coalesced call
+_flight = ContextVar("outbound_flight", default=None)
+# [count] of rate-limit tokens spent inside the current `tally()` block
+_tally = ContextVar("outbound_tally", default=None)
+
+
+@contextmanager
+def background():
+    """Run upstream calls made inside the block behind interactive traffic."""
+    token = priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        priority.reset(token)
+
+
+@contextmanager
+def tally():
+    """Count the upstream requests (quota tokens) made inside the block.
+
+    Yields a one-item list holding the running count; calls that only
+    joined a request someone else started are not counted.
+    """
+    counter = [0]
+    token = _tally.set(counter)
+    try:
+        yield counter
+    finally:
+        _tally.reset(token)
+
+
+class Flight:
+    """Priority of one upstream call that several callers are waiting on.
+
+    Starts at the priority of the caller that started it and is raised when
+    a more urgent caller joins, moving any quota wait already queued.
+    """
+
+    __slots__ = ("level", "waits")
+
+    def __init__(self, level: int):
+        self.level = level
+        # (bucket, future) of quota waits in progress
+        self.waits = set()
+
+    def raise_to(self, level: int):
+        if level >= self.level:
+            return
+        self.level = level
+        for bucket, future in self.waits:
+            bucket.reprioritize(future, level)
+
+
+@contextmanager
+def shared(flight: Flight):
+    """Run upstream calls made inside the block at `flight`'s priority."""
+    token = _flight.set(flight)
+    try:
+        yield
+    finally:
+        _flight.reset(token)
+
+
+def current_priority() -> int:
+    flight = _flight.get()
+    return flight.level if flight is not None else priority.get()
+
+
+def _charge():
+    counter = _tally.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+# (requests per second, burst) per upstream, from their published limits.
+# Override with OUTBOUND_RATE_<NAME> / OUTBOUND_BURST_<NAME>.
+RATE_LIMITS = {
+    "tmdb": (40.0, 20),         # ~50 req/s per IP
+    "anilist": (1.5, 3),        # 90 req/min
+    "jikan": (1.0, 3),          # 3 req/s and 60 req/min
+    "mangadex": (5.0, 5),       # 5 req/s per IP
+    "rawg": (5.0, 5),
+    "openlibrary": (3.0, 5),
+}
+
+RETRY_STATUSES = {429, 502, 503, 504}
+MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+MAX_RETRY_DELAY = float(os.getenv("OUTBOUND_MAX_RETRY_DELAY", "10"))
+BASE_BACKOFF = 0.5
+
+# Idempotent GETs to these providers get a duplicate request once the first
+# has been outstanding longer than that provider's recent p95 latency.
+HEDGE_PROVIDERS = {
+    name.strip()
+    for name in os.getenv("HEDGE_PROVIDERS", "tmdb,mangadex,rawg,openlibrary").split(",")
+    if name.strip()
+}
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+
+
+class TokenBucket:
+    """Token bucket with a priority queue of waiters.
+
+    Waiters are served strictly by (priority, arrival order), so background
+    work never jumps ahead of interactive requests and callers of the same
+    priority are served first come, first served.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer = None
+        self.stats = {
+            "acquired": 0,
+            "queued": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "retries": 0,
+            "throttled": 0,
+        }
+
+    def _refill(self, now: float):
+        if now < self.paused_until:
+            self.updated = now
+            return
+        start = max(self.updated, self.paused_until)
+        self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = now
+
+    async def acquire(self, level: int = INTERACTIVE):
+        start = time.monotonic()
+        self._refill(start)
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            self.stats["acquired"] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        # Inside a coalesced call, queue at the call's priority and let
+        # callers that join later move the wait up
+        flight = _flight.get()
+        if flight is not None:
+            level = flight.level
+            flight.waits.add((self, future))
+        heapq.heappush(self._waiters, (level, next(self._seq), future))
+        self.stats["queued"] += 1
+        self._schedule()
+        try:
+            await future
+        finally:
+            if flight is not None:
+                flight.waits.discard((self, future))
+
+        waited = (time.monotonic() - start) * 1000
+        self.stats["acquired"] += 1
+        self.stats["total_wait_ms"] += waited
+        if waited > self.stats["max_wait_ms"]:
+            self.stats["max_wait_ms"] = waited
+
+    def reprioritize(self, future, level: int):
+        for i, (_, seq, waiter) in enumerate(self._waiters):
+            if waiter is future:
+                self._waiters[i] = (level, seq, waiter)
+                heapq.heapify(self._waiters)
+                return
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is free right now and nobody is queued."""
+        self._refill(time.monotonic())
+        if self._waiters or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.stats["acquired"] += 1
+        return True
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens after the upstream told us to back off."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.stats["throttled"] += 1
+
+    def _schedule(self):
+        if self._timer is not None or not self._waiters:
+            return
+        now = time.monotonic()
+        delay = max(self.paused_until - now, 0.0) + max(1 - self.tokens, 0.0) / self.rate
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+        self._timer = None
+        self._refill(time.monotonic())
+        while self._waiters and self.tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # caller was cancelled while queued
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+        self._schedule()
+
+    def depth(self) -> int:
+        return len(self._waiters)
+
+    def snapshot(self) -> dict:
+        acquired = self.stats["acquired"]
+        return {
+            **self.stats,
+            "rate_per_s": self.rate,
+            "burst": self.burst,
+            "queue_depth": self.depth(),
+            "avg_wait_ms": round(self.stats["total_wait_ms"] / acquired, 3) if acquired else 0.0,
+            "total_wait_ms": round(self.stats["total_wait_ms"], 3),
+            "max_wait_ms": round(self.stats["max_wait_ms"], 3),
+        }
+
+
+def _bucket_for(name: str) -> TokenBucket:
+    rate, burst = RATE_LIMITS[name]
+    rate = float(os.getenv(f"OUTBOUND_RATE_{name.upper()}", rate))
+    burst = int(os.getenv(f"OUTBOUND_BURST_{name.upper()}", burst))
+    return TokenBucket(name, rate, burst)
+
+
+class LatencyTracker:
+    """Rolling window of successful response times, used for hedge delays."""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self._p95 = None
+        self._since_update = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self._since_update += 1
+        if self._since_update >= 20 or self._p95 is None:
+            self._since_update = 0
+            if len(self.samples) >= HEDGE_MIN_SAMPLES:
+                ordered = sorted(self.samples)
+                self._p95 = ordered[int(len(ordered) * 0.95) - 1]
+
+    def p95(self):
+        return self._p95
+
+
+buckets = {name: _bucket_for(name) for name in RATE_LIMITS}
+breakers = {name: breaker_for(name) for name in RATE_LIMITS}
+latencies = {name: LatencyTracker() for name in RATE_LIMITS}
+hedges = {name: {"hedged": 0, "hedge_won": 0} for name in RATE_LIMITS}
+
+
+def _retry_after(response: httpx.Response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+async def request(provider: str, method: str, url: str, op: str = "request", **kwargs) -> httpx.Response:
+    """Send a request through the provider's breaker and rate scheduler.
+
+    Fails fast with CircuitOpenError while the provider's circuit is open and
+    with DeadlineExceeded once the current request deadline has passed.
+    429 and 5xx gateway responses are retried after the upstream's
+    Retry-After (or jittered exponential backoff) unless that would exceed
+    OUTBOUND_MAX_RETRY_DELAY or the deadline, in which case the response is
+    returned to the caller instead of holding the request open.
+
+    `op` only labels the call in /metrics (search, detail, chapters, ...).
+    """
+    breaker = breakers[provider]
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        metrics.upstream_errors.inc(provider, op, "circuit_open")
+        raise
+    start = time.perf_counter()
+    outcome = "error"
+    recorded = False
+    try:
+        response = await _request_with_retries(provider, method, url, kwargs)
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        recorded = True
+        outcome = f"{response.status_code // 100}xx"
+        if response.status_code >= 400:
+            metrics.upstream_errors.inc(provider, op, f"http_{response.status_code}")
+        return response
+    except (httpx.TransportError, asyncio.TimeoutError) as e:
+        breaker.record_failure()
+        recorded = True
+        if isinstance(e, asyncio.TimeoutError):
+            outcome = "deadline"
+            metrics.upstream_errors.inc(provider, op, "deadline")
+            raise DeadlineExceeded(f"{provider} did not answer before the request deadline")
+        metrics.upstream_errors.inc(provider, op, type(e).__name__)
+        raise
+    except DeadlineExceeded:
+        outcome = "deadline"
+        metrics.upstream_errors.inc(provider, op, "deadline")
+        raise
+    finally:
+        metrics.upstream_latency.observe(time.perf_counter() - start, provider, op, outcome)
+        if not recorded:
+            breaker.release()
+
+
+async def _request_with_retries(provider: str, method: str, url: str, kwargs: dict) -> httpx.Response:
+    bucket = buckets[provider]
+    level = priority.get()
+
+    for attempt in range(MAX_RETRIES + 1):
+        left = deadline.check()
+        if left is None:
+            await bucket.acquire(level)
+        else:
+            try:
+                await asyncio.wait_for(bucket.acquire(level), left)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"Timed out queueing for {provider}")
+        _charge()
+
+        response = await _send(provider, method, url, kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
+
+        delay = _retry_after(response)
+        if delay is None:
+            delay = random.uniform(0, BASE_BACKOFF * 2 ** attempt)
+        else:
+            delay += random.uniform(0, BASE_BACKOFF)
+        left = deadline.remaining()
+        if delay > MAX_RETRY_DELAY or (left is not None and delay >= left):
+            return response
+        if response.status_code == 429:
+            bucket.pause(delay)
+
+        bucket.stats["retries"] += 1
+        logger.warning(
+            f"[Outbound] {provider} {method} {url} returned {response.status_code}, "
+            f"retrying in {delay:.2f}s (attempt {attempt + 1}/{MAX_RETRIES})"
+        )
+        await asyncio.sleep(delay)
+
+    return response
+
+
+async def _send(provider: str, method: str, url: str, kwargs: dict) -> httpx.Response:
+    client = get_client(provider)
+    left = deadline.remaining()
+    hedge_after = None
+    if method == "GET" and provider in HEDGE_PROVIDERS and latencies[provider].p95() is not None:
+        hedge_after = max(latencies[provider].p95(), HEDGE_MIN_DELAY)
+
+    start = time.monotonic()
+    attempts = [asyncio.ensure_future(client.request(method, url, **kwargs))]
+    try:
+        if hedge_after is not None and (left is None or hedge_after < left):
+            done, _ = await asyncio.wait(attempts, timeout=hedge_after)
+            # Hedges only use spare quota, they never queue behind others
+            if not done and buckets[provider].try_acquire():
+                hedges[provider]["hedged"] += 1
+                _charge()
+                attempts.append(asyncio.ensure_future(client.request(method, url, **kwargs)))
+
+        pending = set(attempts)
+        error = None
+        overall = None if left is None else left - (time.monotonic() - start)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=overall,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in done:
+                if task.exception() is None:
+                    if len(attempts) > 1 and task is attempts[1]:
+                        hedges[provider]["hedge_won"] += 1
+                    latencies[provider].add(time.monotonic() - start)
+                    return task.result()
+                error = task.exception()
+            if overall is not None:
+                overall = left - (time.monotonic() - start)
+        raise error
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+
+async def get(provider: str, url: str, **kwargs) -> httpx.Response:
+    return await request(provider, "GET", url, **kwargs)
+
+
+async def post(provider: str, url: str, **kwargs) -> httpx.Response:
+    return await request(provider, "POST", url, **kwargs)
+
+
+def snapshot() -> dict:
+    return {
+        name: {
+            **bucket.snapshot(),
+            **hedges[name],
+            "p95_ms": round(latencies[name].p95() * 1000, 1) if latencies[name].p95() else None,
+            "breaker": breakers[name].snapshot(),
+        }
+        for name, bucket in buckets.items()
+    }
+
+
+def breaker_states() -> dict:
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
@@ -0,0 +1,22 @@
+import asyncio
+
+
+async def fetch_pages(fetch, pages, concurrency: int):
+    """Yield (page, result) for each page as soon as it arrives.
+
+    At most `concurrency` fetches run at once; pending ones are cancelled if
+    the consumer stops early (e.g. a streaming client disconnects).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(page):
+        async with semaphore:
+            return page, await fetch(page)
+
+    tasks = [asyncio.ensure_future(run(page)) for page in pages]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,32 +1,49 @@
+import logging
+from functools import lru_cache
 from fastapi import Request
-from app.utils.logger import logger
+from app.utils.logger import request_logger, sample_request
 
+
+@lru_cache(maxsize=4096)
 def anonymize_ip(ip: str) -> str:
     parts = ip.split(".")
     return ".".join(parts[:2]) + ".*.*" if len(parts) == 4 else ip
 
-async def log_request(request: Request):
-    path = request.url.path
-    query = str(request.url.query)
-    method = request.method
-    raw_ip = request.client.host
-    ip = anonymize_ip(raw_ip)
 
-    user_agent = request.headers.get("user-agent", "Unknown")
+# A handful of distinct user agents make up nearly all traffic
+@lru_cache(maxsize=1024)
+def classify_platform(user_agent: str) -> str:
     if "Android" in user_agent:
-        platform = "Android"
+        return "Android"
     elif "iPhone" in user_agent:
-        platform = "iOS"
+        return "iOS"
     elif "Windows" in user_agent:
-        platform = "Windows"
+        return "Windows"
     elif "Mac" in user_agent:
-        platform = "macOS"
+        return "macOS"
     elif "Linux" in user_agent:
-        platform = "Linux"
-    else:
-        platform = "Unknown"
+        return "Linux"
+    return "Unknown"
+
+
+async def log_request(request: Request):
+    if not request_logger.isEnabledFor(logging.INFO) or not sample_request():
+        return
+
+    method = request.method
+    path = request.url.path
+    query = request.url.query
+    ip = anonymize_ip(request.client.host if request.client else "unknown")
 
-    if user_agent == "Unknown":
-        logger.info(f"[Request] {method} {path}?{query} from {ip}")
+    user_agent = request.headers.get("user-agent")
+    if user_agent is None:
+        request_logger.info(
+            "[Request] %s %s?%s from %s", method, path, query, ip,
+            extra={"method": method, "path": path, "ip": ip}
+        )
     else:
-        logger.info(f"[Request] {method} {path}?{query} from {ip} using {platform}")
+        platform = classify_platform(user_agent)
+        request_logger.info(
+            "[Request] %s %s?%s from %s using %s", method, path, query, ip, platform,
+            extra={"method": method, "path": path, "ip": ip, "platform": platform}
+        )
@@ -0,0 +1,46 @@
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, default=_default)
+
+
+def loads(data):
+    return orjson.loads(data)
+
+
+class JSONBytesResponse(Response):
+    """JSON response encoded with orjson, or passed through if already encoded.
+
+    Also the app's default response class, so endpoints that return plain
+    values go through the same encoder.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+def json_response(value, status_code: int = 200, headers: dict = None) -> Response:
+    """Serialize models we built ourselves straight to a response.
+
+    Returning a Response from an endpoint makes FastAPI skip validating and
+    re-encoding it against the route's response_model, which then only
+    documents the shape. `value` may also be pre-encoded JSON bytes.
+    """
+    return JSONBytesResponse(value, status_code=status_code, headers=headers)
+
+
+def join_arrays(bodies: list[bytes]) -> bytes:
+    """Concatenate encoded JSON arrays into one array without decoding them."""
+    items = [body[1:-1] for body in bodies if len(body) > 2]
+    return b"[" + b",".join(items) + b"]"
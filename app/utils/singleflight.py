@@ -0,0 +1,70 @@
+import asyncio
+import functools
+from collections import defaultdict
+from app.utils import outbound
+from app.utils.cache import make_key
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The call's upstream requests run at the most urgent priority among the
+    callers waiting on it, so an interactive request that joins a call
+    started by background work is not queued behind other traffic.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, tuple] = {}
+        self.stats = defaultdict(lambda: {"calls": 0, "coalesced": 0})
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, namespace: str, fn):
+        counts = self.stats[namespace]
+        counts["calls"] += 1
+        level = outbound.current_priority()
+        entry = self._inflight.get(key)
+        if entry is None:
+            # Run as its own task so one caller disconnecting does not cancel
+            # the upstream call everyone else is waiting on.
+            flight = outbound.Flight(level)
+            task = asyncio.ensure_future(self._run(flight, fn))
+            self._inflight[key] = (task, flight)
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            task, flight = entry
+            flight.raise_to(level)
+            counts["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def _run(self, flight, fn):
+        with outbound.shared(flight):
+            return await fn()
+
+    def _done(self, key: str, task: asyncio.Task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> dict:
+        return {"inflight": self.inflight(), "namespaces": dict(self.stats)}
+
+
+flights = SingleFlight()
+
+
+def coalesced(source: str, op: str):
+    namespace = f"{source}.{op}"
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args):
+            key = make_key(source, op, *args)
+            return await flights.do(key, namespace, lambda: fn(*args))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,247 @@
+import bisect
+import heapq
+import os
+import re
+from sqlalchemy import select
+from app.models import MEDIA_TYPES, TrendingTotal
+from app.utils import catalog
+from app.utils.cache import on_fetch
+from app.utils.logger import logger
+
+# Titles kept per media type; the least viewed go first when it fills up
+MAX_TITLES = int(os.getenv("SUGGEST_MAX_TITLES", "20000"))
+MAX_RESULTS = 10
+# Only the first words of a title are indexed as starting points
+MAX_WORDS = 8
+# Memoized prefix results per type; cleared entries are recomputed on demand
+MEMO_SIZE = int(os.getenv("SUGGEST_MEMO_SIZE", "20000"))
+
+
+def fold(text: str) -> str:
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+def _terms(title: str) -> list[str]:
+    # "The Matrix" is found from "the m" and from "matr"
+    words = fold(title).split()[:MAX_WORDS]
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class TypeIndex:
+    """Sorted array of terms, with the title key of each in a parallel array.
+
+    Every title is stored once per word it can be found from. A prefix
+    maps to one contiguous slice found by two bisections; its top titles
+    are memoized and, since counts only grow, kept current by promoting a
+    title into the memoized lists of its prefixes when it gains views. New
+    titles are inserted in place; once the index holds 10% more than
+    `capacity` titles it is pruned back to the `capacity` most viewed,
+    which keeps the arrays sorted without re-sorting them.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.titles: dict[tuple, str] = {}
+        self.counts: dict[tuple, int] = {}
+        self.terms: list[str] = []
+        self.keys: list[tuple] = []
+        # prefix -> keys of its top MAX_RESULTS titles, best first
+        self.memo: dict[str, list] = {}
+
+    def _rank(self, key: tuple):
+        # Most viewed first, ties to the shorter title
+        title = self.titles[key]
+        return -self.counts[key], len(title), title
+
+    def _insert(self, key: tuple, title: str):
+        for term in _terms(title):
+            i = bisect.bisect_right(self.terms, term)
+            self.terms.insert(i, term)
+            self.keys.insert(i, key)
+
+    def _remove(self, key: tuple, title: str):
+        for term in _terms(title):
+            i = bisect.bisect_left(self.terms, term)
+            while self.keys[i] != key:
+                i += 1
+            del self.terms[i]
+            del self.keys[i]
+
+    def _prefixes(self, title: str):
+        for term in _terms(title):
+            for i in range(1, len(term) + 1):
+                yield term[:i]
+
+    def _forget(self, title: str):
+        for prefix in self._prefixes(title):
+            self.memo.pop(prefix, None)
+
+    def _promote(self, key: tuple, title: str):
+        rank = self._rank(key)
+        for prefix in self._prefixes(title):
+            top = self.memo.get(prefix)
+            if top is None:
+                continue
+            if key not in top:
+                # A short list already holds every title under the prefix
+                if len(top) < MAX_RESULTS:
+                    top.append(key)
+                elif rank < self._rank(top[-1]):
+                    top[-1] = key
+                else:
+                    continue
+            top.sort(key=self._rank)
+
+    def add(self, key: tuple, title: str, n: int):
+        current = self.titles.get(key)
+        if current is None:
+            self.titles[key] = title
+            self.counts[key] = 0
+            self._insert(key, title)
+        elif current != title:
+            self._forget(current)
+            self._remove(key, current)
+            self.titles[key] = title
+            self._insert(key, title)
+        elif n == 0:
+            return
+        self.counts[key] += n
+        self._promote(key, title)
+        if len(self.titles) > self.capacity + self.capacity // 10:
+            self.prune()
+
+    def prune(self):
+        keep = set(heapq.nlargest(self.capacity, self.counts, key=self.counts.__getitem__))
+        self.titles = {key: title for key, title in self.titles.items() if key in keep}
+        self.counts = {key: count for key, count in self.counts.items() if key in keep}
+        kept = [(term, key) for term, key in zip(self.terms, self.keys) if key in keep]
+        self.terms = [term for term, _ in kept]
+        self.keys = [key for _, key in kept]
+        self.memo = {}
+
+    def load(self, rows: list[tuple]):
+        """Replace the index with (key, title, count) rows, most viewed first."""
+        self.titles = {}
+        self.counts = {}
+        for key, title, count in rows:
+            if key not in self.titles and len(self.titles) < self.capacity:
+                self.titles[key] = title
+                self.counts[key] = count
+        ordered = sorted(
+            (term, key) for key, title in self.titles.items() for term in _terms(title)
+        )
+        self.terms = [term for term, _ in ordered]
+        self.keys = [key for _, key in ordered]
+        self.memo = {}
+
+    def lookup(self, prefix: str, type: str, n: int) -> list[dict]:
+        top = self.memo.get(prefix)
+        if top is None:
+            lo = bisect.bisect_left(self.terms, prefix)
+            hi = bisect.bisect_left(self.terms, prefix + "\U0010ffff", lo)
+            # Count ties at the cut-off are settled arbitrarily
+            top = heapq.nlargest(MAX_RESULTS, set(self.keys[lo:hi]), key=self.counts.__getitem__)
+            top.sort(key=self._rank)
+            if len(self.memo) >= MEMO_SIZE:
+                del self.memo[next(iter(self.memo))]
+            self.memo[prefix] = top
+        return [
+            {"title": self.titles[k], "type": type, "source": k[0], "source_id": k[1],
+             "count": self.counts[k]}
+            for k in top[:n]
+        ]
+
+
+class SuggestIndex:
+    """In-process typeahead over viewed and catalogued titles, per media type.
+
+    Ranked by all-time views. Loaded from the trending rollups and the
+    catalog at startup, then fed by /api/log events and provider results.
+    Like the trending engine, each worker only sees its own events until
+    the next restart.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.types: dict[str, TypeIndex] = {}
+        self.ready = False
+        # Events recorded while a bootstrap is reading, replayed onto the
+        # loaded index
+        self._recorded = None
+
+    def _index(self, type: str) -> TypeIndex:
+        index = self.types.get(type)
+        if index is None:
+            index = self.types[type] = TypeIndex(self.capacity)
+        return index
+
+    def record(self, type: str, source: str, source_id: str, title: str, n: int = 1):
+        self._index(type).add((source, source_id), title, n)
+        if self._recorded is not None:
+            self._recorded.append((type, (source, source_id), title, n))
+
+    def suggest(self, prefix: str, type: str = None, n: int = MAX_RESULTS) -> list[dict]:
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+        if type is not None:
+            index = self.types.get(type)
+            return index.lookup(prefix, type, n) if index is not None else []
+        found = [hit for t, index in self.types.items() for hit in index.lookup(prefix, t, n)]
+        return heapq.nlargest(n, found, key=lambda hit: hit["count"])
+
+    async def bootstrap(self, session):
+        self._recorded = []
+        try:
+            totals = await session.execute(
+                select(TrendingTotal.type, TrendingTotal.source, TrendingTotal.source_id,
+                       TrendingTotal.title, TrendingTotal.count)
+                .where(TrendingTotal.type.in_(MEDIA_TYPES))
+                .order_by(TrendingTotal.count.desc())
+            )
+            rows = {}
+            for type, source, source_id, title, count in totals.all():
+                rows.setdefault(type, []).append(((source, source_id), title, count))
+            # Never-viewed titles rank last and only fill what views left free
+            for type, source, source_id, title in await catalog.known_titles(self.capacity * 4):
+                rows.setdefault(type, []).append(((source, source_id), title, 0))
+            recorded = self._recorded
+        finally:
+            self._recorded = None
+
+        self.types = {}
+        for type, items in rows.items():
+            self._index(type).load(items)
+        # As in the trending engine, views that reached the rollups before
+        # the query count twice until the next restart
+        for type, key, title, n in recorded:
+            self._index(type).add(key, title, n)
+        self.ready = True
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "types": {
+                type: {"titles": len(index.titles), "terms": len(index.terms), "memo": len(index.memo)}
+                for type, index in self.types.items()
+            },
+        }
+
+
+suggest_index = SuggestIndex(MAX_TITLES)
+
+
+@on_fetch
+def index_titles(source: str, op: str, value):
+    """Make titles returned by providers suggestible before anyone views them."""
+    if op not in ("search", "detail"):
+        return
+    for result in value if isinstance(value, list) else [value]:
+        suggest_index.record(result.type, result.source, result.id, result.title, n=0)
+
+
+async def start_suggest_index(session_factory):
+    async with session_factory() as session:
+        await suggest_index.bootstrap(session)
+    counts = {type: len(index.titles) for type, index in suggest_index.types.items()}
+    logger.info(f"[Suggest] Indexed titles per type: {counts}")
@@ -0,0 +1,257 @@
+import asyncio
+import heapq
+import os
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from sqlalchemy import select
+from app.models import MEDIA_TYPES, TrendingDaily, TrendingTotal
+from app.utils.logger import logger
+
+# Windows kept as running summaries; other `days` values merge day buckets.
+WINDOWS = (1, 7, 30, 365)
+HISTORY_DAYS = max(WINDOWS)
+
+
+class BoundedCounter:
+    """Counts for the heaviest keys in bounded memory.
+
+    Keys are counted exactly until the counter holds twice its capacity, at
+    which point it is pruned back to the `capacity` heaviest keys. Pruning
+    is amortized over `capacity` inserts, so `add` stays O(1) on average.
+    A pruned key that comes back starts again from zero, so its count is a
+    lower bound; keys that stay in the top `capacity` are exact.
+    """
+
+    __slots__ = ("capacity", "counts")
+
+    def __init__(self, capacity: int, counts: dict = None):
+        self.capacity = capacity
+        self.counts = counts or {}
+
+    def add(self, key, n: int = 1):
+        counts = self.counts
+        if key in counts:
+            counts[key] += n
+            return
+        counts[key] = n
+        if len(counts) > 2 * self.capacity:
+            self.counts = dict(heapq.nlargest(self.capacity, counts.items(), key=itemgetter(1)))
+
+    def subtract(self, other: "BoundedCounter"):
+        counts = self.counts
+        for key, n in other.counts.items():
+            current = counts.get(key)
+            if current is None:
+                continue
+            if current <= n:
+                del counts[key]
+            else:
+                counts[key] = current - n
+
+    def top(self, n: int) -> list:
+        return heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+
+
+class TypeState:
+    def __init__(self, capacity: int, day_capacity: int):
+        self.capacity = capacity
+        self.day_capacity = day_capacity
+        self.days: dict[date, BoundedCounter] = {}
+        self.windows = {w: BoundedCounter(capacity) for w in WINDOWS}
+        self.total = BoundedCounter(capacity)
+        self.titles: dict[tuple, str] = {}
+        # Titles are pruned to the counted keys once they outgrow this
+        self.titles_limit = 2 * capacity
+        self.version = 0
+        self.cache: dict[int, tuple] = {}
+
+    def add(self, day: date, key: tuple, title: str, n: int = 1):
+        bucket = self.days.get(day)
+        if bucket is None:
+            bucket = self.days[day] = BoundedCounter(self.day_capacity)
+        bucket.add(key, n)
+        for summary in self.windows.values():
+            summary.add(key, n)
+        self.total.add(key, n)
+        self.titles[key] = title
+        if len(self.titles) > self.titles_limit:
+            self.prune_titles()
+        self.version += 1
+
+    def prune_titles(self):
+        # Amortized like BoundedCounter: the limit doubles past what is kept
+        live = set(self.total.counts)
+        for counter in (*self.days.values(), *self.windows.values()):
+            live.update(counter.counts)
+        self.titles = {key: title for key, title in self.titles.items() if key in live}
+        self.titles_limit = max(2 * len(self.titles), 2 * self.capacity)
+
+
+class TrendingEngine:
+    """In-process top-k per media type over sliding day windows.
+
+    Loaded from the SQL rollups, which every worker writes to, and fed
+    from this worker's /api/log events in between. Reloading every
+    RESYNC_INTERVAL seconds picks up the other workers' events, so counts
+    lag them by up to that interval.
+    """
+
+    def __init__(self, capacity: int = 1000, day_capacity: int = 500):
+        self.capacity = capacity
+        self.day_capacity = day_capacity
+        self.types: dict[str, TypeState] = {}
+        self.today = datetime.utcnow().date()
+        self.ready = False
+        # Events recorded while a bootstrap is reading the rollups, replayed
+        # onto the reloaded state
+        self._recorded = None
+
+    def _state(self, type: str) -> TypeState:
+        state = self.types.get(type)
+        if state is None:
+            state = self.types[type] = TypeState(self.capacity, self.day_capacity)
+        return state
+
+    def _roll(self, today: date):
+        if today <= self.today:
+            return
+        day = self.today
+        while day < today:
+            day += timedelta(days=1)
+            for state in self.types.values():
+                for w, summary in state.windows.items():
+                    expired = state.days.get(day - timedelta(days=w))
+                    if expired is not None:
+                        summary.subtract(expired)
+                state.days.pop(day - timedelta(days=HISTORY_DAYS), None)
+                state.version += 1
+        self.today = today
+
+    def record(self, type: str, source: str, source_id: str, title: str):
+        today = datetime.utcnow().date()
+        self._roll(today)
+        self._state(type).add(today, (source, source_id), title)
+        if self._recorded is not None:
+            self._recorded.append((type, today, (source, source_id), title))
+
+    def top(self, type: str, days: int, n: int = 10) -> list[dict]:
+        self._roll(datetime.utcnow().date())
+        state = self.types.get(type)
+        if state is None:
+            return []
+
+        cached = state.cache.get(days)
+        if cached is not None and cached[0] == state.version and cached[1] >= n:
+            return cached[2][:n]
+
+        if days <= 0:
+            summary = state.total
+        elif days in state.windows:
+            summary = state.windows[days]
+        else:
+            summary = BoundedCounter(self.capacity)
+            for offset in range(min(days, HISTORY_DAYS)):
+                bucket = state.days.get(self.today - timedelta(days=offset))
+                if bucket is not None:
+                    for key, count in bucket.counts.items():
+                        summary.add(key, count)
+
+        result = [
+            {"title": state.titles.get(key, ""), "count": count, "source": key[0], "source_id": key[1]}
+            for key, count in summary.top(n)
+        ]
+        state.cache[days] = (state.version, n, result)
+        return result
+
+    def _rebuild_windows(self, state: TypeState):
+        state.windows = {w: BoundedCounter(self.capacity) for w in WINDOWS}
+        for day, bucket in state.days.items():
+            age = (self.today - day).days
+            for w, summary in state.windows.items():
+                if age < w:
+                    for key, count in bucket.counts.items():
+                        summary.add(key, count)
+        state.version += 1
+
+    def prune_titles(self):
+        for state in self.types.values():
+            state.prune_titles()
+
+    async def bootstrap(self, session):
+        """Rebuild every window from the daily and all-time rollups."""
+        self._recorded = []
+        try:
+            since = datetime.utcnow().date() - timedelta(days=HISTORY_DAYS - 1)
+            daily = await session.execute(
+                select(TrendingDaily.day, TrendingDaily.type, TrendingDaily.source,
+                       TrendingDaily.source_id, TrendingDaily.title, TrendingDaily.count)
+                .where(TrendingDaily.day >= since, TrendingDaily.type.in_(MEDIA_TYPES))
+            )
+            totals = await session.execute(
+                select(TrendingTotal.type, TrendingTotal.source, TrendingTotal.source_id,
+                       TrendingTotal.title, TrendingTotal.count)
+                .where(TrendingTotal.type.in_(MEDIA_TYPES))
+            )
+            recorded = self._recorded
+        finally:
+            self._recorded = None
+
+        self.types = {}
+        self.today = datetime.utcnow().date()
+        for bucket_day, type, source, source_id, title, count in daily.all():
+            state = self._state(type)
+            bucket = state.days.get(bucket_day)
+            if bucket is None:
+                bucket = state.days[bucket_day] = BoundedCounter(self.day_capacity)
+            bucket.add((source, source_id), count)
+            state.titles[(source, source_id)] = title
+        for type, source, source_id, title, count in totals.all():
+            state = self._state(type)
+            state.total.add((source, source_id), count)
+            state.titles.setdefault((source, source_id), title)
+        for state in self.types.values():
+            self._rebuild_windows(state)
+        # Events that reached the rollups before the query count twice
+        # until the next resync; ones still queued for writing are kept
+        for type, day, key, title in recorded:
+            self._state(type).add(day, key, title)
+        self._roll(datetime.utcnow().date())
+        self.prune_titles()
+        self.ready = True
+
+
+# Seconds between reloads from the rollups; 0 loads them only at startup
+RESYNC_INTERVAL = float(os.getenv("TRENDING_RESYNC_INTERVAL", "300"))
+
+trending_engine = TrendingEngine(
+    capacity=int(os.getenv("TRENDING_CAPACITY", "1000")),
+    day_capacity=int(os.getenv("TRENDING_DAY_CAPACITY", "500")),
+)
+_resync_task = None
+
+
+async def _resync_loop(session_factory):
+    while True:
+        await asyncio.sleep(RESYNC_INTERVAL)
+        try:
+            async with session_factory() as session:
+                await trending_engine.bootstrap(session)
+        except Exception as e:
+            logger.error(f"[Trending] Resync from rollups failed: {e}")
+
+
+async def start_trending_engine(session_factory):
+    global _resync_task
+    if RESYNC_INTERVAL > 0 and _resync_task is None:
+        _resync_task = asyncio.create_task(_resync_loop(session_factory))
+    async with session_factory() as session:
+        await trending_engine.bootstrap(session)
+    logger.info("[Trending] Loaded top-k windows from the rollups")
+
+
+async def stop_trending_engine():
+    global _resync_task
+    if _resync_task is not None:
+        _resync_task.cancel()
+        await asyncio.gather(_resync_task, return_exceptions=True)
+        _resync_task = None
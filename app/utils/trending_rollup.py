@@ -0,0 +1,94 @@
+from collections import Counter
+from sqlalchemy import delete, func, select, cast, Date, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import SCHEMA_LOCK_ID
+from app.models import SearchLog, TrendingDaily, TrendingTotal
+from app.utils.logger import logger
+
+
+def _upsert(table, rows: list[dict], keys: list[str]):
+    stmt = pg_insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={
+            "count": table.count + stmt.excluded.count,
+            "title": stmt.excluded.title,
+        },
+    )
+
+
+async def record_views(session: AsyncSession, rows: list[dict]):
+    """Fold a batch of log rows into the daily and all-time rollups.
+
+    Runs inside the caller's transaction so the rollup never drifts from
+    search_logs. Each row counts towards the UTC day of its own `timestamp`,
+    the same day rebuild() derives from the stored column. Rows are sorted
+    by key so concurrent workers take row locks in the same order.
+    """
+    counts = Counter()
+    day_counts = Counter()
+    titles = {}
+    for row in rows:
+        key = (row["type"], row["source"], row["source_id"])
+        counts[key] += 1
+        day_counts[(row["timestamp"].date(), *key)] += 1
+        titles[key] = row["title"]
+
+    totals = [
+        {"type": t, "source": s, "source_id": sid, "title": titles[(t, s, sid)], "count": counts[(t, s, sid)]}
+        for t, s, sid in sorted(counts)
+    ]
+    daily = [
+        {"day": day, "type": t, "source": s, "source_id": sid, "title": titles[(t, s, sid)], "count": n}
+        for (day, t, s, sid), n in sorted(day_counts.items())
+    ]
+
+    await session.execute(_upsert(TrendingDaily, daily, ["day", "type", "source", "source_id"]))
+    await session.execute(_upsert(TrendingTotal, totals, ["type", "source", "source_id"]))
+
+
+async def rebuild(session: AsyncSession):
+    """Recompute both rollups from the raw search_logs table."""
+    day = cast(SearchLog.timestamp, Date)
+    await session.execute(delete(TrendingDaily))
+    await session.execute(delete(TrendingTotal))
+    await session.execute(
+        insert(TrendingDaily).from_select(
+            ["day", "type", "source", "source_id", "title", "count"],
+            select(
+                day, SearchLog.type, SearchLog.source, SearchLog.source_id,
+                func.max(SearchLog.title), func.count()
+            ).group_by(day, SearchLog.type, SearchLog.source, SearchLog.source_id),
+        )
+    )
+    await session.execute(
+        insert(TrendingTotal).from_select(
+            ["type", "source", "source_id", "title", "count"],
+            select(
+                TrendingDaily.type, TrendingDaily.source, TrendingDaily.source_id,
+                func.max(TrendingDaily.title), func.sum(TrendingDaily.count)
+            ).group_by(TrendingDaily.type, TrendingDaily.source, TrendingDaily.source_id),
+        )
+    )
+    await session.commit()
+
+
+async def rebuild_if_empty(session: AsyncSession):
+    """Rebuild the rollups if they are empty but search_logs is not.
+
+    Workers booting together serialize on the schema advisory lock and
+    check again once they hold it, so only the first one rebuilds.
+    """
+    has_rollup = await session.scalar(select(TrendingTotal.type).limit(1))
+    if has_rollup is not None:
+        return
+    await session.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+    has_rollup = await session.scalar(select(TrendingTotal.type).limit(1))
+    has_logs = await session.scalar(select(SearchLog.id).limit(1))
+    if has_rollup is None and has_logs is not None:
+        logger.info("[Trending] Rollup is empty, rebuilding from search_logs")
+        await rebuild(session)
+    else:
+        # Releases the advisory lock
+        await session.commit()
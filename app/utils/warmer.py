@@ -0,0 +1,170 @@
+import asyncio
+import os
+import time
+from sqlalchemy import text
+from app.db import engine
+from app.services import anilist, mangadex, openlibrary, rawg, tmdb
+from app.utils import outbound
+from app.utils.logger import logger
+from app.utils.topk import trending_engine
+
+# Seconds between warming runs; 0 disables the warmer
+INTERVAL = float(os.getenv("CACHE_WARM_INTERVAL", "900"))
+# Delay before the first run, so it does not compete with startup
+INITIAL_DELAY = float(os.getenv("CACHE_WARM_INITIAL_DELAY", "60"))
+# Trending titles per type, over the last WARM_DAYS days
+TOP = int(os.getenv("CACHE_WARM_TOP", "20"))
+DAYS = int(os.getenv("CACHE_WARM_DAYS", "7"))
+# Upstream requests one run may spend across all providers. Checked before
+# each lookup, so a run can overshoot by the pages of one chapter list.
+BUDGET = int(os.getenv("CACHE_WARM_BUDGET", "100"))
+# Session advisory lock held by the one worker that warms. Workers share the
+# upstream quota, so one of them spends BUDGET rather than each; with a
+# memory-only cache the others are not warmed (set CACHE_DB_PATH to share).
+LOCK_ID = 727432
+
+# media type -> (source the logged ids belong to, cached lookup, extra arguments after the id)
+DETAIL_TARGETS = {
+    "movie": ("tmdb", tmdb.get_detail, ("movie",)),
+    "series": ("tmdb", tmdb.get_detail, ("series",)),
+    "anime": ("anilist", anilist.get_detail, ()),
+    "game": ("rawg", rawg.get_detail, ()),
+    "book": ("openlibrary", openlibrary.get_detail, ()),
+    "manga": ("mangadex", mangadex.get_detail, ()),
+}
+# Episode lists for anime come from Jikan, so only titles logged with
+# Jikan (MyAnimeList) ids can be warmed
+CHAPTER_TARGETS = {
+    "series": ("tmdb", tmdb.get_episodes, ()),
+    "anime": ("jikan", anilist.get_episodes, ()),
+    "manga": ("mangadex", mangadex.get_chapters, ()),
+}
+
+_task = None
+leader = False
+last_run = {}
+
+
+def _busy(provider: str) -> bool:
+    # Live calls are queued for quota, or the provider is failing
+    return (
+        outbound.buckets[provider].depth() > 0
+        or outbound.breakers[provider].state != "closed"
+    )
+
+
+def _plan() -> list[tuple]:
+    """(views, provider, lookup, args) for every trending title, hottest first."""
+    jobs = []
+    for table in (DETAIL_TARGETS, CHAPTER_TARGETS):
+        for type, (source, lookup, args) in table.items():
+            for item in trending_engine.top(type, DAYS, TOP):
+                if item["source"] == source:
+                    jobs.append((item["count"], source, lookup, (item["source_id"], *args)))
+    jobs.sort(key=lambda job: -job[0])
+    return jobs
+
+
+async def warm_once() -> dict:
+    """Prefetch trending details and chapter lists missing from the cache."""
+    stats = {"planned": 0, "fetched": 0, "cached": 0, "busy": 0, "failed": 0, "spent": 0}
+    if not trending_engine.ready:
+        return stats
+    start = time.perf_counter()
+    jobs = _plan()
+    stats["planned"] = len(jobs)
+    with outbound.background(), outbound.tally() as spent:
+        for _, provider, lookup, args in jobs:
+            if spent[0] >= BUDGET:
+                break
+            if _busy(provider):
+                stats["busy"] += 1
+                continue
+            try:
+                if await lookup.warm(*args):
+                    stats["fetched"] += 1
+                else:
+                    stats["cached"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                logger.warning(f"[Warmer] {provider} {args[0]} failed: {e}")
+        stats["spent"] = spent[0]
+    stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return stats
+
+
+# A bigint advisory key is stored as classid (high 32 bits) and objid (low)
+HOLDS_LOCK = text("""
+    SELECT EXISTS (
+        SELECT 1 FROM pg_locks
+        WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted
+          AND classid::bigint = (CAST(:id AS bigint) >> 32)
+          AND objid::bigint = (CAST(:id AS bigint) & 4294967295) AND objsubid = 1
+    )
+""")
+
+
+async def _lead(conn) -> bool:
+    """Take the warmer lock if no other worker holds it, or check it is still ours.
+
+    The lock lives as long as `conn`'s session, so another worker takes it
+    over when this one exits or loses its connection. Checked before every
+    run, so a worker whose session was replaced stops warming.
+    """
+    global leader
+    if leader:
+        leader = (await conn.execute(HOLDS_LOCK, {"id": LOCK_ID})).scalar()
+        if not leader:
+            logger.warning("[Warmer] Lost the warmer lock")
+    if not leader:
+        leader = (await conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": LOCK_ID})).scalar()
+    # Session locks outlive the transaction; do not sit idle in one
+    await conn.commit()
+    return leader
+
+
+async def _warm_loop():
+    global leader
+    await asyncio.sleep(INITIAL_DELAY)
+    conn = None
+    try:
+        while True:
+            try:
+                if conn is None:
+                    conn = await engine.connect()
+                led = await _lead(conn)
+            except Exception as e:
+                logger.error(f"[Warmer] Could not check the warmer lock: {e}")
+                if conn is not None:
+                    await asyncio.gather(conn.close(), return_exceptions=True)
+                conn, leader, led = None, False, False
+            if led:
+                try:
+                    last_run.clear()
+                    last_run.update(await warm_once(), finished_at=time.time())
+                    logger.info(f"[Warmer] {last_run}")
+                except Exception as e:
+                    logger.error(f"[Warmer] Run failed: {e}")
+            await asyncio.sleep(INTERVAL)
+    finally:
+        leader = False
+        if conn is not None:
+            await conn.close()
+
+
+def start_cache_warmer():
+    global _task
+    if INTERVAL > 0 and _task is None:
+        _task = asyncio.create_task(_warm_loop())
+
+
+async def stop_cache_warmer():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def snapshot() -> dict:
+    return {"enabled": INTERVAL > 0, "leader": leader, "budget": BUDGET, "last_run": dict(last_run)}
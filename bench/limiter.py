@@ -0,0 +1,159 @@
+"""Rate limiter benchmark.
+
+Measures the cost of one limiter check per backend, with the batching
+the app uses, and checks that several processes sharing a backend never
+allow more than the limit between them:
+
+    python -m bench.limiter
+    python -m bench.limiter --backend sqlite --concurrency 1 16 128
+    python -m bench.limiter --backend redis --redis-url redis://localhost:6379/15
+
+Redis runs are skipped unless --redis-url is given; any Redis-compatible
+server works.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from bench.load import percentile
+from bench.run import RESULTS_DIR, git_revision
+
+BACKENDS = ["memory", "sqlite", "redis"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 128])
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per backend and concurrency")
+    parser.add_argument("--keys", type=int, default=1000, help="Distinct client keys to spread checks over")
+    parser.add_argument("--processes", type=int, default=4, help="Workers in the shared-limit check")
+    parser.add_argument("--limit", type=int, default=50, help="Per-minute limit in the shared-limit check")
+    parser.add_argument("--redis-url", help="Redis-compatible server to test against")
+    parser.add_argument("--no-save", action="store_true", help="Do not write a results file")
+    return parser.parse_args(argv)
+
+
+def storage_url(backend: str, args) -> str:
+    if backend == "memory":
+        return "memory://"
+    if backend == "sqlite":
+        return "sqlite:///" + os.path.join(tempfile.gettempdir(), f"bingepal_bench_ratelimit_{os.getpid()}.db")
+    return args.redis_url
+
+
+async def measure(storage: str, concurrency: int, duration: float, keys: int) -> dict:
+    """Closed-loop workers calling Limiter.hit, as the route decorator does."""
+    from app.utils.limiter import Limiter
+
+    limiter = Limiter(storage)
+    latencies = []
+    stop_at = time.perf_counter() + duration
+
+    async def worker(index: int):
+        n = index
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            # Generous limit on spread keys: this measures overhead, not rejections
+            await limiter.hit(f"bench:{n % keys}", 1_000_000, 60)
+            latencies.append(time.perf_counter() - start)
+            n += concurrency
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stats = limiter.snapshot()
+    await limiter.close()
+
+    ordered = sorted(latencies)
+    return {
+        "concurrency": concurrency,
+        "checks": len(latencies),
+        "checks_per_s": round(len(latencies) / elapsed, 1),
+        "p50_us": round(percentile(ordered, 50) * 1e6, 1),
+        "p99_us": round(percentile(ordered, 99) * 1e6, 1),
+        "avg_batch_size": stats["avg_batch_size"],
+        "avg_batch_ms": stats["avg_batch_ms"],
+    }
+
+
+def _shared_worker(storage: str, key: str, limit: int, attempts: int, start_at: float, results):
+    from app.utils.limiter import Limiter
+
+    async def run():
+        limiter = Limiter(storage)
+        await asyncio.sleep(max(start_at - time.time(), 0))
+        outcomes = await asyncio.gather(*(limiter.hit(key, limit, 60) for _ in range(attempts)))
+        await limiter.close()
+        return sum(1 for allowed, _, _ in outcomes if allowed)
+
+    results.put(asyncio.run(run()))
+
+
+def shared_limit(storage: str, processes: int, limit: int) -> dict:
+    """Every process tries `limit` hits on one key at once; together they must get exactly `limit`."""
+    key = f"bench-shared:{time.time_ns()}"
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1.0
+    workers = [
+        multiprocessing.Process(target=_shared_worker, args=(storage, key, limit, limit, start_at, results))
+        for _ in range(processes)
+    ]
+    for p in workers:
+        p.start()
+    allowed = [results.get() for _ in workers]
+    for p in workers:
+        p.join()
+    return {"processes": processes, "limit": limit, "allowed": sum(allowed), "per_process": allowed}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    report = {"git": git_revision(), "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "backends": {}}
+    failed = False
+    for backend in args.backend:
+        if backend == "redis" and not args.redis_url:
+            print("redis: skipped (no --redis-url)")
+            continue
+        storage = storage_url(backend, args)
+        runs = []
+        for concurrency in args.concurrency:
+            result = asyncio.run(measure(storage, concurrency, args.duration, args.keys))
+            runs.append(result)
+            print(
+                f"{backend:<7} c={concurrency:<4} {result['checks_per_s']:>10} checks/s  "
+                f"p50 {result['p50_us']:>8} us  p99 {result['p99_us']:>8} us  "
+                f"batch {result['avg_batch_size']:>6} x {result['avg_batch_ms']} ms",
+                flush=True,
+            )
+
+        shared = None
+        if backend != "memory":
+            shared = shared_limit(storage, args.processes, args.limit)
+            ok = shared["allowed"] == args.limit
+            failed |= not ok
+            print(f"{backend:<7} shared limit: {shared['allowed']} of {args.processes} x {args.limit} "
+                  f"allowed (want {args.limit}) {'ok' if ok else 'FAIL'}")
+        if backend == "sqlite":
+            for suffix in ("", "-wal", "-shm"):
+                Path(storage[len("sqlite:///"):] + suffix).unlink(missing_ok=True)
+        report["backends"][backend] = {"runs": runs, "shared_limit": shared}
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        suffix = "-dirty" if report["git"]["dirty"] else ""
+        path = RESULTS_DIR / f"limiter-{time.strftime('%Y%m%d-%H%M%S')}-{report['git']['commit']}{suffix}.json"
+        path.write_text(json.dumps(report, indent=2))
+        print(f"Saved {path}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
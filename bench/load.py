@@ -0,0 +1,124 @@
+import asyncio
+import random
+import time
+from collections import Counter
+import httpx
+
+QUERIES = [
+    "bebop", "monster", "frieren", "dune", "heat", "planetes", "berserk", "arrival",
+    "vinland", "mushishi", "akira", "alien", "blade", "chainsaw", "death", "eva",
+    "fargo", "gintama", "haikyu", "inception", "jojo", "kaiji", "lain", "mob",
+    "naruto", "one piece", "parasyte", "quest", "ran", "samurai", "trigun", "utena",
+]
+SEARCH_TYPES = ["movie", "series", "anime", "game", "manga", "book"]
+MEDIA_TYPES = ["movie", "series", "anime"]
+
+
+def percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def _detail_params(rng: random.Random, keys: int) -> dict:
+    type = rng.choice(["movie", "series", "anime", "game", "manga", "book"])
+    n = rng.randrange(keys)
+    id = {
+        "movie": str(10000 + n),
+        "series": str(20000 + n),
+        "anime": str(30000 + n),
+        "game": str(40000 + n),
+        "manga": f"00000000-0000-4000-8000-{n:012d}",
+        "book": f"OL{n}W",
+    }[type]
+    return {"type": type, "id": id}
+
+
+def _chapter_params(rng: random.Random, keys: int) -> dict:
+    type = rng.choice(["series", "anime", "manga"])
+    n = rng.randrange(keys)
+    id = f"00000000-0000-4000-8000-{n:012d}" if type == "manga" else str(20000 + n)
+    return {"type": type, "id": id}
+
+
+def make_request(scenario: str, rng: random.Random, keys: int):
+    """Return (method, path, kwargs) for one request of a scenario.
+
+    `keys` bounds how many distinct queries/ids are drawn from, which sets
+    the cache hit ratio of the run.
+    """
+    if scenario == "search":
+        query = f"{rng.choice(QUERIES)} {rng.randrange(keys)}"
+        return "GET", "/api/search", {"params": {"query": query, "type": rng.choice(SEARCH_TYPES)}}
+    if scenario == "search_all":
+        query = f"{rng.choice(QUERIES)} {rng.randrange(keys)}"
+        return "GET", "/api/search", {"params": {"query": query, "type": "all"}}
+    if scenario == "suggest":
+        # Keystrokes of the seeded "Title <n>" titles or of a query word
+        text = rng.choice([f"title {rng.randrange(keys)}", rng.choice(QUERIES)])
+        params = {"prefix": text[:rng.randint(1, len(text))]}
+        if rng.random() < 0.5:
+            params["type"] = rng.choice(MEDIA_TYPES)
+        return "GET", "/api/suggest", {"params": params}
+    if scenario == "detail":
+        return "GET", "/api/detail", {"params": _detail_params(rng, keys)}
+    if scenario == "chapter":
+        return "GET", "/api/chapter", {"params": _chapter_params(rng, keys)}
+    if scenario == "log":
+        n = rng.randrange(keys)
+        return "POST", "/api/log", {"json": {
+            "source": "tmdb",
+            "source_id": str(10000 + n),
+            "type": rng.choice(MEDIA_TYPES),
+            "title": f"Title {n}",
+        }}
+    if scenario == "trending":
+        params = {"type": rng.choice(MEDIA_TYPES), "days": rng.choice([0, 7, 30, 365])}
+        return "GET", "/api/trending", {"params": params}
+    if scenario == "history":
+        return "GET", "/api/history", {"params": {"limit": 50, "type": rng.choice(MEDIA_TYPES)}}
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+SCENARIOS = ["search", "search_all", "suggest", "detail", "chapter", "log", "trending", "history"]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, concurrency: int,
+                       duration: float, keys: int, seed: int = 0, headers: dict = None) -> dict:
+    """Drive one endpoint with `concurrency` closed-loop workers for `duration` seconds."""
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+    stop_at = time.perf_counter() + duration
+
+    async def worker(index: int):
+        rng = random.Random(f"{seed}:{scenario}:{index}")
+        while time.perf_counter() < stop_at:
+            method, path, kwargs = make_request(scenario, rng, keys)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, **kwargs)
+                statuses[response.status_code] += 1
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    ok = sum(n for status, n in statuses.items() if status < 400)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "client_errors": dict(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
@@ -0,0 +1,31 @@
+"""Serve the app under uvicorn with stub providers, for `bench.run --url`.
+
+    python -m bench.server --port 8001 --latency 80
+    python -m bench.run --url http://127.0.0.1:8001
+"""
+
+import argparse
+from bench.run import build_profiles, configure_env, parse_args
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args, rest = parser.parse_known_args()
+    # Stub and environment options are shared with bench.run
+    bench_args = parse_args(rest)
+    configure_env(bench_args)
+
+    import uvicorn
+    from app.main import app
+    from app.utils.limiter import limiter
+    from bench.stubs import install_stubs
+
+    limiter.enabled = False
+    install_stubs(build_profiles(bench_args), seed=bench_args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
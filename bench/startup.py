@@ -0,0 +1,121 @@
+"""Startup-time benchmark.
+
+Boots the app in fresh interpreters (stub providers, local Postgres as in
+bench.run) and reports how long `import app.main` and the lifespan startup
+take. Fails when the median exceeds a budget or regresses against an
+earlier run, so it can gate CI:
+
+    python -m bench.startup --runs 5
+    python -m bench.startup --compare bench/results/<earlier startup run>.json --max-regression 0.2
+    python -m bench.startup --max-ms 1500
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from bench.run import RESULTS_DIR, configure_env, build_profiles, git_revision, parse_args as bench_args
+
+PHASES = ["import_ms", "startup_ms", "total_ms"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to boot")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median total exceeds this")
+    parser.add_argument("--compare", type=Path, help="Earlier startup results file")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed median total slowdown against --compare (0.2 = 20%%)")
+    parser.add_argument("--no-save", action="store_true", help="Do not write a results file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+async def _boot(app) -> float:
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter() - start
+    return ready
+
+
+def child():
+    args = bench_args(["--seed-logs", "0"])
+    configure_env(args)
+
+    start = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter() - start
+
+    from bench.stubs import install_stubs
+    install_stubs(build_profiles(args))
+    ready = asyncio.run(_boot(app))
+    print(json.dumps({
+        "import_ms": round(imported * 1000, 1),
+        "startup_ms": round(ready * 1000, 1),
+        "total_ms": round((imported + ready) * 1000, 1),
+    }))
+
+
+def run_once() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-m", "bench.startup", "--child"],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        return child()
+
+    runs = []
+    for i in range(args.runs):
+        runs.append(run_once())
+        print(f"run {i + 1}: " + "  ".join(f"{phase} {runs[-1][phase]:>8}" for phase in PHASES), flush=True)
+
+    summary = {
+        phase: {
+            "median": round(statistics.median(r[phase] for r in runs), 1),
+            "min": min(r[phase] for r in runs),
+            "max": max(r[phase] for r in runs),
+        }
+        for phase in PHASES
+    }
+    print("\nmedian: " + "  ".join(f"{phase} {summary[phase]['median']:>8}" for phase in PHASES))
+
+    report = {
+        "git": git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+        "summary": summary,
+    }
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        suffix = "-dirty" if report["git"]["dirty"] else ""
+        path = RESULTS_DIR / f"startup-{time.strftime('%Y%m%d-%H%M%S')}-{report['git']['commit']}{suffix}.json"
+        path.write_text(json.dumps(report, indent=2))
+        print(f"Saved {path}")
+
+    failed = False
+    total = summary["total_ms"]["median"]
+    if args.max_ms is not None and total > args.max_ms:
+        print(f"FAIL: median startup {total} ms is over the {args.max_ms} ms budget")
+        failed = True
+    if args.compare:
+        previous = json.loads(args.compare.read_text())["summary"]["total_ms"]["median"]
+        change = (total - previous) / previous if previous else 0.0
+        print(f"vs {args.compare.name}: {previous} ms -> {total} ms ({change:+.0%})")
+        if change > args.max_regression:
+            print(f"FAIL: startup regressed by more than {args.max_regression:.0%}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import asyncio
+import copy
+import json
+import random
+import re
+from pathlib import Path
+import httpx
+from app.utils import http_client
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+
+class StubProfile:
+    """Latency and failure behaviour of one stubbed provider."""
+
+    def __init__(self, latency_ms: float = 80, jitter_ms: float = 20, error_rate: float = 0.0,
+                 error_status: int = 503):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+        }
+
+
+class StubProvider:
+    """Answers one provider's API from fixture payloads after a simulated delay."""
+
+    def __init__(self, name: str, fixtures: dict, profile: StubProfile, rng: random.Random):
+        self.name = name
+        self.fixtures = fixtures
+        self.profile = profile
+        self.rng = rng
+        self.stats = {"requests": 0, "errors": 0}
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.stats["requests"] += 1
+        delay = self.profile.latency_ms + self.rng.uniform(-1, 1) * self.profile.jitter_ms
+        await asyncio.sleep(max(delay, 0) / 1000)
+        if self.rng.random() < self.profile.error_rate:
+            self.stats["errors"] += 1
+            return httpx.Response(self.profile.error_status, json={"error": "stubbed failure"})
+        payload = getattr(self, f"_{self.name}")(request)
+        if payload is None:
+            return httpx.Response(404, json={"error": "no fixture"})
+        return httpx.Response(200, json=payload)
+
+    def _fixture(self, key: str):
+        return copy.deepcopy(self.fixtures[key])
+
+    def _tmdb(self, request):
+        path = request.url.path.removeprefix("/3")
+        if path.startswith("/search/"):
+            return self._fixture("search_movie" if path.endswith("/movie") else "search_tv")
+        match = re.fullmatch(r"/(movie|tv)/(\d+)", path)
+        if match is None:
+            return None
+        data = self._fixture(match.group(1))
+        data["id"] = int(match.group(2))
+        appended = request.url.params.get("append_to_response", "")
+        seasons = {s["season_number"] for s in data.get("seasons", [])}
+        for part in filter(None, appended.split(",")):
+            number = int(part.removeprefix("season/"))
+            if number in seasons:
+                data[part] = self._fixture("season")
+        return data
+
+    def _anilist(self, request):
+        body = json.loads(request.content)
+        query = body["query"]
+        if "id_in" in query:
+            media = []
+            for id in body["variables"]["ids"]:
+                item = self._fixture("media")
+                item["id"] = id
+                media.append(item)
+            return {"data": {"Page": {"media": media}}}
+        if "Page" in query:
+            return self._fixture("search")
+        data = self._fixture("detail")
+        data["data"]["Media"]["id"] = body["variables"]["id"]
+        return data
+
+    def _jikan(self, request):
+        if not re.fullmatch(r"/v4/anime/\d+/episodes", request.url.path):
+            return None
+        return self._fixture("episodes")
+
+    def _mangadex(self, request):
+        path = request.url.path
+        params = request.url.params
+        if path == "/manga" and "ids[]" in params:
+            items = []
+            for id in params.get_list("ids[]"):
+                item = self._fixture("manga")
+                item["id"] = id
+                items.append(item)
+            return {"result": "ok", "data": items, "total": len(items)}
+        if path == "/manga":
+            return self._fixture("search")
+        if path.startswith("/manga/"):
+            data = self._fixture("detail")
+            data["data"]["id"] = path.removeprefix("/manga/")
+            return data
+        if path == "/chapter":
+            spec = self.fixtures["chapters"]
+            offset = int(params.get("offset", 0))
+            limit = int(params.get("limit", 100))
+            data = []
+            for number in range(offset + 1, min(offset + limit, spec["total"]) + 1):
+                chapter = copy.deepcopy(spec["chapter"])
+                chapter["id"] = f"{chapter['id']}-{number}"
+                chapter["attributes"]["chapter"] = str(number)
+                data.append(chapter)
+            return {"result": "ok", "data": data, "limit": limit, "offset": offset, "total": spec["total"]}
+        return None
+
+    def _rawg(self, request):
+        path = request.url.path.removeprefix("/api")
+        if path == "/games":
+            return self._fixture("search")
+        match = re.fullmatch(r"/games/(\d+)", path)
+        if match is None:
+            return None
+        data = self._fixture("detail")
+        data["id"] = int(match.group(1))
+        return data
+
+    def _openlibrary(self, request):
+        path = request.url.path
+        if path == "/search.json":
+            return self._fixture("search")
+        if path.startswith("/works/"):
+            return self._fixture("detail")
+        return None
+
+
+def load_fixtures(directory: Path = FIXTURE_DIR) -> dict:
+    return {
+        name: json.loads((directory / f"{name}.json").read_text())
+        for name in http_client.PROVIDERS
+    }
+
+
+def install_stubs(profiles: dict, fixture_dir: Path = FIXTURE_DIR, seed: int = 0) -> dict:
+    """Point every pooled provider client at an in-process stub.
+
+    Must run before the app's startup hook, which only builds clients that
+    are missing from the registry.
+    """
+    fixtures = load_fixtures(fixture_dir)
+    rng = random.Random(seed)
+    stubs = {}
+    for name, config in http_client.PROVIDERS.items():
+        stub = StubProvider(name, fixtures[name], profiles[name], rng)
+        http_client._clients[name] = httpx.AsyncClient(
+            base_url=config["base_url"],
+            transport=httpx.MockTransport(stub.handle),
+        )
+        stubs[name] = stub
+    return stubs
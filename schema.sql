@@ -1,4 +1,9 @@
-CREATE TABLE search_logs (
+-- Safe to re-run: it creates what is missing and applies the migrations
+-- in app/models.py MIGRATIONS, then records the version they lead to.
+-- Run it without a wrapping transaction (not psql -1): the search_logs
+-- indexes are built CONCURRENTLY so logging is not blocked meanwhile.
+
+CREATE TABLE IF NOT EXISTS search_logs (
   id SERIAL PRIMARY KEY,
   source VARCHAR NOT NULL,
   source_id VARCHAR NOT NULL,
@@ -6,3 +11,111 @@ CREATE TABLE search_logs (
   title VARCHAR NOT NULL,
   timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+-- If a concurrent build was interrupted, drop the INVALID index it left
+-- (see \d search_logs) and run this again
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_search_logs_type_ts_id ON search_logs (type, timestamp DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_search_logs_ts_id ON search_logs (timestamp DESC, id DESC);
+-- Superseded by ix_search_logs_ts_id
+DROP INDEX CONCURRENTLY IF EXISTS ix_search_logs_timestamp;
+
+CREATE TABLE IF NOT EXISTS trending_daily (
+  day DATE NOT NULL,
+  type VARCHAR NOT NULL,
+  source VARCHAR NOT NULL,
+  source_id VARCHAR NOT NULL,
+  title VARCHAR NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, type, source, source_id)
+);
+CREATE INDEX IF NOT EXISTS ix_trending_daily_type_day ON trending_daily (type, day);
+
+CREATE TABLE IF NOT EXISTS trending_totals (
+  type VARCHAR NOT NULL,
+  source VARCHAR NOT NULL,
+  source_id VARCHAR NOT NULL,
+  title VARCHAR NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (type, source, source_id)
+);
+CREATE INDEX IF NOT EXISTS ix_trending_totals_type_count ON trending_totals (type, count DESC);
+
+DO $$ BEGIN
+  CREATE TYPE userrole AS ENUM ('admin', 'mod', 'pal');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+CREATE TABLE IF NOT EXISTS users (
+  id SERIAL PRIMARY KEY,
+  username VARCHAR NOT NULL UNIQUE,
+  name VARCHAR,
+  mail VARCHAR UNIQUE,
+  status userrole DEFAULT 'pal'
+);
+
+CREATE TABLE IF NOT EXISTS ratings (
+  id SERIAL PRIMARY KEY,
+  source VARCHAR NOT NULL,
+  source_id VARCHAR NOT NULL,
+  username VARCHAR REFERENCES users (username),
+  rate_score DOUBLE PRECISION NOT NULL,
+  rate_descr TEXT,
+  timestamp TIMESTAMP
+);
+-- One rating per user and title: keep each user's latest before indexing
+DELETE FROM ratings r USING ratings newer
+WHERE newer.username = r.username AND newer.source = r.source
+  AND newer.source_id = r.source_id AND newer.id > r.id;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_ratings_user_title ON ratings (username, source, source_id);
+CREATE INDEX IF NOT EXISTS ix_ratings_title_id ON ratings (source, source_id, id DESC);
+
+CREATE TABLE IF NOT EXISTS rating_aggregates (
+  source VARCHAR NOT NULL,
+  source_id VARCHAR NOT NULL,
+  rating_count INTEGER NOT NULL DEFAULT 0,
+  rating_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+  histogram INTEGER[] NOT NULL,
+  PRIMARY KEY (source, source_id)
+);
+-- Rebuilt from ratings; the API keeps it in step from then on
+DELETE FROM rating_aggregates;
+INSERT INTO rating_aggregates (source, source_id, rating_count, rating_sum, histogram)
+SELECT source, source_id, count(*), sum(rate_score), ARRAY[
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 0)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 1)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 2)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 3)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 4)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 5)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 6)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 7)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 8)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 9)::int,
+    count(*) FILTER (WHERE least(greatest(floor(rate_score + 0.5), 0), 10) = 10)::int
+  ]
+FROM ratings GROUP BY source, source_id;
+
+CREATE TABLE IF NOT EXISTS catalog (
+  source VARCHAR NOT NULL,
+  source_id VARCHAR NOT NULL,
+  type VARCHAR NOT NULL,
+  title VARCHAR NOT NULL,
+  payload JSONB NOT NULL,
+  detailed BOOLEAN NOT NULL DEFAULT false,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, ''))) STORED,
+  PRIMARY KEY (source, source_id)
+);
+CREATE INDEX IF NOT EXISTS ix_catalog_search_vector ON catalog USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS ix_catalog_type ON catalog (type);
+
+CREATE TABLE IF NOT EXISTS schema_version (
+  version INTEGER PRIMARY KEY,
+  applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO schema_version (version) VALUES (4) ON CONFLICT DO NOTHING;
+
+-- Optional: fuzzy (typo-tolerant) catalog search. Without pg_trgm the
+-- catalog is searched by full text only. With it installed, the app creates
+-- this index at startup unless DB_AUTO_CREATE_SCHEMA is off.
+-- CREATE EXTENSION IF NOT EXISTS pg_trgm;
+-- CREATE INDEX IF NOT EXISTS ix_catalog_title_trgm ON catalog USING gin (title gin_trgm_ops);
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from app.utils.batching import BatchWriter, QueueFull
+
+
+def test_flushes_by_size_and_drains_on_stop():
+    batches = []
+
+    async def flush(batch):
+        batches.append(list(batch))
+
+    async def run():
+        writer = BatchWriter("test", flush, max_batch=3, max_delay=10)
+        writer.start()
+        for i in range(7):
+            await writer.put(i)
+        await asyncio.sleep(0.01)
+        # Two full batches went out on size; the last item waits for its delay
+        assert batches == [[0, 1, 2], [3, 4, 5]]
+        await writer.stop()
+        return writer.snapshot()
+
+    stats = asyncio.run(run())
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert stats["flushed"] == 7
+    assert stats["flushes"] == 3
+
+
+def test_full_queue_rejects():
+    async def run():
+        writer = BatchWriter("test", None, max_queue=1, put_timeout=0.01)
+        await writer.put(1)
+        assert writer.offer(2) is False
+        with pytest.raises(QueueFull):
+            await writer.put(3)
+        return writer.snapshot()
+
+    stats = asyncio.run(run())
+    assert stats["enqueued"] == 1
+    assert stats["rejected"] == 2
+
+
+def test_failed_flush_is_retried():
+    attempts = []
+
+    async def flush(batch):
+        attempts.append(batch)
+        if len(attempts) == 1:
+            raise RuntimeError("connection reset")
+
+    async def run():
+        writer = BatchWriter("test", flush, retries=2)
+        await writer._write([1, 2])
+        return writer.snapshot()
+
+    stats = asyncio.run(run())
+    assert len(attempts) == 2
+    assert stats["flushed"] == 2
+    assert stats["failed"] == 0
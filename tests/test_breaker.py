@@ -0,0 +1,73 @@
+import pytest
+from app.utils import breaker
+from app.utils.breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_threshold_failures_in_a_row(clock):
+    b = CircuitBreaker("test", threshold=3, reset_timeout=30)
+    for _ in range(2):
+        b.before_call()
+        b.record_failure()
+    b.before_call()
+    b.record_success()  # a success resets the run
+    for _ in range(2):
+        b.before_call()
+        b.record_failure()
+    assert b.state == breaker.CLOSED
+
+    b.before_call()
+    b.record_failure()
+    assert b.state == breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        b.before_call()
+    assert b.snapshot() == {
+        "state": "open", "consecutive_failures": 3, "retry_in_s": 30.0, "rejected": 1, "opened": 1,
+    }
+
+
+def test_half_open_lets_one_trial_through(clock):
+    b = CircuitBreaker("test", threshold=1, reset_timeout=30)
+    b.record_failure()
+    clock[0] += 29
+    with pytest.raises(CircuitOpenError):
+        b.before_call()
+
+    clock[0] += 1
+    b.before_call()
+    assert b.state == breaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        b.before_call()  # the trial is still running
+
+    b.record_success()
+    assert b.state == breaker.CLOSED
+    b.before_call()
+
+
+def test_failed_trial_reopens(clock):
+    b = CircuitBreaker("test", threshold=1, reset_timeout=30)
+    b.record_failure()
+    clock[0] += 30
+    b.before_call()
+    b.record_failure()
+    assert b.state == breaker.OPEN
+    assert b.stats["opened"] == 2
+    clock[0] += 10
+    with pytest.raises(CircuitOpenError):
+        b.before_call()
+
+
+def test_released_trial_slot_is_reused(clock):
+    b = CircuitBreaker("test", threshold=1, reset_timeout=30)
+    b.record_failure()
+    clock[0] += 30
+    b.before_call()
+    b.release()  # e.g. the caller was cancelled
+    b.before_call()
+    assert b.state == breaker.HALF_OPEN
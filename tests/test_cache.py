@@ -0,0 +1,79 @@
+import asyncio
+from pydantic import BaseModel
+from app.utils.cache import DiskCache, Entry, ResponseCache, cache, cached
+
+
+class Item(BaseModel):
+    id: str
+    type: str
+
+
+def test_cached_keys_positional_and_keyword_calls_alike():
+    calls = []
+
+    @cached("testsource", "detail", Item)
+    async def get_detail(id: str, type: str) -> Item:
+        calls.append((id, type))
+        return Item(id=id, type=type)
+
+    async def run():
+        first = await get_detail("42", "movie")
+        second = await get_detail(id="42", type="movie")
+        third = await get_detail("42", type="movie")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert calls == [("42", "movie")]
+    assert first == second == third == Item(id="42", type="movie")
+    assert get_detail.cache_key("42", "movie") == get_detail.cache_key(type="movie", id="42")
+    cache.memory.delete_prefix("testsource:")
+
+
+def test_entry_is_due_for_refresh_at_the_soft_ttl():
+    entry = Entry("value", expires_at=100.0, refresh_at=50.0)
+    assert not entry.due(49.9)
+    assert entry.due(50.0)
+    assert entry.fresh(99.9)
+    # Without a soft TTL it is due when it expires
+    assert not Entry("value", expires_at=100.0).due(99.9)
+    assert Entry("value", expires_at=100.0).due(100.0)
+
+
+def test_revalidation_counted_once_per_refresh():
+    calls = []
+
+    @cached("testsource", "soft", Item, revalidate=True)
+    async def get_detail(id: str) -> Item:
+        calls.append(id)
+        await asyncio.sleep(0.01)
+        return Item(id=id, type="movie")
+
+    async def run():
+        await get_detail("7")
+        cache.memory.peek(get_detail.cache_key("7")).refresh_at = 0.0
+        # Both hits are past the soft TTL; only the first starts a refresh
+        await get_detail("7")
+        await get_detail("7")
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert calls == ["7", "7"]
+    assert cache.stats["testsource.soft"]["revalidated"] == 1
+    cache.memory.delete_prefix("testsource:")
+
+
+def test_disk_tier_sweeps_expired_rows_on_write(tmp_path):
+    disk_cache = ResponseCache()
+    disk_cache.disk = DiskCache(str(tmp_path / "cache.db"))
+    disk_cache.disk.set("old", "{}", -1)
+    encode = lambda value: value.model_dump()
+
+    async def run():
+        await disk_cache.set("a", Item(id="1", type="movie"), 60, encode)
+        # Within the interval a write does not sweep again
+        disk_cache.disk.set("older", "{}", -1)
+        await disk_cache.set("b", Item(id="2", type="movie"), 60, encode)
+
+    asyncio.run(run())
+    keys = [key for key, in disk_cache.disk._conn.execute("SELECT key FROM cache ORDER BY key")]
+    assert keys == ["a", "b", "older"]
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import chapter
+from app.models import ChapterOut
+from app.services import mangadex, tmdb
+from app.utils.cache import cache
+from app.utils.serialization import loads
+
+
+def stream(monkeypatch, pages):
+    monkeypatch.setitem(chapter.CHAPTER_PAGES, "series", pages)
+    app = FastAPI()
+    app.include_router(chapter.router, prefix="/api")
+    with TestClient(app) as client:
+        response = client.get("/api/chapter/stream", params={"type": "series", "id": "1"})
+    return response.status_code, [loads(line) for line in response.content.splitlines()]
+
+
+def test_stream_writes_every_page(monkeypatch):
+    async def pages(id):
+        yield 1, [ChapterOut(season=2, number=1, title="b")]
+        yield 0, [ChapterOut(season=1, number=1, title="a")]
+
+    status, lines = stream(monkeypatch, pages)
+    assert status == 200
+    assert [line["title"] for line in lines] == ["b", "a"]
+
+
+def test_stream_ends_with_error_line_when_a_page_fails(monkeypatch):
+    async def pages(id):
+        yield 0, [ChapterOut(season=1, number=1, title="a")]
+        raise RuntimeError("page 2 failed")
+
+    status, lines = stream(monkeypatch, pages)
+    assert status == 200
+    assert lines[0]["title"] == "a"
+    assert lines[-1] == {"error": "Failed to fetch chapters: page 2 failed"}
+
+
+def test_failed_season_batch_fails_the_whole_list(monkeypatch):
+    seasons = list(range(1, 31))
+
+    async def fetch_seasons(url, numbers):
+        numbers = list(numbers)
+        if numbers[0] >= tmdb.SEASONS_PER_REQUEST:
+            raise RuntimeError("503 from upstream")
+        return {
+            "seasons": [{"season_number": n} for n in seasons],
+            **{f"season/{n}": {"episodes": [{"episode_number": 1, "name": f"s{n}"}]}
+               for n in numbers if n in seasons},
+        }
+
+    monkeypatch.setattr(tmdb, "_fetch_seasons", fetch_seasons)
+    with pytest.raises(RuntimeError):
+        asyncio.run(tmdb.get_episodes("truncated"))
+    assert cache.memory.peek(tmdb.get_episodes.cache_key("truncated")) is None
+
+
+def test_failed_chapter_page_is_not_cached(monkeypatch):
+    async def fetch_page(id, offset):
+        if offset == 2 * mangadex.CHAPTER_PAGE_SIZE:
+            raise RuntimeError("503 from upstream")
+        return {
+            "total": 3 * mangadex.CHAPTER_PAGE_SIZE,
+            "data": [{"id": f"c{offset}", "attributes": {"chapter": str(offset), "title": None}}],
+        }
+
+    monkeypatch.setattr(mangadex, "_fetch_chapter_page", fetch_page)
+    with pytest.raises(RuntimeError):
+        asyncio.run(mangadex.get_chapters("truncated"))
+    assert cache.memory.peek(mangadex.get_chapters.cache_key("truncated")) is None
+
+
+def test_chapter_list_hits_reuse_the_cached_encoding(monkeypatch):
+    async def fetch_seasons(url, numbers):
+        return {
+            "seasons": [{"season_number": 1}],
+            "season/1": {"episodes": [{"episode_number": n, "name": f"e{n}"} for n in range(1, 4)]},
+        }
+
+    monkeypatch.setattr(tmdb, "_fetch_seasons", fetch_seasons)
+    app = FastAPI()
+    app.include_router(chapter.router, prefix="/api")
+    with TestClient(app) as client:
+        first = client.get("/api/chapter", params={"type": "series", "id": "encoded"})
+        entry = cache.memory.peek(tmdb.get_episodes.cache_key("encoded"))
+        body = entry.body
+        second = client.get("/api/chapter", params={"type": "series", "id": "encoded"})
+
+    assert first.status_code == second.status_code == 200
+    assert [ch["number"] for ch in loads(first.content)] == [1, 2, 3]
+    assert second.content == first.content == body
+    assert entry.body is body
@@ -0,0 +1,47 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import detail
+from app.models import SearchResult
+from app.services import anilist, mangadex
+from app.utils.limiter import limiter
+
+MANGA_ID = "a96676e5-8ae2-425e-b549-7f15dd34a6d8"
+
+
+def manga(id: str) -> SearchResult:
+    return SearchResult(id=id, title="Komi", type="manga", description=None, poster_url=None, year=None,
+                        source="mangadex")
+
+
+def test_normalize_ids():
+    assert anilist.normalize_id(" 0021 ") == "21"
+    assert anilist.normalize_id("21a") is None
+    assert anilist.normalize_id("²") is None
+    assert mangadex.normalize_id(MANGA_ID.upper()) == MANGA_ID
+    assert mangadex.normalize_id("not-a-uuid") is None
+
+
+def test_invalid_ids_fail_alone(monkeypatch):
+    requested = []
+
+    async def get_details(ids):
+        requested.append(ids)
+        return {MANGA_ID: manga(MANGA_ID)}
+
+    monkeypatch.setitem(detail.BULK_PROVIDERS, "manga", (get_details, mangadex.normalize_id))
+    monkeypatch.setattr(limiter, "enabled", False)
+    app = FastAPI()
+    app.include_router(detail.router, prefix="/api")
+    with TestClient(app) as client:
+        response = client.post("/api/detail/batch", json={"items": [
+            {"type": "manga", "id": MANGA_ID.upper()},
+            {"type": "manga", "id": "bad id"},
+            {"type": "manga", "id": MANGA_ID},
+        ]})
+
+    assert response.status_code == 200
+    items = response.json()
+    assert requested == [[MANGA_ID]]
+    assert [item["error"] for item in items] == [None, "Invalid id", None]
+    assert items[0]["result"]["id"] == MANGA_ID
+    assert items[0]["id"] == MANGA_ID.upper()
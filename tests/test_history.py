@@ -0,0 +1,18 @@
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from app.api.history import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 3, 1, 12, 30, 15, 123456)
+    cursor = encode_cursor(timestamp, 4711)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, 4711)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor(datetime(2026, 1, 1), 1)[:-3]])
+def test_bad_cursor_is_a_client_error(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
@@ -0,0 +1,81 @@
+import asyncio
+import fakeredis
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.utils.limiter import Limiter, gcra, parse_rate
+
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == (10, 60)
+    assert parse_rate("10 per 2 minutes") == (10, 120)
+    assert parse_rate(" 5 / hour ") == (5, 3600)
+    with pytest.raises(ValueError):
+        parse_rate("10 a minute")
+
+
+def test_gcra_allows_a_burst_then_spaces_requests():
+    interval, period = 6.0, 60.0  # 10/minute
+    tat, now = 0.0, 1000.0
+    for i in range(10):
+        allowed, tat, retry_after, remaining = gcra(tat, now, interval, period)
+        assert allowed and retry_after == 0.0
+        assert remaining == 9 - i
+
+    allowed, tat_after, retry_after, remaining = gcra(tat, now, interval, period)
+    assert not allowed and tat_after == tat
+    assert retry_after == pytest.approx(6.0)
+    assert remaining == 0
+    # One interval later there is room for exactly one more
+    assert gcra(tat, now + 6.0, interval, period)[0]
+
+
+def burst(storage):
+    async def run():
+        limiter = Limiter(storage)
+        try:
+            return [await limiter.hit("client", 10, 60) for _ in range(11)]
+        finally:
+            await limiter.close()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_backends_allow_a_burst_of_the_limit(backend, tmp_path):
+    storage = "memory://" if backend == "memory" else f"sqlite:///{tmp_path / 'ratelimit.db'}"
+    results = burst(storage)
+    assert all(allowed for allowed, _, _ in results[:10])
+    allowed, retry_after, _ = results[10]
+    assert not allowed
+    assert 0 < retry_after <= 6
+
+
+def test_redis_backend_matches(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        "redis.asyncio.from_url", lambda url: fakeredis.FakeAsyncRedis(server=server)
+    )
+    results = burst("redis://test")
+    assert [allowed for allowed, _, _ in results] == [True] * 10 + [False]
+    assert [remaining for _, _, remaining in results[:3]] == [9, 8, 7]
+    assert 0 < results[10][1] <= 6
+
+
+def test_rejected_request_gets_retry_after():
+    limiter = Limiter("memory://")
+    app = FastAPI()
+
+    @app.get("/limited")
+    @limiter.limit("2/minute")
+    async def limited(request: Request):
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        codes = [client.get("/limited").status_code for _ in range(2)]
+        rejected = client.get("/limited")
+    assert codes == [200, 200]
+    assert rejected.status_code == 429
+    assert 1 <= int(rejected.headers["Retry-After"]) <= 30
+    assert rejected.headers["X-RateLimit-Limit"] == "2"
+    assert limiter.snapshot()["rejected"] == 1
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from app.utils.metrics import MetricsMiddleware, request_latency
+
+
+def test_requests_are_labelled_with_the_mounted_route():
+    router = APIRouter()
+
+    @router.get("/metrics-test/{id}")
+    async def item(id: str):
+        return {"id": id}
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router, prefix="/api")
+    with TestClient(app) as client:
+        client.get("/api/metrics-test/1")
+        client.get("/api/metrics-test/2")
+        client.get("/api/nothing-here")
+
+    assert request_latency.series[("GET", "/api/metrics-test/{id}", 200)][2] == 2
+    assert request_latency.series[("GET", "unmatched", 404)][2] >= 1
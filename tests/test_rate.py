@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from app.api import rate
+from app.api.rate import APPLY_AGGREGATE, LOCK_PREVIOUS, UPSERT_RATINGS, RatingIn, upsert_ratings
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def mappings(self):
+        return self
+
+
+class ScriptedSession:
+    """Replays (locked rows, upserted rows) per attempt and records the rest."""
+
+    def __init__(self, attempts):
+        self.attempts = list(attempts)
+        self.aggregates = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, stmt, params=None):
+        if stmt is LOCK_PREVIOUS:
+            return Result(self.attempts[0][0])
+        if stmt is UPSERT_RATINGS:
+            return Result(self.attempts.pop(0)[1])
+        assert stmt is APPLY_AGGREGATE
+        self.aggregates.extend(params)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def written(score: float, inserted: bool) -> dict:
+    return {"username": "pal", "source": "tmdb", "source_id": "1", "rate_score": score,
+            "rate_descr": None, "timestamp": datetime(2026, 1, 1), "inserted": inserted}
+
+
+def rating(score: float) -> RatingIn:
+    return RatingIn(source="tmdb", source_id="1", username="pal", rate_score=score)
+
+
+def histogram(*buckets) -> list:
+    counts = [0] * rate.HISTOGRAM_BUCKETS
+    for bucket, n in buckets:
+        counts[bucket] += n
+    return counts
+
+
+def test_first_rating_adds_to_the_aggregate():
+    db = ScriptedSession([([], [written(8, True)])])
+    asyncio.run(upsert_ratings(db, [rating(8)]))
+    assert db.aggregates == [
+        {"source": "tmdb", "source_id": "1", "count": 1, "total": 8.0, "histogram": histogram((8, 1))}
+    ]
+    assert db.commits == 1
+
+
+def test_changed_rating_moves_the_previous_score():
+    db = ScriptedSession([([("pal", "tmdb", "1", 4.0)], [written(9, False)])])
+    asyncio.run(upsert_ratings(db, [rating(9)]))
+    assert db.aggregates == [
+        {"source": "tmdb", "source_id": "1", "count": 0, "total": 5.0, "histogram": histogram((4, -1), (9, 1))}
+    ]
+
+
+def test_racing_first_ratings_are_retried_not_double_counted():
+    # The row appeared between the lock and the upsert: its old score is
+    # unknown, so the attempt is rolled back and redone with the row locked
+    db = ScriptedSession([
+        ([], [written(9, False)]),
+        ([("pal", "tmdb", "1", 7.0)], [written(9, False)]),
+    ])
+    asyncio.run(upsert_ratings(db, [rating(9)]))
+    assert db.rollbacks == 1
+    assert db.commits == 1
+    assert db.aggregates == [
+        {"source": "tmdb", "source_id": "1", "count": 0, "total": 2.0, "histogram": histogram((7, -1), (9, 1))}
+    ]
+
+
+def test_gives_up_after_repeated_races():
+    db = ScriptedSession([([], [written(9, False)])] * rate.UPSERT_ATTEMPTS)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(upsert_ratings(db, [rating(9)]))
+    assert raised.value.status_code == 409
+    assert db.aggregates == []
+
+
+@pytest.mark.parametrize("score, bucket", [(0, 0), (0.49, 0), (0.5, 1), (2.5, 3), (9.5, 10), (10, 10)])
+def test_halves_round_up_like_the_migration(score, bucket):
+    assert rate._bucket(score) == bucket
+
+
+def test_bulk_import_needs_the_dev_token(monkeypatch):
+    monkeypatch.setenv("STORED_HASH", "secret")
+    app = FastAPI()
+    app.include_router(rate.router, prefix="/api")
+    app.dependency_overrides[rate.get_db] = lambda: ScriptedSession([])
+    body = [{"source": "tmdb", "source_id": "1", "username": "pal", "rate_score": 7}]
+
+    with TestClient(app) as client:
+        anonymous = client.post("/api/rate/bulk", json=body)
+        empty = client.post("/api/rate/bulk", json=[], headers={"Authorization": "secret"})
+    assert anonymous.status_code == 401
+    assert empty.status_code == 200
+    assert empty.json() == {"imported": 0}
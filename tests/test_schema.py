@@ -0,0 +1,43 @@
+import asyncio
+from app import db
+from app.models import MIGRATIONS
+
+
+class Result:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class IndexConnection:
+    """Reports `invalid` for the pg_index check and records every statement."""
+
+    def __init__(self, invalid):
+        self.invalid = invalid
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(str(stmt))
+        return Result(self.invalid if "pg_index" in str(stmt) else None)
+
+
+def test_concurrent_build_replaces_an_invalid_index():
+    statement = MIGRATIONS[3][0]
+    conn = IndexConnection(invalid=True)
+    asyncio.run(db._run_concurrently(conn, statement))
+    assert conn.statements[1:] == [
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_search_logs_type_ts_id", statement,
+    ]
+
+    conn = IndexConnection(invalid=None)  # not built yet
+    asyncio.run(db._run_concurrently(conn, statement))
+    assert conn.statements[1:] == [statement]
+
+
+def test_concurrent_versions_only_hold_concurrent_statements():
+    # They run outside a transaction, one statement at a time
+    for statements in MIGRATIONS.values():
+        if any("CONCURRENTLY" in s for s in statements):
+            assert all("CONCURRENTLY" in s for s in statements)
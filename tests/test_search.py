@@ -0,0 +1,71 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import search
+from app.models import SearchResult
+from app.utils.cache import cache, cached
+from app.utils.limiter import limiter
+
+
+def result(type: str, id: str) -> SearchResult:
+    return SearchResult(
+        id=id, title=f"Title {id}", type=type, description=None, poster_url=None, year=None, source="test"
+    )
+
+
+@cached("testok", "search", SearchResult, many=True)
+async def search_ok(query: str) -> list[SearchResult]:
+    return [result("anime", "1"), result("anime", "2")]
+
+
+@cached("testdown", "search", SearchResult, many=True)
+async def search_down(query: str) -> list[SearchResult]:
+    raise RuntimeError("502 Bad Gateway")
+
+
+def test_federated_search_reports_provider_errors(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_PROVIDERS", {
+        "anime": ("testok", search_ok, ()),
+        "game": ("testdown", search_down, ()),
+    })
+    body = asyncio.run(search.federated_search("query", ["anime", "game"], 1.0))
+    out = search.FederatedSearchOut.model_validate_json(body)
+    assert out.providers["anime"].status == "ok"
+    assert out.providers["anime"].count == 2
+    assert out.providers["game"].status == "error"
+    assert out.providers["game"].count == 0
+    assert [r.id for r in out.results] == ["1", "2"]
+
+
+def test_search_deduplicates_types_and_keeps_single_type_failures_empty(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_PROVIDERS", {
+        "anime": ("testok", search_ok, ()),
+        "game": ("testdown", search_down, ()),
+    })
+    monkeypatch.setattr(limiter, "enabled", False)
+    app = FastAPI()
+    app.include_router(search.router, prefix="/api")
+    with TestClient(app) as client:
+        repeated = client.get("/api/search", params={"query": "x", "type": "anime,anime"})
+        failed = client.get("/api/search", params={"query": "x", "type": "game"})
+    # One type left after de-duplication: a plain list, not a federated result
+    assert [r["id"] for r in repeated.json()] == ["1", "2"]
+    assert failed.status_code == 200
+    assert failed.json() == []
+
+
+@cached("testcounted", "search", SearchResult, many=True)
+async def search_counted(query: str) -> list[SearchResult]:
+    return [result("game", "1")]
+
+
+def test_each_search_is_one_cache_lookup(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_PROVIDERS", {"game": ("testcounted", search_counted, ())})
+
+    async def run():
+        await search.search_one("query", "game")
+        await search.search_one("query", "game")
+
+    asyncio.run(run())
+    counts = cache.stats["testcounted.search"]
+    assert (counts["misses"], counts["memory_hits"]) == (1, 1)
@@ -0,0 +1,82 @@
+import asyncio
+from app.utils import outbound
+from app.utils.outbound import TokenBucket
+from app.utils.singleflight import SingleFlight
+
+
+def test_callers_share_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def run():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("key", "test", fetch) for _ in range(5)))
+        return results, flights.snapshot()
+
+    results, stats = asyncio.run(run())
+    assert results == ["value"] * 5
+    assert calls == [1]
+    assert stats["inflight"] == 0
+    assert stats["namespaces"]["test"] == {"calls": 5, "coalesced": 4}
+
+
+def test_interactive_joiner_raises_background_call():
+    served = []
+
+    async def run():
+        flights = SingleFlight()
+        bucket = TokenBucket("test", rate=100, burst=1)
+        await bucket.acquire()  # empty the bucket so everyone queues
+
+        async def fetch(name):
+            await bucket.acquire(outbound.priority.get())
+            served.append(name)
+
+        async def warm():
+            with outbound.background():
+                await flights.do("key", "test", lambda: fetch("shared"))
+
+        async def other():
+            await bucket.acquire(outbound.INTERACTIVE)
+            served.append("other")
+
+        warming = asyncio.create_task(warm())
+        await asyncio.sleep(0)
+        others = asyncio.create_task(other())
+        await asyncio.sleep(0)
+        # A live request for the title being warmed joins the background call
+        await flights.do("key", "test", lambda: fetch("joiner"))
+        await asyncio.gather(warming, others)
+
+    asyncio.run(run())
+    assert served == ["shared", "other"]
+
+
+def test_background_call_stays_behind_interactive():
+    served = []
+
+    async def run():
+        flights = SingleFlight()
+        bucket = TokenBucket("test", rate=100, burst=1)
+        await bucket.acquire()
+
+        async def fetch():
+            await bucket.acquire(outbound.priority.get())
+            served.append("shared")
+
+        async def warm():
+            with outbound.background():
+                await flights.do("key", "test", fetch)
+
+        warming = asyncio.create_task(warm())
+        await asyncio.sleep(0)
+        await bucket.acquire(outbound.INTERACTIVE)
+        served.append("other")
+        await warming
+
+    asyncio.run(run())
+    assert served == ["other", "shared"]
@@ -0,0 +1,92 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import log
+from app.utils.suggest import SuggestIndex, TypeIndex
+
+
+class Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class TotalsSession:
+    def __init__(self, totals, during=None):
+        self.totals = totals
+        self.during = during
+
+    async def execute(self, stmt):
+        if self.during is not None:
+            self.during()
+        return Rows(self.totals)
+
+
+def titles(hits):
+    return [hit["title"] for hit in hits]
+
+
+def test_prefix_matches_any_word_ranked_by_views():
+    index = TypeIndex(capacity=100)
+    index.add(("tmdb", "1"), "The Matrix", 5)
+    index.add(("tmdb", "2"), "Matrix Reloaded", 9)
+    index.add(("tmdb", "3"), "Mad Max", 1)
+
+    assert titles(index.lookup("matr", "movie", 10)) == ["Matrix Reloaded", "The Matrix"]
+    assert titles(index.lookup("the m", "movie", 10)) == ["The Matrix"]
+    assert titles(index.lookup("ma", "movie", 10)) == ["Matrix Reloaded", "The Matrix", "Mad Max"]
+    assert index.lookup("x", "movie", 10) == []
+
+
+def test_memoized_results_follow_new_views_and_renames():
+    index = TypeIndex(capacity=100)
+    index.add(("tmdb", "1"), "The Matrix", 5)
+    index.add(("tmdb", "2"), "Matrix Reloaded", 9)
+    assert titles(index.lookup("matr", "movie", 10)) == ["Matrix Reloaded", "The Matrix"]
+
+    index.add(("tmdb", "1"), "The Matrix", 10)
+    assert titles(index.lookup("matr", "movie", 10)) == ["The Matrix", "Matrix Reloaded"]
+
+    index.add(("tmdb", "2"), "Reloaded", 0)
+    assert titles(index.lookup("matr", "movie", 10)) == ["The Matrix"]
+    assert titles(index.lookup("rel", "movie", 10)) == ["Reloaded"]
+
+
+def test_prunes_to_capacity_most_viewed():
+    index = TypeIndex(capacity=10)
+    for i in range(12):
+        index.add(("tmdb", str(i)), f"Title {i}", i + 1)
+
+    assert len(index.titles) == 10
+    assert ("tmdb", "0") not in index.titles
+    assert len(index.terms) == 20
+    assert index.lookup("title", "movie", 1)[0]["source_id"] == "11"
+
+
+def test_bootstrap_keeps_events_recorded_during_the_query():
+    suggest = SuggestIndex(capacity=10)
+    session = TotalsSession(
+        [("anime", "anilist", "1", "One Piece", 10)],
+        during=lambda: suggest.record("anime", "anilist", "2", "One Punch Man"),
+    )
+
+    asyncio.run(suggest.bootstrap(session))
+
+    assert suggest.ready
+    assert [(hit["title"], hit["count"]) for hit in suggest.suggest("one", "anime")] == [
+        ("One Piece", 10), ("One Punch Man", 1),
+    ]
+
+
+def test_log_rejects_unknown_media_types():
+    app = FastAPI()
+    app.include_router(log.router, prefix="/api")
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/log", json={"source": "tmdb", "source_id": "1", "type": "podcast", "title": "X"}
+    )
+    assert response.status_code == 422
+    assert log.log_writer.snapshot()["enqueued"] == 0
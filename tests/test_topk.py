@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timedelta
+from app.utils.topk import BoundedCounter, TrendingEngine
+
+
+class Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class RollupSession:
+    """Answers the daily then the all-time rollup query, running `during` in between."""
+
+    def __init__(self, daily, totals, during=None):
+        self.results = [daily, totals]
+        self.during = during
+
+    async def execute(self, stmt):
+        if self.during is not None:
+            self.during()
+            self.during = None
+        return Rows(self.results.pop(0))
+
+
+def test_bounded_counter_keeps_heaviest_keys():
+    counter = BoundedCounter(2)
+    for key, n in [("a", 5), ("b", 3), ("c", 1), ("d", 1), ("e", 1)]:
+        counter.add(key, n)
+    # Pruned back to capacity once it held twice as many keys
+    assert counter.counts == {"a": 5, "b": 3}
+    assert counter.top(1) == [("a", 5)]
+
+
+def test_windows_cover_whole_days_and_expire():
+    engine = TrendingEngine(capacity=10, day_capacity=10)
+    today = engine.today
+    state = engine._state("anime")
+    state.add(today - timedelta(days=6), ("anilist", "1"), "One", 4)
+    state.add(today - timedelta(days=7), ("anilist", "2"), "Two", 9)
+    for summary in state.windows.values():
+        summary.counts.clear()
+    engine._rebuild_windows(state)
+
+    assert [item["source_id"] for item in engine.top("anime", 7)] == ["1"]
+    assert [item["source_id"] for item in engine.top("anime", 30)] == ["2", "1"]
+    assert engine.top("anime", 1) == []
+
+
+def test_bootstrap_keeps_events_recorded_during_the_query():
+    engine = TrendingEngine(capacity=10, day_capacity=10)
+    today = datetime.utcnow().date()
+    daily = [(today, "anime", "anilist", "1", "One", 3)]
+    totals = [("anime", "anilist", "1", "One", 10)]
+    session = RollupSession(daily, totals, during=lambda: engine.record("anime", "anilist", "2", "Two"))
+
+    asyncio.run(engine.bootstrap(session))
+
+    assert engine.ready
+    assert {item["source_id"]: item["count"] for item in engine.top("anime", 7)} == {"1": 3, "2": 1}
+    assert {item["source_id"]: item["count"] for item in engine.top("anime", 0)} == {"1": 10, "2": 1}
+
+
+def test_titles_stay_bounded_without_resyncs():
+    engine = TrendingEngine(capacity=5, day_capacity=5)
+    for i in range(1000):
+        engine.record("anime", "anilist", str(i), f"Title {i}")
+
+    state = engine.types["anime"]
+    live = set(state.total.counts).union(*(c.counts for c in (*state.days.values(), *state.windows.values())))
+    assert len(state.titles) <= max(state.titles_limit, 2 * len(live))
+    assert len(state.titles) < 100
+    assert all(item["title"] for item in engine.top("anime", 0))
@@ -0,0 +1,38 @@
+import asyncio
+from datetime import date, datetime
+from app.models import TrendingDaily, TrendingTotal
+from app.utils import trending_rollup
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+
+
+def test_record_views_buckets_each_row_by_its_own_day(monkeypatch):
+    upserts = {}
+    monkeypatch.setattr(trending_rollup, "_upsert", lambda table, rows, keys: upserts.setdefault(table, rows))
+
+    def row(source_id, timestamp):
+        return {"type": "anime", "source": "anilist", "source_id": source_id, "title": f"t{source_id}",
+                "timestamp": timestamp}
+
+    rows = [
+        row("1", datetime(2026, 1, 1, 23, 59, 59)),
+        row("1", datetime(2026, 1, 2, 0, 0, 1)),
+        row("2", datetime(2026, 1, 2, 8, 0)),
+        row("1", datetime(2026, 1, 2, 9, 0)),
+    ]
+    session = RecordingSession()
+    asyncio.run(trending_rollup.record_views(session, rows))
+
+    assert len(session.statements) == 2
+    assert [(r["day"], r["source_id"], r["count"]) for r in upserts[TrendingDaily]] == [
+        (date(2026, 1, 1), "1", 1),
+        (date(2026, 1, 2), "1", 2),
+        (date(2026, 1, 2), "2", 1),
+    ]
+    assert [(r["source_id"], r["count"]) for r in upserts[TrendingTotal]] == [("1", 3), ("2", 1)]
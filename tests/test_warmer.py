@@ -0,0 +1,54 @@
+import asyncio
+from app.utils import warmer
+
+
+class Result:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class LockConnection:
+    """Answers pg_try_advisory_lock with `granted` and the pg_locks check with `held`."""
+
+    def __init__(self, granted, held=()):
+        self.granted = list(granted)
+        self.held = list(held)
+        self.tries = 0
+        self.checks = 0
+        self.commits = 0
+
+    async def execute(self, stmt, params):
+        if "pg_locks" in str(stmt):
+            self.checks += 1
+            return Result(self.held.pop(0))
+        self.tries += 1
+        return Result(self.granted.pop(0))
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_only_the_lock_holder_warms(monkeypatch):
+    monkeypatch.setattr(warmer, "leader", False)
+    conn = LockConnection([False, True], held=[True])
+
+    async def run():
+        return [await warmer._lead(conn) for _ in range(3)]
+
+    # Another worker holds the lock, then exits; once taken it is re-checked
+    assert asyncio.run(run()) == [False, True, True]
+    assert (conn.tries, conn.checks) == (2, 1)
+    assert conn.commits == 3
+    assert warmer.snapshot()["leader"] is True
+
+
+def test_stops_warming_when_the_lock_is_lost(monkeypatch):
+    monkeypatch.setattr(warmer, "leader", True)
+    # The session was replaced and another worker took the lock meanwhile
+    conn = LockConnection([False], held=[False])
+
+    assert asyncio.run(warmer._lead(conn)) is False
+    assert warmer.leader is False